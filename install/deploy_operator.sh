@@ -11,5 +11,6 @@ if [[ "$USER" == "dev" ]]; then
 fi
 
 # Delete existing deployment and deploy
-kubectl delete deployment.apps/mizar-operator
+kubectl delete deployment.apps/mizar-operator --ignore-not-found
+kubectl delete statefulset.apps/mizar-operator --ignore-not-found
 kubectl apply -f $DIR/mgmt/etc/deploy/operator.deploy.yaml
@@ -1,19 +1,31 @@
-import subprocess
 import ctypes
+import functools
 import logging
+import random
+import socket
+import sys
+import threading
+import time
 import luigi
-from kubernetes import watch, client
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from kubernetes import client
+from kubernetes.client.rest import ApiException
 from ctypes.util import find_library
 from pathlib import Path
+from common.constants import *
+from common.executor import run_cmd, host_cmd
+from common.shard import SHARDS
+from common.informer import Informer, list_pages
+from common.kube_api import in_current_lane
+from common.trn_rpc_protocol import IpArray
+from store.operator_store import OprStore
 _libc = ctypes.CDLL(find_library('c'), use_errno=True)
 
 logger = logging.getLogger()
 
-def run_cmd(cmd):
-	result = subprocess.Popen(cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
-	text = result.stdout.read().decode()
-	returncode = result.returncode
-	return (returncode, text)
+# StoreSnapshot the operator bootstraps from, if it found one
+bootstrap_snapshot = None
 
 def get_iface_index(name, iproute):
 	return iproute.link_lookup(ifname=name)[0]
@@ -24,6 +36,24 @@ def get_iface_mac(idx, iproute):
 			return val
 	return None
 
+def _ip_show_field(field, argv, host):
+	if host:
+		argv = host_cmd(*argv)
+	returncode, output = run_cmd(argv)
+	if returncode != 0:
+		logger.error("{} failed ({}): {}".format(argv, returncode, output.strip()))
+		return ""
+	tokens = output.split()
+	if field not in tokens:
+		return ""
+	return tokens[tokens.index(field) + 1].split('/')[0]
+
+def get_itf_ip(itf, host=False):
+	return _ip_show_field("inet", ["ip", "-4", "-o", "addr", "show", itf], host)
+
+def get_itf_mac(itf, host=False):
+	return _ip_show_field("link/ether", ["ip", "-o", "link", "show", itf], host)
+
 def _nsfd(pid, ns_type):
     return Path('/proc') / str(pid) / 'ns' / ns_type
 
@@ -47,63 +77,186 @@ def _host_nsenter(ns_type, pid=1):
 		target_fd.close()
 
 
-def kube_create_obj(obj):
+class KubeObjError(Exception):
+	pass
+
+class KubeObjNotFound(KubeObjError):
+	pass
+
+class KubeObjConflict(KubeObjError):
+	"""
+	The object kept changing under the update until the retries ran out.
+	"""
+	pass
+
+class KubeVersions:
+	"""
+	The resourceVersion and spec of the objects last read or written, by
+	kind and name, so that updating them again needs no GET. Holds the
+	size most recently used objects.
+	"""
+	def __init__(self, size):
+		self.size = size
+		self.lock = threading.Lock()
+		self.versions = OrderedDict()
+
+	def get(self, key):
+		with self.lock:
+			version = self.versions.get(key)
+			if version is not None:
+				self.versions.move_to_end(key)
+			return version
+
+	def put(self, key, body):
+		with self.lock:
+			self.versions[key] = (body['metadata']['resourceVersion'], body.get('spec', {}))
+			self.versions.move_to_end(key)
+			if len(self.versions) > self.size:
+				self.versions.popitem(last=False)
+
+	def forget(self, key):
+		with self.lock:
+			self.versions.pop(key, None)
+
+kube_versions = KubeVersions(CONSTANTS.KUBE_VERSIONS_CACHE_SIZE)
+
+def merge_patch(old, new):
+	"""
+	Returns the JSON merge patch (RFC 7386) turning dict old into new: the
+	values of new that differ in old, and None for the keys only in old.
+	"""
+	patch = {}
+	for key, value in new.items():
+		prev = old.get(key)
+		if isinstance(value, dict) and isinstance(prev, dict):
+			sub = merge_patch(prev, value)
+			if sub:
+				patch[key] = sub
+		elif key not in old or prev != value:
+			patch[key] = value
+	for key in old:
+		if key not in new:
+			patch[key] = None
+	return patch
+
+def kube_create_obj(obj, labels=None):
+	"""
+	Creates obj, with labels if given, or if it already exists takes its
+	spec from the stored object. Creating first costs one round trip for
+	a new object, which is the usual case.
+	"""
+	body = {
+		"apiVersion": "mizar.com/v1",
+		"kind": obj.get_kind(),
+		"metadata": {
+			"name": obj.get_name()
+		},
+		"spec": obj.get_obj_spec()
+	}
+	if labels:
+		body["metadata"]["labels"] = labels
 	try:
-		body = obj.obj_api.get_namespaced_custom_object(
+		body = obj.obj_api.create_namespaced_custom_object(
 			group="mizar.com",
 			version="v1",
 			namespace="default",
 			plural=obj.get_plural(),
-			name=obj.get_name())
-		spec = body['spec']
-		obj.set_obj_spec(spec)
-	except:
-		body = {
-			"apiVersion": "mizar.com/v1",
-			"kind": obj.get_kind(),
-			"metadata": {
-				"name": obj.get_name()
-			},
-			"spec": obj.get_obj_spec()
-		}
-
-		obj.obj_api.create_namespaced_custom_object(
+			body=body,
+		)
+		logger.debug("Created {} {}".format(obj.get_kind(), obj.get_name()))
+	except ApiException as e:
+		if e.status != 409:
+			raise
+		body = obj.obj_api.get_namespaced_custom_object(
 			group="mizar.com",
 			version="v1",
 			namespace="default",
 			plural=obj.get_plural(),
-			body=body,
-		)
-		logger.debug("Created {} {}".format(obj.get_kind(), obj.get_name()))
+			name=obj.get_name())
+		obj.set_obj_spec(body['spec'])
+	kube_versions.put((obj.get_plural(), obj.get_name()), body)
 	obj.store_update_obj()
 
+def kube_create_objs(objs, concurrency=CONSTANTS.KUBE_CREATE_CONCURRENCY):
+	"""
+	Creates objs, up to concurrency of them at a time, so that creating
+	the children of an object takes about one round trip. Raises the
+	first error after all are done.
+	"""
+	objs = list(objs)
+	if not objs:
+		return
+	with ThreadPoolExecutor(max_workers=min(len(objs), concurrency),
+			thread_name_prefix='kube-create') as pool:
+		create = in_current_lane(kube_create_obj)
+		futures = [pool.submit(create, obj) for obj in objs]
+	for f in futures:
+		f.result()
 
-def kube_update_obj(obj):
-	get_body = True
-	while get_body:
+def _kube_get_version(obj, key):
+	try:
 		body = obj.obj_api.get_namespaced_custom_object(
 			group="mizar.com",
 			version="v1",
 			namespace="default",
 			plural=obj.get_plural(),
 			name=obj.get_name())
+	except ApiException as e:
+		if e.status == 404:
+			raise KubeObjNotFound("{} {} not found".format(obj.get_kind(), obj.get_name()))
+		raise
+	kube_versions.put(key, body)
+	return kube_versions.get(key)
 
-		body['spec'] = obj.get_obj_spec()
+def kube_update_obj(obj):
+	"""
+	Writes the spec fields of obj that changed as a merge patch, on the
+	condition that the object is still at the resourceVersion they were
+	diffed against. The patch is sent even if it is empty, so that a
+	stale cached copy conflicts and the spec is diffed again against the
+	object as it is. Conflicts and API server errors are retried with
+	jittered exponential backoff; raises KubeObjNotFound, KubeObjConflict
+	once the retries ran out, or KubeObjError for other failures.
+	"""
+	key = (obj.get_plural(), obj.get_name())
+	spec = obj.get_obj_spec()
+	delay = CONSTANTS.KUBE_BACKOFF_BASE
+	for attempt in range(CONSTANTS.KUBE_UPDATE_RETRIES):
+		if attempt:
+			time.sleep(random.uniform(0, delay))
+			delay = min(delay * 2, CONSTANTS.KUBE_BACKOFF_MAX)
 		try:
-			obj.obj_api.patch_namespaced_custom_object(
+			version = kube_versions.get(key) or _kube_get_version(obj, key)
+		except ApiException as e:
+			logger.debug("Retry reading {} {}: {}".format(obj.get_kind(), obj.get_name(), e.status))
+			continue
+		rv, current = version
+		patch = merge_patch(current, spec)
+		try:
+			body = obj.obj_api.patch_namespaced_custom_object(
 				group="mizar.com",
 				version="v1",
 				namespace="default",
 				plural=obj.get_plural(),
 				name=obj.name,
-				body=body)
-			obj.store_update_obj()
-			get_body = False
-		except:
-			logger.debug("Retry updating {} {}".format(obj.get_kind(), obj.get_name()))
-			get_body = True
+				body={"metadata": {"resourceVersion": rv}, "spec": patch})
+		except ApiException as e:
+			kube_versions.forget(key)
+			if e.status == 404:
+				raise KubeObjNotFound("{} {} not found".format(obj.get_kind(), obj.get_name()))
+			if e.status != 409 and e.status != 429 and e.status < 500:
+				raise KubeObjError("Updating {} {} failed: {} {}".format(
+					obj.get_kind(), obj.get_name(), e.status, e.reason))
+			logger.debug("Retry updating {} {}: {}".format(obj.get_kind(), obj.get_name(), e.status))
+			continue
+		kube_versions.put(key, body)
+		obj.store_update_obj()
+		return
+	raise KubeObjConflict("{} {} not updated after {} attempts".format(
+		obj.get_kind(), obj.get_name(), CONSTANTS.KUBE_UPDATE_RETRIES))
 
 def kube_delete_obj(obj):
+	kube_versions.forget((obj.get_plural(), obj.get_name()))
 	try:
 		obj.obj_api.delete_namespaced_custom_object(
 			group="mizar.com",
@@ -116,43 +269,161 @@ def kube_delete_obj(obj):
 	except:
 		logger.debug("Failed to delete {} {}".format(obj.get_kind(), obj.get_name()))
 
-def kube_watch_obj(obj, watch_callback):
-	watcher = watch.Watch()
-	stream = watcher.stream(obj.obj_api.list_namespaced_custom_object,
-				group="mizar.com",
-				version="v1",
-				namespace="default",
-				plural=obj.get_plural(),
-				field_selector = "metadata.name={}".format(obj.get_name()),
-				watch = True
-			)
-
-	for event in stream:
-		name = event['object']['metadata']['name']
-		if name == obj.name:
-			spec = event['object']['spec']
-			obj.set_obj_spec(spec)
+def kube_watch_obj(obj, watch_callback, timeout=None, label_selector=None):
+	"""
+	Waits, from the shared informer of its kind, for an event of obj for
+	which watch_callback(event, obj) is true. Like a watch of obj, every
+	event of obj up to that one updates obj and the store, except a
+	deletion. Returns False if there was none within timeout seconds.
+	"""
+	def on_event(event):
+		if event['type'] != 'DELETED':
+			obj.set_obj_spec(event['object']['spec'])
 			obj.store_update_obj()
-		if watch_callback(event, obj):
-			watcher.stop()
-			return
-
-def kube_list_obj(obj_api, plurals, list_callback):
-	response = obj_api.list_namespaced_custom_object(
-					group = "mizar.com",
-					version = "v1",
-					namespace = "default",
-					plural = plurals,
-					watch=False)
-	items = response['items']
-	for v in items:
-		name = v['metadata']['name']
-		spec = v['spec']
-		list_callback(name, spec, plurals)
+		return watch_callback(event, obj)
+
+	informer = Informer.get(obj.obj_api, obj.get_plural(), label_selector)
+	return informer.wait(obj.get_name(), on_event, timeout) is not None
+
+def kube_list_obj(obj_api, plurals, list_callback, shards=None):
+	"""
+	Calls list_callback for every object of kind plurals, a page at a
+	time as the pages come, or replayed from the store snapshot. Returns
+	the resourceVersion of the list for a watch to start from, and keeps
+	it in the store for its next snapshot. A list that expires midway is
+	started over, the callbacks then see some objects twice. Given shards,
+	only the objects of those VPC shards are listed, and the
+	resourceVersion is not kept, the store holds more than that list.
+	"""
+	def owned_callback(name, spec, plurals):
+		if SHARDS.lists(plurals, name, spec, shards):
+			list_callback(name, spec, plurals)
+
+	rv = None
+	if bootstrap_snapshot and shards is None:
+		rv = bootstrap_snapshot.replay(obj_api, plurals, owned_callback)
+	while rv is None:
+		try:
+			for items, rv in list_pages(obj_api, plurals):
+				for v in items:
+					owned_callback(v['metadata']['name'], v['spec'], plurals)
+		except ApiException as e:
+			if e.status != 410:
+				raise
+			logger.info("List of {} expired, listing again".format(plurals))
+			rv = None
+	if shards is None:
+		OprStore().set_resource_version(plurals, rv)
+	return rv
 
 def get_spec_val(key, spec, default=""):
 	return default if key not in spec else spec[key]
 
+def get_spec_sym(key, spec, default=""):
+	"""
+	get_spec_val for values shared by many objects, like the vpc, net or
+	status, interned so that they all refer to one string.
+	"""
+	val = get_spec_val(key, spec, default)
+	return sys.intern(val) if type(val) is str else val
+
+def pack_ip(ip):
+	"""
+	Returns a dotted IPv4 address as an int, which takes half the memory
+	of the string. Anything else is returned unchanged.
+	"""
+	if not ip:
+		return ip
+	try:
+		b = socket.inet_aton(ip)
+	except (OSError, TypeError):
+		return ip
+	return int.from_bytes(b, 'big') if socket.inet_ntoa(b) == ip else ip
+
+def unpack_ip(ip):
+	return socket.inet_ntoa(ip.to_bytes(4, 'big')) if type(ip) is int else ip
+
+@functools.lru_cache(maxsize=64)
+def prefix_mask(prefix):
+	"""
+	Returns the IPv4 netmask of prefix length prefix, as an int.
+	"""
+	n = int(prefix)
+	if not 0 <= n <= 32:
+		raise ValueError("invalid prefix length {}".format(prefix))
+	return (0xffffffff << (32 - n)) & 0xffffffff
+
+class IpMap(dict):
+	"""
+	name -> object map that also keeps the IPs of its objects, each once
+	and in the order first added, as an IpArray of at most maxlen for RPC
+	payloads. IPs are counted as objects come and go, and the IpArray is
+	only rebuilt, on its next use, when an IP is added or no longer used.
+	Objects must not change IP while in the map.
+	"""
+	def __init__(self, maxlen):
+		super().__init__()
+		self.maxlen = maxlen
+		self.refs = {}
+		self._ips = None
+
+	def __setitem__(self, name, obj):
+		if name in self:
+			self._unref(self[name].ip)
+		super().__setitem__(name, obj)
+		n = self.refs.get(obj.ip, 0)
+		self.refs[obj.ip] = n + 1
+		if not n:
+			self._ips = None
+
+	def __delitem__(self, name):
+		self._unref(self[name].ip)
+		super().__delitem__(name)
+
+	def pop(self, name, *default):
+		if name not in self:
+			return super().pop(name, *default)
+		obj = super().pop(name)
+		self._unref(obj.ip)
+		return obj
+
+	def clear(self):
+		super().clear()
+		self.refs.clear()
+		self._ips = None
+
+	def _unref(self, ip):
+		n = self.refs[ip] - 1
+		if n:
+			self.refs[ip] = n
+		else:
+			del self.refs[ip]
+			self._ips = None
+
+	@property
+	def ips(self):
+		if self._ips is None:
+			self._ips = IpArray(self.refs, self.maxlen)
+		return self._ips
+
+def pack_mac(mac):
+	"""
+	Returns a lowercase colon separated MAC address as an int, anything
+	else unchanged.
+	"""
+	if type(mac) is not str or len(mac) != 17 or mac[2::3] != ":::::" or mac != mac.lower():
+		return mac
+	try:
+		return int(mac.replace(':', ''), 16)
+	except ValueError:
+		return mac
+
+def unpack_mac(mac):
+	if type(mac) is not int:
+		return mac
+	h = "%012x" % mac
+	return ":".join((h[0:2], h[2:4], h[4:6], h[6:8], h[8:10], h[10:12]))
+
 def run_workflow(wf):
     luigi.build(wf, workers=1, local_scheduler=True, log_level='INFO')
 
@@ -1,3 +1,4 @@
+import os
 
 # Constants
 group = 'mizar.com'
@@ -15,6 +16,57 @@ class CONSTANTS:
     ON_XDP_REDIRECT = "ON_XDP_REDIRECT"
     ON_XDP_DROP     = "ON_XDP_DROP"
     ON_XDP_SCALED_EP = "ON_XDP_SCALED_EP"
+    RPC_MAX_INFLIGHT_PER_DROPLET = 1
+    RPC_MAX_INFLIGHT = 64
+    RPC_COALESCE_WINDOW = 0.2
+    CMD_TIMEOUT = 30
+    RPC_BREAKER_THRESHOLD = 3
+    RPC_BACKOFF_BASE = 1
+    RPC_BACKOFF_MAX = 60
+    # direct, cli or fake
+    RPC_TRANSPORT = os.environ.get("MIZAR_RPC_TRANSPORT", "direct")
+    # Push every write even if the droplet already acknowledged it
+    RPC_FORCE_RESYNC = os.environ.get("MIZAR_RPC_FORCE_RESYNC", "") == "1"
+    # Seconds a droplet's acknowledged writes are trusted before pinging it
+    RPC_ACK_CHECK_INTERVAL = 5
+    # The operator and daemons are on the host network, serve locally
+    # unless told otherwise
+    METRICS_ADDR = os.environ.get("MIZAR_METRICS_ADDR", "127.0.0.1")
+    OPERATOR_METRICS_PORT = int(os.environ.get("MIZAR_OPERATOR_METRICS_PORT", "9181"))
+    # One snapshot per replica, the replicas on a node share the directory
+    STORE_SNAPSHOT_PATH = "/var/lib/mizar/store-{}.db".format(os.environ.get("POD_NAME", "operator"))
+    STORE_SNAPSHOT_INTERVAL = 60
+    # Longest a warm start watches for the changes since the snapshot
+    STORE_SNAPSHOT_WATCH_TIMEOUT = 10
+    # Store changes kept for the consumers of the change log
+    STORE_CHANGE_LOG_SIZE = 65536
+    # Seconds between reconciler passes, and that an object may stay
+    # unsettled before the reconciler runs its handlers again
+    RECONCILE_INTERVAL = 30
+    RECONCILE_AFTER = 120
+    # Objects sized for the store memory estimates, and entries per list
+    STORE_STATS_SAMPLE = 100
+    STORE_STATS_TOP = 10
+    STORE_DUMP_PAGE = 1000
+    STORE_DUMP_ENABLED = os.environ.get("MIZAR_STORE_DUMP", "") == "1"
+    # VPC shards split between operator replicas, 0 for no sharding
+    OPERATOR_SHARDS = int(os.environ.get("MIZAR_OPERATOR_SHARDS", "0"))
+    SHARD_LEASE_DURATION = 15
+    SHARD_RENEW_INTERVAL = 5
+    DAEMON_METRICS_PORT = int(os.environ.get("MIZAR_DAEMON_METRICS_PORT", "9182"))
+    INFORMER_WATCH_TIMEOUT = 300
+    # Label of the endpoints a daemon creates, its informer watches only those
+    DROPLET_LABEL = "mizar.com/droplet"
+    INFORMER_RETRY_INTERVAL = 1
+    EP_READY_TIMEOUT = 120
+    KUBE_UPDATE_RETRIES = 8
+    KUBE_BACKOFF_BASE = 0.1
+    KUBE_BACKOFF_MAX = 5
+    KUBE_VERSIONS_CACHE_SIZE = 4096
+    KUBE_LIST_PAGE = 500
+    KUBE_CREATE_CONCURRENCY = 16
+    KUBE_API_QPS = 50
+    KUBE_API_BURST = 100
 
 class OBJ_STATUS:
 	ep_status_init = 'Init'
@@ -82,6 +134,11 @@ class RESOURCES:
 	bouncers = "bouncers"
 	dividers = "dividers"
 
+class KUBE_LANES:
+	interactive = "interactive"
+	control = "control"
+	background = "background"
+
 class LAMBDAS:
 	ep_status_init = lambda body, **_: body.get('spec', {}).get('status', '') == OBJ_STATUS.ep_status_init
 	ep_status_allocated = lambda body, **_: body.get('spec', {}).get('status', '') == OBJ_STATUS.ep_status_allocated
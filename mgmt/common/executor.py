@@ -0,0 +1,58 @@
+import json
+import logging
+import os
+import shlex
+import subprocess
+import time
+from common.constants import CONSTANTS
+from common.metrics import Histogram
+
+logger = logging.getLogger()
+
+cmd_duration = Histogram("mizar_cmd_duration_seconds",
+	"Duration of commands run by the executor", ("cmd", "result"))
+
+def run_cmd(argv, stdin=None, timeout=CONSTANTS.CMD_TIMEOUT, name=None):
+	"""
+	Runs argv without a shell and returns (returncode, output), with
+	stderr folded into output. stdin may be text, bytes, or an object
+	that is passed as JSON. A command still running after timeout seconds
+	is killed, and its (negative) return code is returned.
+	"""
+	if isinstance(argv, str):
+		argv = shlex.split(argv)
+	if stdin is not None and not isinstance(stdin, (str, bytes)):
+		stdin = json.dumps(stdin)
+	if isinstance(stdin, str):
+		stdin = stdin.encode()
+	if name is None:
+		name = os.path.basename(argv[0])
+
+	start = time.monotonic()
+	result = "ok"
+	try:
+		p = subprocess.Popen(argv, stdin=subprocess.PIPE if stdin is not None else subprocess.DEVNULL,
+			stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+	except OSError as e:
+		cmd_duration.observe(time.monotonic() - start, name, "error")
+		logger.error("{} failed to start: {}".format(name, e))
+		return (127, str(e))
+	try:
+		output, _ = p.communicate(stdin, timeout=timeout)
+	except subprocess.TimeoutExpired:
+		p.kill()
+		output, _ = p.communicate()
+		result = "timeout"
+		logger.error("{} timed out after {}s: {}".format(name, timeout, argv))
+	if result == "ok" and p.returncode != 0:
+		result = "error"
+	elapsed = time.monotonic() - start
+	cmd_duration.observe(elapsed, name, result)
+	logger.debug("{} returned {} in {:.3f}s".format(name, p.returncode, elapsed))
+	return (p.returncode, output.decode())
+
+def host_cmd(*argv):
+	"""
+	Prefixes argv to run it in the namespaces of the host's init process.
+	"""
+	return ["nsenter", "-t", "1", "-m", "-u", "-n", "-i"] + list(argv)
@@ -0,0 +1,193 @@
+import copy
+import logging
+import threading
+import time
+from kubernetes import watch
+from common.constants import *
+
+logger = logging.getLogger()
+
+def list_pages(obj_api, plurals, limit=CONSTANTS.KUBE_LIST_PAGE, label_selector=None):
+	"""
+	Lists the objects of kind plurals limit at a time, yielding the
+	items and resourceVersion of each page as it comes. All the pages are
+	of one consistent list, at the resourceVersion of the first. Raises
+	ApiException 410 if the list took too long and has to start over.
+	"""
+	cont = None
+	while True:
+		kwargs = {"_continue": cont} if cont else {}
+		if label_selector:
+			kwargs["label_selector"] = label_selector
+		response = obj_api.list_namespaced_custom_object(
+			group="mizar.com",
+			version="v1",
+			namespace="default",
+			plural=plurals,
+			limit=limit,
+			**kwargs)
+		cont = response['metadata'].get('continue')
+		yield response['items'], response['metadata']['resourceVersion']
+		if not cont:
+			return
+
+class _Waiter:
+	__slots__ = ('predicate', 'done', 'event', 'lock', 'seen')
+
+	def __init__(self, predicate):
+		self.predicate = predicate
+		self.done = threading.Event()
+		self.event = None
+		self.lock = threading.Lock()
+		self.seen = False
+
+	def offer(self, event, cached=False):
+		# One event at a time, and the cached state only if no newer event came
+		with self.lock:
+			if self.done.is_set() or (cached and self.seen):
+				return self.done.is_set()
+			self.seen = True
+			try:
+				matched = self.predicate(event)
+			except Exception as e:
+				logger.error("Informer waiter failed on {}: {}".format(event['object']['metadata']['name'], e))
+				matched = False
+			if matched:
+				self.event = event
+				self.done.set()
+			return matched
+
+class Informer:
+	"""
+	One watch of a kind of object, shared by the whole process. It keeps
+	the latest spec of every object of that kind, and wakes the callers
+	waiting for one of them to reach some state, so that waiting on many
+	objects does not open a watch for each. With a label_selector the
+	informer only sees, and keeps, the objects with those labels.
+
+	The informer lists the kind, then watches from the listed
+	resourceVersion, and lists again when the watch falls too far behind.
+	"""
+	_informers = {}
+	_informers_lock = threading.Lock()
+
+	@classmethod
+	def get(cls, obj_api, plurals, label_selector=None):
+		"""
+		Returns the informer of kind plurals and label_selector, started on
+		first use.
+		"""
+		key = (plurals, label_selector)
+		with cls._informers_lock:
+			informer = cls._informers.get(key)
+			if informer is None:
+				informer = cls._informers[key] = cls(obj_api, plurals, label_selector)
+				informer.start()
+		return informer
+
+	def __init__(self, obj_api, plurals, label_selector=None):
+		self.obj_api = obj_api
+		self.plurals = plurals
+		self.label_selector = label_selector
+		self.lock = threading.Lock()
+		self.objects = {}
+		self.waiters = {}
+		self.synced = threading.Event()
+
+	def start(self):
+		t = threading.Thread(target=self.run, name='informer-{}'.format(self.plurals), daemon=True)
+		t.start()
+
+	def run(self):
+		while True:
+			try:
+				rv = self._list()
+				while rv is not None:
+					rv = self._watch(rv)
+			except Exception as e:
+				logger.warning("Informer of {} failed, listing again: {}".format(self.plurals, e))
+				time.sleep(CONSTANTS.INFORMER_RETRY_INTERVAL)
+
+	def _list(self):
+		objects = {}
+		for items, rv in list_pages(self.obj_api, self.plurals, label_selector=self.label_selector):
+			for v in items:
+				objects[v['metadata']['name']] = self._trim(v)
+		with self.lock:
+			self.objects = objects
+			waiting = [name for name in self.waiters if name in objects]
+		self.synced.set()
+		for name in waiting:
+			self._notify(name, {'type': 'ADDED', 'object': objects[name]})
+		return rv
+
+	def _watch(self, rv):
+		"""
+		Applies the events after resourceVersion rv until the watch times
+		out, and returns the resourceVersion to go on from, or None if the
+		informer has to list again.
+		"""
+		kwargs = {"label_selector": self.label_selector} if self.label_selector else {}
+		w = watch.Watch()
+		for event in w.stream(self.obj_api.list_namespaced_custom_object,
+				group="mizar.com",
+				version="v1",
+				namespace="default",
+				plural=self.plurals,
+				resource_version=rv,
+				timeout_seconds=CONSTANTS.INFORMER_WATCH_TIMEOUT,
+				**kwargs):
+			if event['type'] == 'ERROR':
+				logger.info("Watch of {} expired at {}, listing again".format(self.plurals, rv))
+				return None
+			obj = event['object']
+			name = obj['metadata']['name']
+			rv = obj['metadata']['resourceVersion']
+			with self.lock:
+				if event['type'] == 'DELETED':
+					self.objects.pop(name, None)
+				else:
+					self.objects[name] = self._trim(obj)
+			self._notify(name, event)
+		return rv
+
+	def _trim(self, obj):
+		# Only what waiters look at is kept, a kind may have many objects
+		return {
+			'metadata': {
+				'name': obj['metadata']['name'],
+				'resourceVersion': obj['metadata']['resourceVersion']
+			},
+			'spec': obj.get('spec', {})
+		}
+
+	def _notify(self, name, event):
+		with self.lock:
+			waiters = list(self.waiters.get(name, ()))
+		for w in waiters:
+			w.offer(event)
+
+	def cached(self, name):
+		return self.objects.get(name)
+
+	def wait(self, name, predicate, timeout=None):
+		"""
+		Returns the first event of object name, starting with its cached
+		state, for which predicate(event) is true, or None if there is none
+		within timeout seconds.
+		"""
+		w = _Waiter(predicate)
+		with self.lock:
+			obj = copy.deepcopy(self.objects.get(name))
+			self.waiters.setdefault(name, []).append(w)
+		try:
+			# The predicate runs without the informer lock, it may be slow
+			if obj is None or not w.offer({'type': 'ADDED', 'object': obj}, cached=True):
+				w.done.wait(timeout)
+		finally:
+			with self.lock:
+				waiters = self.waiters[name]
+				waiters.remove(w)
+				if not waiters:
+					del self.waiters[name]
+		return w.event
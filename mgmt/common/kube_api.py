@@ -0,0 +1,147 @@
+import functools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from kubernetes import client
+from common.constants import *
+from common.metrics import Gauge, Histogram
+
+logger = logging.getLogger()
+
+# Highest priority first
+LANES = (KUBE_LANES.interactive, KUBE_LANES.control, KUBE_LANES.background)
+
+kube_api_queued = Gauge("mizar_kube_api_queued",
+	"Kubernetes API calls waiting for the rate limiter", ("lane",))
+kube_api_wait = Histogram("mizar_kube_api_wait_seconds",
+	"Time Kubernetes API calls waited for the rate limiter", ("lane",))
+
+_lane = threading.local()
+
+def current_lane():
+	return getattr(_lane, 'lane', KUBE_LANES.control)
+
+@contextmanager
+def _in_lane(lane):
+	prev = current_lane()
+	_lane.lane = lane
+	try:
+		yield
+	finally:
+		_lane.lane = prev
+
+def kube_lane(lane):
+	"""
+	Decorates a kopf handler so that its Kubernetes calls go in lane. A
+	handler run for a resume is a resync, its calls go in the background.
+	"""
+	def decorator(fn):
+		@functools.wraps(fn)
+		def wrapper(*args, **kwargs):
+			with _in_lane(KUBE_LANES.background if kwargs.get('reason') == 'resume' else lane):
+				return fn(*args, **kwargs)
+		return wrapper
+	return decorator
+
+def background(fn, *args, **kwargs):
+	"""
+	Runs fn with its Kubernetes calls in the background lane.
+	"""
+	with _in_lane(KUBE_LANES.background):
+		return fn(*args, **kwargs)
+
+def in_current_lane(fn):
+	"""
+	Returns fn running in the lane of the caller, for handing work to
+	other threads.
+	"""
+	lane = current_lane()
+
+	@functools.wraps(fn)
+	def wrapper(*args, **kwargs):
+		with _in_lane(lane):
+			return fn(*args, **kwargs)
+	return wrapper
+
+class KubeRateLimiter:
+	"""
+	Token bucket of rate calls per second, up to burst at once, shared by
+	the lanes. A call waits while a call of a higher lane is waiting, so a
+	background resync only gets what the other lanes leave, and a pod's
+	endpoint waits at most for the next token.
+	"""
+	def __init__(self, rate=CONSTANTS.KUBE_API_QPS, burst=CONSTANTS.KUBE_API_BURST):
+		self.rate = rate
+		self.burst = burst
+		self.tokens = burst
+		self.last = time.monotonic()
+		self.waiting = {lane: 0 for lane in LANES}
+		self.cond = threading.Condition()
+
+	def _refill(self, now):
+		self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+		self.last = now
+
+	def _ahead(self, lane):
+		for l in LANES:
+			if l == lane:
+				return False
+			if self.waiting[l]:
+				return True
+
+	def acquire(self, lane):
+		start = time.monotonic()
+		with self.cond:
+			self.waiting[lane] += 1
+			kube_api_queued.inc(lane)
+			try:
+				while True:
+					self._refill(time.monotonic())
+					if not self._ahead(lane):
+						if self.tokens >= 1:
+							self.tokens -= 1
+							break
+						self.cond.wait((1 - self.tokens) / self.rate)
+					else:
+						self.cond.wait()
+			finally:
+				self.waiting[lane] -= 1
+				kube_api_queued.dec(lane)
+				# The lanes below may go now
+				self.cond.notify_all()
+		kube_api_wait.observe(time.monotonic() - start, lane)
+
+class KubeObjectsApi:
+	"""
+	CustomObjectsApi whose calls take a token of the rate limiter in the
+	lane of the calling thread first. The wrapped methods keep their
+	docstrings, which the watches read the return type from.
+	"""
+	def __init__(self, api, limiter):
+		self.api = api
+		self.limiter = limiter
+
+	def __getattr__(self, name):
+		attr = getattr(self.api, name)
+		if not callable(attr):
+			return attr
+
+		@functools.wraps(attr)
+		def call(*args, **kwargs):
+			self.limiter.acquire(current_lane())
+			return attr(*args, **kwargs)
+		return call
+
+_api = None
+_api_lock = threading.Lock()
+
+def kube_api():
+	"""
+	Returns the process wide, rate limited CustomObjectsApi.
+	"""
+	global _api
+	with _api_lock:
+		if _api is None:
+			_api = KubeObjectsApi(client.CustomObjectsApi(), KubeRateLimiter())
+		return _api
@@ -0,0 +1,216 @@
+import bisect
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+logger = logging.getLogger()
+
+# Latency buckets in seconds, from sub-millisecond RPCs to stuck commands
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+	0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Payload buckets in bytes, one endpoint is about 100 bytes on the wire
+SIZE_BUCKETS = (64, 128, 256, 512, 1024, 4096, 16384, 65536, 262144)
+
+REGISTRY = []
+_registry_lock = threading.Lock()
+
+def register(metric):
+	with _registry_lock:
+		REGISTRY.append(metric)
+	return metric
+
+class Counter:
+	"""
+	Monotonic counter, kept separately for each label tuple.
+	"""
+	kind = "counter"
+
+	def __init__(self, name, doc, labelnames=()):
+		self.name = name
+		self.doc = doc
+		self.labelnames = tuple(labelnames)
+		self.series = {}
+		self.lock = threading.Lock()
+		register(self)
+
+	def inc(self, *labels, value=1):
+		with self.lock:
+			self.series[labels] = self.series.get(labels, 0) + value
+
+	def snapshot(self):
+		with self.lock:
+			return dict(self.series)
+
+	def exposition(self):
+		lines = []
+		for labels, value in sorted(self.snapshot().items()):
+			lines.append("{}{} {}".format(self.name, _labels(self.labelnames, labels), value))
+		return lines
+
+class Gauge:
+	"""
+	Value that goes up and down, kept separately for each label tuple.
+	"""
+	kind = "gauge"
+
+	def __init__(self, name, doc, labelnames=()):
+		self.name = name
+		self.doc = doc
+		self.labelnames = tuple(labelnames)
+		self.series = {}
+		self.lock = threading.Lock()
+		register(self)
+
+	def set(self, value, *labels):
+		with self.lock:
+			self.series[labels] = value
+
+	def inc(self, *labels, value=1):
+		with self.lock:
+			self.series[labels] = self.series.get(labels, 0) + value
+
+	def dec(self, *labels, value=1):
+		self.inc(*labels, value=-value)
+
+	def snapshot(self):
+		with self.lock:
+			return dict(self.series)
+
+	def exposition(self):
+		lines = []
+		for labels, value in sorted(self.snapshot().items()):
+			lines.append("{}{} {}".format(self.name, _labels(self.labelnames, labels), value))
+		return lines
+
+class Histogram:
+	"""
+	Cumulative histogram of observed values, kept separately for each
+	label tuple.
+	"""
+	kind = "histogram"
+
+	def __init__(self, name, doc, labelnames=(), buckets=DEFAULT_BUCKETS):
+		self.name = name
+		self.doc = doc
+		self.labelnames = tuple(labelnames)
+		self.buckets = tuple(buckets)
+		self.series = {}
+		self.lock = threading.Lock()
+		register(self)
+
+	def observe(self, value, *labels):
+		i = bisect.bisect_left(self.buckets, value)
+		with self.lock:
+			if labels not in self.series:
+				self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+			counts, _, _ = s = self.series[labels]
+			counts[i] += 1
+			s[1] += value
+			s[2] += 1
+
+	def snapshot(self):
+		"""
+		Returns {labels: (cumulative bucket counts, sum, count)}, where the
+		last bucket count is the +Inf one.
+		"""
+		with self.lock:
+			series = {k: (list(v[0]), v[1], v[2]) for k, v in self.series.items()}
+		for labels, (counts, total, n) in series.items():
+			for i in range(1, len(counts)):
+				counts[i] += counts[i - 1]
+		return series
+
+	def exposition(self):
+		lines = []
+		names = self.labelnames + ("le",)
+		for labels, (counts, total, n) in sorted(self.snapshot().items()):
+			for bound, count in zip(self.buckets + ("+Inf",), counts):
+				lines.append("{}_bucket{} {}".format(self.name,
+					_labels(names, labels + (bound,)), count))
+			lines.append("{}_sum{} {}".format(self.name, _labels(self.labelnames, labels), total))
+			lines.append("{}_count{} {}".format(self.name, _labels(self.labelnames, labels), n))
+		return lines
+
+def _labels(names, values):
+	if not names:
+		return ""
+	pairs = []
+	for name, value in zip(names, values):
+		value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+		pairs.append('{}="{}"'.format(name, value))
+	return "{" + ",".join(pairs) + "}"
+
+def exposition():
+	"""
+	Renders every registered metric in the Prometheus text format.
+	"""
+	with _registry_lock:
+		metrics = list(REGISTRY)
+	lines = []
+	for m in metrics:
+		lines.append("# HELP {} {}".format(m.name, m.doc))
+		lines.append("# TYPE {} {}".format(m.name, m.kind))
+		lines.extend(m.exposition())
+	return "\n".join(lines) + "\n"
+
+# path -> fn(query) returning the content type and the body, as bytes or
+# as an iterable of chunks streamed as they come. fn raises KeyError for
+# a missing page and ValueError for a bad query.
+PAGES = {}
+
+def register_page(path, fn):
+	PAGES[path] = fn
+
+def _metrics_page(query):
+	return "text/plain; version=0.0.4; charset=utf-8", exposition().encode()
+
+register_page("/metrics", _metrics_page)
+
+class MetricsHandler(BaseHTTPRequestHandler):
+	def do_GET(self):
+		url = urlsplit(self.path)
+		fn = PAGES.get(url.path)
+		if fn is None:
+			self.send_error(404)
+			return
+		try:
+			content_type, body = fn(dict(parse_qsl(url.query)))
+		except KeyError as e:
+			self.send_error(404, str(e))
+			return
+		except ValueError as e:
+			self.send_error(400, str(e))
+			return
+		self.send_response(200)
+		self.send_header("Content-Type", content_type)
+		if isinstance(body, bytes):
+			self.send_header("Content-Length", str(len(body)))
+			self.end_headers()
+			self.wfile.write(body)
+			return
+		# No length, the end of the stream is the connection closing
+		self.end_headers()
+		for chunk in body:
+			self.wfile.write(chunk)
+
+	def log_message(self, format, *args):
+		pass
+
+def start_metrics_server(port, addr='127.0.0.1'):
+	"""
+	Serves /metrics, and the other registered pages, on port from a
+	daemon thread and returns the server, or None if it could not listen;
+	metrics are not worth failing the process for.
+	"""
+	try:
+		server = ThreadingHTTPServer((addr, port), MetricsHandler)
+	except OSError as e:
+		logger.error("Not serving metrics, cannot listen on {}:{}: {}".format(addr, port, e))
+		return None
+	server.daemon_threads = True
+	t = threading.Thread(target=server.serve_forever, name='metrics', daemon=True)
+	t.start()
+	logger.info("Serving metrics on {}:{}".format(addr, port))
+	return server
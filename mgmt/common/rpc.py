@@ -1,38 +1,237 @@
 import logging
 import json
-from common.common import run_cmd
+import asyncio
+import functools
+import threading
+import time
+import weakref
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from common.constants import CONSTANTS
+from common.trn_rpc_protocol import *
+from common.trn_rpc_client import TrnRpcError, TrnRpcUnavailable
+from common.trn_rpc_transport import make_transport
+from common.metrics import Counter, Histogram, SIZE_BUCKETS
 
 logger = logging.getLogger()
 
+rpc_duration = Histogram("mizar_rpc_duration_seconds",
+	"Duration of transitd RPCs", ("method", "droplet", "outcome"))
+rpc_payload = Histogram("mizar_rpc_payload_bytes",
+	"Encoded size of transitd RPC arguments", ("method", "droplet"), SIZE_BUCKETS)
+rpc_errors = Counter("mizar_rpc_errors_total",
+	"transitd RPCs that failed or returned an error code", ("method", "droplet", "reason"))
+rpc_skipped = Counter("mizar_rpc_skipped_total",
+	"transitd writes skipped because the droplet already had the payload", ("method", "droplet"))
+
+class DropletHealth:
+	"""
+	Health of one droplet's transitd, shared by the TrnRpc of the droplet
+	whatever their transport. After breaker_threshold consecutive failed
+	calls the circuit opens and calls fail fast; after an exponential
+	backoff one call is let through as a probe, and the droplet is pinged
+	if a transport can.
+
+	A call that succeeds after a failure, or after the transport saw a
+	restart, may have reached a transitd that forgot everything: each
+	TrnRpc of the droplet then marks all it had acknowledged for resync.
+	The pending writes are replayed then, and whenever the circuit closes.
+	"""
+	breaker_threshold = CONSTANTS.RPC_BREAKER_THRESHOLD
+	backoff_base = CONSTANTS.RPC_BACKOFF_BASE
+	backoff_max = CONSTANTS.RPC_BACKOFF_MAX
+	_droplets = {}
+	_droplets_lock = threading.Lock()
+
+	@classmethod
+	def get(cls, ip):
+		with cls._droplets_lock:
+			if ip not in cls._droplets:
+				cls._droplets[ip] = cls(ip)
+			return cls._droplets[ip]
+
+	@classmethod
+	def drop(cls, ip):
+		with cls._droplets_lock:
+			health = cls._droplets.pop(ip, None)
+		if health is not None:
+			health.close()
+
+	def __init__(self, ip):
+		self.ip = ip
+		self.failures = 0
+		self.retry_at = 0
+		self.lost = False
+		self.closed = False
+		self.probe_timer = None
+		self.rpcs = weakref.WeakSet()
+		self.lock = threading.Lock()
+
+	def is_available(self):
+		with self.lock:
+			return self.failures < self.breaker_threshold
+
+	def check(self):
+		"""
+		Raises TrnRpcUnavailable while the circuit is open, except for the
+		first call after the backoff, which goes through as the probe.
+		"""
+		with self.lock:
+			if self.failures < self.breaker_threshold:
+				return
+			now = time.monotonic()
+			if now < self.retry_at:
+				raise TrnRpcUnavailable("transitd on {} is unavailable, retrying in {:.1f}s".format(
+					self.ip, self.retry_at - now))
+			# Let this call through as the probe, hold the others back
+			self.retry_at = now + self._backoff()
+
+	def _backoff(self):
+		n = self.failures - self.breaker_threshold
+		return min(self.backoff_base * 2 ** min(n, 16), self.backoff_max)
+
+	def failed(self):
+		with self.lock:
+			self.failures += 1
+			self.lost = True
+			if self.failures < self.breaker_threshold or self.closed:
+				return
+			backoff = self._backoff()
+			self.retry_at = time.monotonic() + backoff
+			if self.failures == self.breaker_threshold:
+				logger.error("transitd on {} is unavailable, opening circuit".format(self.ip))
+			if self.probe_timer is not None:
+				self.probe_timer.cancel()
+			if any(rpc.transport.can_ping for rpc in self.rpcs):
+				self.probe_timer = threading.Timer(backoff, self._probe)
+				self.probe_timer.daemon = True
+				self.probe_timer.start()
+
+	def succeeded(self, restarted=False, rpc=None, key=None):
+		"""
+		Records a call that got an answer. restarted is whether the
+		transport saw transitd restart. key is what rpc is writing, it is
+		not marked for resync since that write is going out anyway.
+		"""
+		with self.lock:
+			if not (self.failures or self.lost or restarted):
+				return
+			recovered = self.failures >= self.breaker_threshold
+			self.failures = 0
+			reset = self.lost or restarted
+			self.lost = False
+			if self.probe_timer is not None:
+				self.probe_timer.cancel()
+				self.probe_timer = None
+			rpcs = list(self.rpcs)
+		if reset:
+			logger.info("transitd on {} may have restarted, resyncing".format(self.ip))
+			for r in rpcs:
+				r.reset(key if r is rpc else None)
+		if recovered:
+			logger.info("transitd on {} is back, closing circuit".format(self.ip))
+		if reset or recovered:
+			for r in rpcs:
+				threading.Thread(target=r.replay, daemon=True).start()
+
+	def _probe(self):
+		with self.lock:
+			self.probe_timer = None
+			rpcs = [rpc for rpc in self.rpcs if rpc.transport.can_ping]
+		if rpcs:
+			rpcs[0].probe()
+
+	def close(self):
+		with self.lock:
+			self.closed = True
+			if self.probe_timer is not None:
+				self.probe_timer.cancel()
+				self.probe_timer = None
+
 class TrnRpc:
+	"""
+	RPC interface to the transit daemon of one droplet. Instances are
+	shared process wide through get(), and dropped with invalidate() when
+	the droplet changes.
+
+	Each instance remembers the last payload the droplet acknowledged per
+	object (vpc, net, ep, agent ep and metadata, pipeline stage), and skips
+	writes that would not change it. What is remembered is dropped when
+	transitd may have restarted, or by resync(); with force_resync
+	(MIZAR_RPC_FORCE_RESYNC=1) nothing is skipped.
+
+	Writes made with coalesce=True are queued per object for
+	coalesce_window seconds and only the newest one is sent; flush() sends
+	them right away and waits for them.
+
+	Writes that cannot reach the droplet are kept, newest per object, as
+	pending resync and replayed once the droplet's transitd is back; calls
+	fail fast while its DropletHealth circuit is open. When transitd may
+	have restarted, every acknowledged write is pending resync again.
+	resync_needed() gives the instances with writes pending, for the
+	reconciler.
+
+	Calls are carried by the transport named by transport_kind, either
+	direct ONC-RPC, the transit CLI, or an in-memory fake transitd.
+	"""
+	transport_kind = CONSTANTS.RPC_TRANSPORT
+	force_resync = CONSTANTS.RPC_FORCE_RESYNC
+	coalesce_window = CONSTANTS.RPC_COALESCE_WINDOW
+	_registry = {}
+	_registry_lock = threading.Lock()
+
+	@classmethod
+	def get(cls, ip, mac, itf='eth0', benchmark = False):
+		key = (ip, mac, itf, benchmark)
+		with cls._registry_lock:
+			if key not in cls._registry:
+				cls._registry[key] = cls(ip, mac, itf, benchmark)
+			return cls._registry[key]
+
+	@classmethod
+	def invalidate(cls, ip):
+		with cls._registry_lock:
+			rpcs = [cls._registry.pop(k) for k in list(cls._registry) if k[0] == ip]
+		for rpc in rpcs:
+			rpc.transport.close()
+		DropletHealth.drop(ip)
+
+	@classmethod
+	def forget_vpcs(cls, vnis, itfs=()):
+		"""
+		Forgets, on every droplet, the writes of the vpcs, nets and
+		endpoints of the VPCs vnis, and those to the endpoint interfaces
+		itfs, once another replica writes them.
+		"""
+		vnis = {str(vni) for vni in vnis}
+		itfs = set(itfs)
+		kinds = ("vpc", "net", "ep")
+		with cls._registry_lock:
+			rpcs = list(cls._registry.values())
+		for rpc in rpcs:
+			rpc.forget_if(lambda key: key[0] in itfs or (key[1] in kinds and key[2] in vnis))
+
+	@classmethod
+	def resync_needed(cls):
+		with cls._registry_lock:
+			rpcs = list(cls._registry.values())
+		return [rpc for rpc in rpcs if rpc.pending_resync()]
+
 	def __init__(self, ip, mac, itf='eth0', benchmark = False):
 		self.ip = ip
 		self.mac = mac
 		self.phy_itf = itf
+		self.acked = {}
+		self.acked_lock = threading.Lock()
+		self.pending = {}
+		self.pending_cond = threading.Condition()
+		self.flushing = 0
+		self.flush_timer = None
+		self.resync_pending = {}
 
-		# transitd cli commands
-		self.trn_cli = f'''/trn_bin/transit -s {self.ip} '''
-		self.trn_cli_load_transit_xdp = f'''{self.trn_cli} load-transit-xdp -i {self.phy_itf} -j'''
-		self.trn_cli_unload_transit_xdp = f'''{self.trn_cli} unload-transit-xdp -i {self.phy_itf} -j'''
-		self.trn_cli_update_vpc = f'''{self.trn_cli} update-vpc -i {self.phy_itf} -j'''
-		self.trn_cli_get_vpc = f'''{self.trn_cli} get-vpc -i {self.phy_itf} -j'''
-		self.trn_cli_delete_vpc = f'''{self.trn_cli} delete-vpc -i {self.phy_itf} -j'''
-		self.trn_cli_update_net = f'''{self.trn_cli} update-net -i {self.phy_itf} -j'''
-		self.trn_cli_get_net = f'''{self.trn_cli} get-net -i {self.phy_itf} -j'''
-		self.trn_cli_delete_net = f'''{self.trn_cli} delete-net -i {self.phy_itf} -j'''
-		self.trn_cli_update_ep = f'''{self.trn_cli} update-ep -i {self.phy_itf} -j'''
-		self.trn_cli_get_ep = f'''{self.trn_cli} get-ep -i {self.phy_itf} -j'''
-		self.trn_cli_delete_ep = f'''{self.trn_cli} delete-ep -i {self.phy_itf} -j'''
-		self.trn_cli_load_pipeline_stage = f'''{self.trn_cli} load-pipeline-stage -i {self.phy_itf} -j'''
-
-		self.trn_cli_load_transit_agent_xdp = f'''{self.trn_cli} load-agent-xdp'''
-		self.trn_cli_unload_transit_agent_xdp = f'''{self.trn_cli} unload-agent-xdp'''
-		self.trn_cli_update_agent_metadata = f'''{self.trn_cli} update-agent-metadata'''
-		self.trn_cli_get_agent_metadata = f'''{self.trn_cli} get-agent-metadata'''
-		self.trn_cli_delete_agent_metadata = f'''{self.trn_cli} delete-agent-metadata'''
-		self.trn_cli_update_agent_ep = f'''{self.trn_cli} update-agent-ep'''
-		self.trn_cli_get_agent_ep = f'''{self.trn_cli} get-agent-ep'''
-		self.trn_cli_delete_agent_ep = f'''{self.trn_cli} delete-agent-ep'''
+		self.transport = make_transport(self.transport_kind, self.ip)
+		self.health = DropletHealth.get(self.ip)
+		self.health.rpcs.add(self)
 
 		if benchmark:
 			self.xdp_path = "/trn_xdp/trn_transit_xdp_ebpf.o"
@@ -41,6 +240,189 @@ class TrnRpc:
 			self.xdp_path = "/trn_xdp/trn_transit_xdp_ebpf_debug.o"
 			self.agent_xdp_path = "/trn_xdp/trn_agent_xdp_ebpf_debug.o"
 
+	def call(self, name, proc, pack_fn, jsonconf, itf=None, key=None, cache=True):
+		"""
+		Encodes jsonconf with pack_fn and sends it to transitd as procedure
+		proc, returning the daemon's return code or None if the call failed.
+		key names the object written. Unless cache is False, the write is
+		skipped if the droplet already acknowledged the same payload for
+		it. If the droplet cannot be reached, or its circuit is open, the
+		call is kept for replay.
+		"""
+		if itf is None:
+			itf = self.phy_itf
+		try:
+			args = encode(pack_fn, itf, jsonconf)
+		except (ValueError, KeyError) as e:
+			rpc_errors.inc(name, self.ip, "encode")
+			logger.error("{} to {} failed: {}".format(name, self.ip, e))
+			return None
+		if key is not None:
+			replay = (name, proc, pack_fn, jsonconf, itf, key, cache)
+			key = (itf,) + key
+			if cache and self.is_acked(key, args):
+				rpc_skipped.inc(name, self.ip)
+				logger.debug("{}: {} unchanged on {}".format(name, key, self.ip))
+				return 0
+		logger.info("{}: {} {}".format(name, itf, json.dumps(jsonconf)))
+		rpc_payload.observe(len(args), name, self.ip)
+		start = time.monotonic()
+		try:
+			self.health.check()
+			returncode = self.transport.call(proc, itf, jsonconf, args)
+		except TrnRpcUnavailable as e:
+			rpc_errors.inc(name, self.ip, "unavailable")
+			logger.warning("{}: {}".format(name, e))
+			if key is not None:
+				self.mark_resync(key, replay)
+			return None
+		except TrnRpcError as e:
+			rpc_duration.observe(time.monotonic() - start, name, self.ip, "failed")
+			rpc_errors.inc(name, self.ip, "transport")
+			logger.error("{} to {} failed: {}".format(name, self.ip, e))
+			self.health.failed()
+			if key is not None:
+				self.mark_resync(key, replay)
+			return None
+		if returncode == 0:
+			rpc_duration.observe(time.monotonic() - start, name, self.ip, "ok")
+		else:
+			rpc_duration.observe(time.monotonic() - start, name, self.ip, "error")
+			rpc_errors.inc(name, self.ip, "rc")
+		logger.info("{} returns {}".format(name, returncode))
+		if key is not None:
+			with self.acked_lock:
+				self.resync_pending.pop(key, None)
+		self.health.succeeded(self.transport.restarted(), self, key)
+		if key is not None and cache and returncode == 0:
+			self.ack(key, args, replay)
+		return returncode
+
+	def mark_resync(self, key, call):
+		with self.acked_lock:
+			self.resync_pending[key] = call
+
+	def pending_resync(self):
+		with self.acked_lock:
+			return list(self.resync_pending.keys())
+
+	def replay(self):
+		"""
+		Sends the latest pending write of every object that could not be
+		written while the droplet was unreachable, or that a restarted
+		transitd may have lost. A write made since is not replayed.
+		"""
+		with self.acked_lock:
+			keys = list(self.resync_pending)
+		if keys:
+			logger.info("Replaying {} pending writes to {}".format(len(keys), self.ip))
+		for key in keys:
+			with self.acked_lock:
+				call = self.resync_pending.pop(key, None)
+			if call is not None:
+				self.call(*call)
+
+	def reset(self, skip=None):
+		"""
+		Marks every acknowledged write, but skip, pending resync, for a
+		transitd that may have restarted.
+		"""
+		with self.acked_lock:
+			for key, (args, call) in self.acked.items():
+				if key != skip:
+					self.resync_pending.setdefault(key, call)
+			self.acked = {}
+
+	def probe(self):
+		try:
+			self.transport.ping()
+		except TrnRpcError as e:
+			logger.info("Probe of {} failed: {}".format(self.ip, e))
+			self.health.failed()
+			return
+		self.health.succeeded(self.transport.restarted())
+
+	def queue(self, name, proc, pack_fn, jsonconf, itf=None, key=()):
+		"""
+		Queues a write for key, replacing any write for it that was not
+		sent yet. Queued writes go out together once the coalescing window
+		elapses or flush() is called.
+		"""
+		if itf is None:
+			itf = self.phy_itf
+		with self.pending_cond:
+			self.pending[(itf,) + key] = (name, proc, pack_fn, jsonconf, itf, key)
+			if self.flush_timer is None:
+				self.flush_timer = threading.Timer(self.coalesce_window, self.flush)
+				self.flush_timer.daemon = True
+				self.flush_timer.start()
+
+	def flush(self):
+		"""
+		Sends all queued writes and returns once they, and any being sent
+		by another thread, completed.
+		"""
+		with self.pending_cond:
+			if self.flush_timer is not None:
+				self.flush_timer.cancel()
+				self.flush_timer = None
+			pending, self.pending = self.pending, {}
+			self.flushing += 1
+		try:
+			for name, proc, pack_fn, jsonconf, itf, key in pending.values():
+				self.call(name, proc, pack_fn, jsonconf, itf, key)
+		finally:
+			with self.pending_cond:
+				self.flushing -= 1
+				self.pending_cond.notify_all()
+				while self.flushing:
+					self.pending_cond.wait()
+
+	def is_acked(self, key, args):
+		if TrnRpc.force_resync or not self.health.is_available():
+			return False
+		try:
+			self.transport.verify()
+		except TrnRpcError:
+			self.health.failed()
+			return False
+		# Marks what was acknowledged for resync if transitd restarted since
+		if self.transport.restarted():
+			self.health.succeeded(True, self, key)
+		with self.acked_lock:
+			acked = self.acked.get(key)
+		return acked is not None and acked[0] == args
+
+	def ack(self, key, args, call):
+		with self.acked_lock:
+			self.acked[key] = (args, call)
+
+	def forget(self, key, itf=None):
+		if itf is None:
+			itf = self.phy_itf
+		with self.pending_cond:
+			self.pending.pop((itf,) + key, None)
+		with self.acked_lock:
+			self.acked.pop((itf,) + key, None)
+			self.resync_pending.pop((itf,) + key, None)
+
+	def forget_itf(self, itf):
+		self.forget_if(lambda key: key[0] == itf)
+
+	def forget_if(self, match):
+		with self.pending_cond:
+			for key in [k for k in self.pending if match(k)]:
+				del self.pending[key]
+		with self.acked_lock:
+			for key in [k for k in self.acked if match(k)]:
+				del self.acked[key]
+			for key in [k for k in self.resync_pending if match(k)]:
+				del self.resync_pending[key]
+
+	def resync(self):
+		with self.acked_lock:
+			self.acked = {}
+
 	def get_substrate_ep_json(self, ip, mac):
 		jsonconf = {
 			"tunnel_id": "0",
@@ -51,23 +433,18 @@ class TrnRpc:
 			"remote_ips": [""],
 			"hosted_iface": ""
 		}
-		jsonconf = json.dumps(jsonconf)
 		return jsonconf
 
 	def update_substrate_ep(self, ip, mac):
 		jsonconf = self.get_substrate_ep_json(ip, mac)
-		cmd = f'''{self.trn_cli_update_ep} \'{jsonconf}\''''
-		logger.info("update_substrate_ep: {}".format(cmd))
-		returncode, text = run_cmd(cmd)
-		logger.info("returns {} {}".format(returncode, text))
+		self.call("update_substrate_ep", PROCS.UPDATE_EP, pack_ep, jsonconf,
+			key=("ep", "0", ip))
 
 	def update_agent_substrate_ep(self, ep, ip, mac):
 		itf = ep.get_veth_peer()
 		jsonconf = self.get_substrate_ep_json(ip, mac)
-		cmd = f'''{self.trn_cli_update_agent_ep} -i \'{itf}\' -j \'{jsonconf}\''''
-		logger.info("update_agent_substrate_ep: {}".format(cmd))
-		returncode, text = run_cmd(cmd)
-		logger.info("update_agent_substrate_ep returns {} {}".format(returncode, text))
+		self.call("update_agent_substrate_ep", PROCS.UPDATE_AGENT_EP, pack_ep, jsonconf, itf,
+			key=("agent_ep", "0", ip))
 
 	def delete_agent_substrate_ep(self, ep, ip):
 		itf = ep.get_veth_peer()
@@ -75,12 +452,11 @@ class TrnRpc:
 			"tunnel_id": "0",
 			"ip": ip,
 		}
-		cmd = f'''{self.trn_cli_delete_agent_ep} -i \'{itf}\' -j \'{jsonconf}\''''
-		logger.info("update_agent_substrate_ep: {}".format(cmd))
-		returncode, text = run_cmd(cmd)
-		logger.info("update_agent_substrate_ep returns {} {}".format(returncode, text))
+		self.forget(("agent_ep", "0", ip), itf)
+		self.call("delete_agent_substrate_ep", PROCS.DELETE_AGENT_EP, pack_ep_key, jsonconf, itf,
+			key=("agent_ep", "0", ip), cache=False)
 
-	def update_ep(self, ep):
+	def get_ep_json(self, ep):
 		peer = ""
 		droplet_ip = ep.get_droplet_ip()
 		# Only detail veth info if the droplet is also a host
@@ -96,14 +472,47 @@ class TrnRpc:
 			"remote_ips": ep.get_remote_ips(),
 			"hosted_iface": peer
 		}
+		return jsonconf
+
+	def update_ep(self, ep, coalesce=False):
+		jsonconf = self.get_ep_json(ep)
+		send = self.queue if coalesce else self.call
+		send("update_ep", PROCS.UPDATE_EP, pack_ep, jsonconf,
+			key=("ep", str(jsonconf["tunnel_id"]), jsonconf["ip"]))
 
-		jsonconf = json.dumps(jsonconf)
-		cmd = f'''{self.trn_cli_update_ep} \'{jsonconf}\''''
-		logger.info("update_ep: {}".format(cmd))
-		returncode, text = run_cmd(cmd)
-		logger.info("returns {} {}".format(returncode, text))
+	def update_eps_batch(self, eps, substrates=[]):
+		"""
+		Programs the substrate (ip, mac) records and then the endpoints eps
+		with as few UPDATE_EP_BATCH calls as the protocol limit allows.
+		Records the droplet already has are left out.
+		"""
+		jsonconf = [self.get_substrate_ep_json(ip, mac) for ip, mac in substrates]
+		jsonconf += [self.get_ep_json(ep) for ep in eps]
+		pending = []
+		for conf in jsonconf:
+			key = (self.phy_itf, "ep", str(conf["tunnel_id"]), conf["ip"])
+			try:
+				args = encode(pack_ep, self.phy_itf, conf)
+			except (ValueError, KeyError) as e:
+				logger.error("update_eps_batch: skipping {}: {}".format(conf["ip"], e))
+				continue
+			if not self.is_acked(key, args):
+				pending.append((key, args, conf))
+		if len(pending) < len(jsonconf):
+			rpc_skipped.inc("update_eps_batch", self.ip, value=len(jsonconf) - len(pending))
+		for i in range(0, len(pending), RPC_TRN_MAX_EP_BATCH):
+			batch = pending[i:i + RPC_TRN_MAX_EP_BATCH]
+			logger.info("update_eps_batch: {} of {} records".format(len(batch), len(jsonconf)))
+			rc = self.call("update_eps_batch", PROCS.UPDATE_EP_BATCH, pack_ep_batch,
+				[conf for _, _, conf in batch])
+			for key, args, conf in batch:
+				call = ("update_ep", PROCS.UPDATE_EP, pack_ep, conf, key[0], key[1:], True)
+				if rc == 0:
+					self.ack(key, args, call)
+				elif rc is None:
+					self.mark_resync(key, call)
 
-	def update_agent_metadata(self, ep):
+	def update_agent_metadata(self, ep, coalesce=False):
 		itf = ep.get_veth_peer()
 		jsonconf = {
 			"ep": {
@@ -127,11 +536,9 @@ class TrnRpc:
 				"iface": ep.droplet_eth
 			}
 		}
-		jsonconf = json.dumps(jsonconf)
-		cmd = f'''{self.trn_cli_update_agent_metadata} -i \'{itf}\' -j \'{jsonconf}\''''
-		logger.info("update_agent_metadata: {}".format(cmd))
-		returncode, text = run_cmd(cmd)
-		logger.info("update_agent_metadata returns {} {}".format(returncode, text))
+		send = self.queue if coalesce else self.call
+		send("update_agent_metadata", PROCS.UPDATE_AGENT_MD, pack_agent_md, jsonconf, itf,
+			key=("agent_md",))
 
 	def load_transit_agent_xdp(self, ep):
 		itf = ep.veth_peer
@@ -140,56 +547,45 @@ class TrnRpc:
 			"xdp_path": self.agent_xdp_path,
 			"pcapfile": agent_pcap_file
 		}
-		jsonconf = json.dumps(jsonconf)
-		cmd = f'''{self.trn_cli_load_transit_agent_xdp} -i \'{itf}\' -j \'{jsonconf}\' '''
-		logger.info("load_transit_agent_xdp: {}".format(cmd))
-		returncode, text = run_cmd(cmd)
-		logger.info("load_transit_agent_xdp returns {} {}".format(returncode, text))
+		# A freshly loaded agent starts with empty maps
+		self.forget_itf(itf)
+		self.call("load_transit_agent_xdp", PROCS.LOAD_TRANSIT_AGENT_XDP, pack_xdp_intf, jsonconf, itf)
 
 	def load_transit_xdp_pipeline_stage(self, stage, obj_file):
 		jsonconf = {
 			"xdp_path": obj_file,
 			"stage": stage
 		}
-		jsonconf = json.dumps(jsonconf)
-		cmd = f'''{self.trn_cli_load_pipeline_stage} \'{jsonconf}\' '''
-		logger.info("load_transit_xdp_pipeline_stage: {}".format(cmd))
-		returncode, text = run_cmd(cmd)
-		logger.info("load_transit_xdp_pipeline_stage returns {} {}".format(returncode, text))
+		self.call("load_transit_xdp_pipeline_stage", PROCS.LOAD_TRANSIT_XDP_PIPELINE_STAGE,
+			pack_ebpf_prog, jsonconf, key=("stage", stage))
 
 	def delete_substrate_ep(self, ip):
 		jsonconf = {
 			"tunnel_id": "0",
 			"ip": ip,
 		}
-		jsonconf = json.dumps(jsonconf)
-		cmd = f'''{self.trn_cli_delete_ep} \'{jsonconf}\''''
-		logger.info("delete_substrate_ep: {}".format(cmd))
-		returncode, text = run_cmd(cmd)
-		logger.info("delete_substrate_ep returns {} {}".format(returncode, text))
+		self.forget(("ep", "0", ip))
+		self.call("delete_substrate_ep", PROCS.DELETE_EP, pack_ep_key, jsonconf,
+			key=("ep", "0", ip), cache=False)
 
 	def delete_ep(self, ep):
 		jsonconf = {
 			"tunnel_id": ep.get_tunnel_id(),
 			"ip": ep.get_ip(),
 		}
-		jsonconf = json.dumps(jsonconf)
-		cmd = f'''{self.trn_cli_delete_ep} \'{jsonconf}\''''
 		if ep.droplet != "":
 			log_string = "delete_ep {}".format(ep.ip)
 		else:
 			log_string = "delete_ep for a phantom ep {}".format(ep.ip)
 		logger.info(log_string)
-		returncode, text = run_cmd(cmd)
-		logger.info("returns {} {}".format(returncode, text))
+		key = ("ep", str(jsonconf["tunnel_id"]), jsonconf["ip"])
+		self.forget(key)
+		self.call("delete_ep", PROCS.DELETE_EP, pack_ep_key, jsonconf, key=key, cache=False)
 
 	def unload_transit_agent_xdp(self, ep):
 		itf = ep.veth_peer
-		jsonconf = '\'{}\''
-		cmd = f'''{self.trn_cli_unload_transit_agent_xdp} -i \'{itf}\' -j {jsonconf} '''
-		logger.info("unload_transit_agent_xdp: {}".format(cmd))
-		returncode, text = run_cmd(cmd)
-		logger.info("unload_transit_agent_xdp returns {} {}".format(returncode, text))
+		self.forget_itf(itf)
+		self.call("unload_transit_agent_xdp", PROCS.UNLOAD_TRANSIT_AGENT_XDP, pack_intf, {}, itf)
 
 	def update_vpc(self, bouncer):
 		if len(bouncer.get_divider_ips()) < 1:
@@ -199,21 +595,16 @@ class TrnRpc:
 			"tunnel_id": bouncer.vni,
 			"routers_ips": bouncer.get_divider_ips()
 		}
-		jsonconf = json.dumps(jsonconf)
-		cmd = f'''{self.trn_cli_update_vpc} \'{jsonconf}\''''
-		logger.info("update_vpc: {}".format(cmd))
-		returncode, text = run_cmd(cmd)
-		logger.info("update_vpc returns {} {}".format(returncode, text))
+		self.call("update_vpc", PROCS.UPDATE_VPC, pack_vpc, jsonconf,
+			key=("vpc", str(bouncer.vni)))
 
 	def delete_vpc(self, bouncer):
 		jsonconf = {
 			"tunnel_id": bouncer.vni
 		}
-		jsonconf = json.dumps(jsonconf)
-		cmd = f'''{self.trn_cli_delete_vpc} \'{jsonconf}\''''
-		logger.info("delete_vpc: {}".format(cmd))
-		returncode, text = run_cmd(cmd)
-		logger.info("delete_vpc returns {} {}".format(returncode, text))
+		key = ("vpc", str(bouncer.vni))
+		self.forget(key)
+		self.call("delete_vpc", PROCS.DELETE_VPC, pack_vpc_key, jsonconf, key=key, cache=False)
 
 	def update_net(self, net):
 		if len(net.get_bouncers_ips()) < 1:
@@ -225,11 +616,8 @@ class TrnRpc:
 			"prefixlen": net.get_prefixlen(),
 			"switches_ips": net.get_bouncers_ips()
 		}
-		jsonconf = json.dumps(jsonconf)
-		cmd = f'''{self.trn_cli_update_net} \'{jsonconf}\''''
-		logger.info("update_net: {}".format(cmd))
-		returncode, text = run_cmd(cmd)
-		logger.info("update_net returns {} {}".format(returncode, text))
+		self.call("update_net", PROCS.UPDATE_NET, pack_net, jsonconf,
+			key=("net", str(net.vni), net.get_nip(), str(net.get_prefixlen())))
 
 	def delete_net(self, net):
 		jsonconf = {
@@ -237,8 +625,122 @@ class TrnRpc:
 			"nip": net.get_nip(),
 			"prefixlen": net.get_prefixlen()
 		}
-		jsonconf = json.dumps(jsonconf)
-		cmd = f'''{self.trn_cli_delete_net} \'{jsonconf}\''''
-		logger.info("delete_net: {}".format(cmd))
-		returncode, text = run_cmd(cmd)
-		logger.info("delete_net returns {} {}".format(returncode, text))
+		key = ("net", str(net.vni), net.get_nip(), str(net.get_prefixlen()))
+		self.forget(key)
+		self.call("delete_net", PROCS.DELETE_NET, pack_net_key, jsonconf, key=key, cache=False)
+
+
+class AsyncTrnRpc:
+	"""
+	Awaitable counterpart of TrnRpc. Every TrnRpc method is exposed as a
+	coroutine, and run() executes any callable that talks to this droplet.
+	Calls are bounded by a per droplet and a global in-flight limit, which
+	hold across event loops and threads. A droplet's calls beyond its limit
+	wait in its own queue rather than on a worker, so the workers always
+	serve the droplets that can make progress.
+	"""
+	max_inflight_per_droplet = CONSTANTS.RPC_MAX_INFLIGHT_PER_DROPLET
+	max_inflight = CONSTANTS.RPC_MAX_INFLIGHT
+	_executor = None
+	_inflight = {}
+	_pending = {}
+	_limits_lock = threading.Lock()
+
+	@classmethod
+	def configure(cls, max_inflight_per_droplet=None, max_inflight=None):
+		with cls._limits_lock:
+			if max_inflight_per_droplet is not None:
+				cls.max_inflight_per_droplet = max_inflight_per_droplet
+			if max_inflight is not None:
+				cls.max_inflight = max_inflight
+				if cls._executor is not None:
+					# Calls already handed over still run on the old workers
+					cls._executor.shutdown(wait=False)
+					cls._executor = None
+
+	def __init__(self, ip, mac, itf='eth0', benchmark = False):
+		self.ip = ip
+		self.rpc = TrnRpc.get(ip, mac, itf, benchmark)
+
+	def __getattr__(self, name):
+		fn = getattr(self.rpc, name)
+		async def call(*args, **kwargs):
+			return await self.run(fn, *args, **kwargs)
+		return call
+
+	async def run(self, fn, *args, **kwargs):
+		return await asyncio.wrap_future(self.submit(functools.partial(fn, *args, **kwargs)))
+
+	def submit(self, fn):
+		"""
+		Runs fn once this droplet is under its limit, and returns the
+		concurrent.futures.Future of its result.
+		"""
+		cls = AsyncTrnRpc
+		fut = Future()
+		with cls._limits_lock:
+			if cls._inflight.get(self.ip, 0) < cls.max_inflight_per_droplet:
+				cls._inflight[self.ip] = cls._inflight.get(self.ip, 0) + 1
+				cls._start(self.ip, fn, fut)
+			else:
+				cls._pending.setdefault(self.ip, deque()).append((fn, fut))
+		return fut
+
+	@classmethod
+	def _start(cls, ip, fn, fut):
+		# Called with _limits_lock held
+		if cls._executor is None:
+			cls._executor = ThreadPoolExecutor(max_workers=cls.max_inflight,
+				thread_name_prefix='trn-rpc')
+		cls._executor.submit(cls._run_one, ip, fn, fut)
+
+	@classmethod
+	def _run_one(cls, ip, fn, fut):
+		try:
+			if fut.set_running_or_notify_cancel():
+				try:
+					fut.set_result(fn())
+				except BaseException as e:
+					fut.set_exception(e)
+		finally:
+			with cls._limits_lock:
+				pending = cls._pending.get(ip)
+				if pending:
+					# The next call of the droplet goes behind the other
+					# droplets' calls, it does not keep the worker
+					cls._start(ip, *pending.popleft())
+					if not pending:
+						del cls._pending[ip]
+				elif cls._inflight[ip] > 1:
+					cls._inflight[ip] -= 1
+				else:
+					del cls._inflight[ip]
+
+def flush_rpcs(rpcs):
+	"""
+	Sends the coalesced writes queued on each of the rpcs and waits for
+	them, so an object is marked provisioned only once its droplets have
+	what it depends on.
+	"""
+	for rpc in set(rpcs):
+		rpc.flush()
+
+def run_rpcs(coros):
+	"""
+	Awaits coros together from synchronous code and returns their results.
+	When the calling thread already runs an event loop (async kopf
+	handlers), the coroutines are driven from a helper thread instead.
+	"""
+	coros = list(coros)
+	if not coros:
+		return []
+
+	async def gather():
+		return await asyncio.gather(*coros)
+
+	try:
+		asyncio.get_running_loop()
+	except RuntimeError:
+		return asyncio.run(gather())
+	with ThreadPoolExecutor(max_workers=1) as t:
+		return t.submit(asyncio.run, gather()).result()
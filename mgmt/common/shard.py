@@ -0,0 +1,310 @@
+import datetime
+import hashlib
+import logging
+import os
+import queue
+import socket
+import threading
+import time
+import zlib
+from kubernetes import client
+from kubernetes.client.rest import ApiException
+from common.constants import *
+from common.informer import list_pages
+from store.operator_store import OprStore, RECONCILED
+
+logger = logging.getLogger()
+
+MEMBER_LABEL = "mizar-operator-member"
+SHARD_LABEL = "mizar-operator-shard"
+HANDOFF_ANNOTATION = "mizar.com/shard-handoff"
+# VPC or net of a core Service, which has no spec.vpc
+VPC_ANNOTATION = "mizar.com/vpc"
+NET_ANNOTATION = "mizar.com/net"
+
+# Status of the sharded objects that need nothing more from their owner
+SETTLED = {k: v for k, v in RECONCILED.items() if k != RESOURCES.droplets}
+
+def _now():
+	return datetime.datetime.now(datetime.timezone.utc)
+
+def _score(shard, member):
+	return hashlib.md5("{}/{}".format(shard, member).encode()).digest()
+
+class VpcShards:
+	"""
+	Splits the VPCs, with all their nets, endpoints, bouncers and dividers,
+	between the operator replicas. VPCs hash to one of
+	OPERATOR_SHARDS shards, and each shard is held by one replica through a
+	Kubernetes lease. Every replica also keeps a membership lease, and wants
+	the shards it wins by rendezvous hashing over the live members, so a
+	replica joining or leaving only moves its share of the shards. A replica
+	releases the shards it no longer wants and takes the free or expired
+	ones it wants; on_acquire and on_release callbacks get the shards that
+	changed hands. They run in order on a worker thread of their own, so
+	that loading a shard never holds up the lease renewals.
+
+	The identity of a replica is its pod name, which a StatefulSet keeps
+	across restarts, so a restarted replica wins back the same shards.
+
+	Droplets are not sharded, every replica keeps all of them. With
+	OPERATOR_SHARDS at 0 sharding is off and the replica owns everything.
+	"""
+	def __init__(self, n=CONSTANTS.OPERATOR_SHARDS, identity=None):
+		self.n = n
+		self.identity = identity or os.environ.get("POD_NAME", socket.gethostname())
+		self.owned = frozenset()
+		self.members = [self.identity]
+		self.on_acquire = []
+		self.on_release = []
+		self.serving = False
+		self.renewed = 0
+		self.api = None
+		self.handoffs = queue.Queue()
+
+	@property
+	def enabled(self):
+		return self.n > 0
+
+	def shard_of(self, vpc):
+		return zlib.crc32(vpc.encode()) % self.n
+
+	def owns(self, vpc):
+		if not self.enabled:
+			return True
+		return vpc is not None and self.shard_of(vpc) in self.owned
+
+	def vpc_of(self, plurals, name, spec):
+		if plurals == RESOURCES.vpcs:
+			return name
+		return spec.get('vpc') or OBJ_DEFAULTS.default_ep_vpc
+
+	def vpc_of_service(self, meta):
+		"""
+		The VPC of a core Service or Endpoints: from its annotation, else
+		that of the scaled endpoint made for the service, else that of the
+		net of its annotation or the default net. None if the store has
+		neither, they are then in a VPC of another replica.
+		"""
+		annotations = meta.get('annotations') or {}
+		if annotations.get(VPC_ANNOTATION):
+			return annotations[VPC_ANNOTATION]
+		store = OprStore()
+		ep = store.get_ep(meta['name'])
+		if ep is not None:
+			return ep.vpc
+		net = store.get_net(annotations.get(NET_ANNOTATION) or OBJ_DEFAULTS.default_ep_net)
+		return net.vpc if net is not None else None
+
+	def owns_body(self, body):
+		if not self.enabled:
+			return True
+		kind = body.get('kind')
+		meta = body['metadata']
+		if kind in ('Service', 'Endpoints'):
+			return self.owns(self.vpc_of_service(meta))
+		plurals = RESOURCES.vpcs if kind == 'Vpc' else None
+		return self.owns(self.vpc_of(plurals, meta['name'], body.get('spec') or {}))
+
+	def lists(self, plurals, name, spec, shards=None):
+		"""
+		Whether a listed object belongs in this replica's store. Given the
+		shards being taken over, only the objects of those shards are
+		listed, and no droplets.
+		"""
+		if not self.enabled:
+			return True
+		if plurals not in SETTLED:
+			return shards is None
+		if shards is None:
+			shards = self.owned
+		return self.shard_of(self.vpc_of(plurals, name, spec)) in shards
+
+	def start(self):
+		"""
+		Joins the replicas and takes a first share of the shards, then keeps
+		the leases from a daemon thread. The shards only move once serve()
+		is called, after the first share is loaded.
+		"""
+		if not self.enabled:
+			return
+		self.api = client.CoordinationV1Api()
+		self.tick()
+		t = threading.Thread(target=self.run, name='vpc-shards', daemon=True)
+		t.start()
+		t = threading.Thread(target=self.run_handoffs, name='vpc-shards-handoff', daemon=True)
+		t.start()
+
+	def serve(self):
+		self.serving = True
+
+	def run(self):
+		while True:
+			time.sleep(CONSTANTS.SHARD_RENEW_INTERVAL)
+			try:
+				self.tick(rebalance=self.serving)
+			except Exception as e:
+				logger.error("Shard lease renewal failed: {}".format(e))
+				# Another replica may hold them by now
+				if time.monotonic() - self.renewed > CONSTANTS.SHARD_LEASE_DURATION:
+					self._set_owned(frozenset())
+
+	def run_handoffs(self):
+		while True:
+			fn, shards = self.handoffs.get()
+			try:
+				fn(shards)
+			except Exception as e:
+				logger.error("Shard handoff of {} failed: {}".format(sorted(shards), e))
+
+	def tick(self, rebalance=True):
+		now = _now()
+		self._hold(self._member_lease(), MEMBER_LABEL, now)
+		self.members = sorted(set(self._live(MEMBER_LABEL, now)) | {self.identity})
+		if rebalance:
+			wanted = {s for s in range(self.n)
+				if max(self.members, key=lambda m: _score(s, m)) == self.identity}
+		else:
+			wanted = set(self.owned)
+
+		leases = {l.metadata.name: l for l in self._list(SHARD_LABEL)}
+		owned = set()
+		for s in range(self.n):
+			name = self._shard_lease(s)
+			lease = leases.get(name)
+			holder = lease.spec.holder_identity if lease else None
+			if s in wanted:
+				if holder == self.identity or not self._valid(lease, now):
+					if self._hold(name, SHARD_LABEL, now, lease):
+						owned.add(s)
+			elif holder == self.identity and self._valid(lease, now):
+				# Hand over, the replica wanting it takes it on its next tick
+				self._release(lease)
+		self.renewed = time.monotonic()
+		self._set_owned(frozenset(owned))
+
+	def _set_owned(self, owned):
+		gained = owned - self.owned
+		lost = self.owned - owned
+		# Stop handling lost shards before their new owner can start
+		self.owned = owned
+		if lost:
+			logger.info("Released VPC shards {}".format(sorted(lost)))
+			for fn in self.on_release:
+				self.handoffs.put((fn, lost))
+		if gained:
+			logger.info("Acquired VPC shards {}".format(sorted(gained)))
+			for fn in self.on_acquire:
+				self.handoffs.put((fn, gained))
+
+	def _member_lease(self):
+		return "{}-{}".format(MEMBER_LABEL, self.identity)
+
+	def _shard_lease(self, s):
+		return "{}-{}".format(SHARD_LABEL, s)
+
+	def _valid(self, lease, now):
+		if lease is None or not lease.spec.holder_identity or not lease.spec.renew_time:
+			return False
+		expiry = lease.spec.renew_time + datetime.timedelta(seconds=lease.spec.lease_duration_seconds)
+		return expiry > now
+
+	def _live(self, label, now):
+		return [l.spec.holder_identity for l in self._list(label) if self._valid(l, now)]
+
+	def _list(self, label):
+		return self.api.list_namespaced_lease("default", label_selector="app={}".format(label)).items
+
+	def _hold(self, name, label, now, lease=None):
+		"""
+		Creates or renews the lease name for this replica. Returns False if
+		another replica updated it first.
+		"""
+		try:
+			if lease is None:
+				lease = self.api.read_namespaced_lease(name, "default")
+		except ApiException as e:
+			if e.status != 404:
+				raise
+			lease = None
+		if lease is None:
+			body = client.V1Lease(
+				metadata=client.V1ObjectMeta(name=name, labels={"app": label}),
+				spec=client.V1LeaseSpec(
+					holder_identity=self.identity,
+					lease_duration_seconds=CONSTANTS.SHARD_LEASE_DURATION,
+					acquire_time=now,
+					renew_time=now))
+			try:
+				self.api.create_namespaced_lease("default", body)
+			except ApiException as e:
+				if e.status == 409:
+					return False
+				raise
+			return True
+		if lease.spec.holder_identity != self.identity:
+			lease.spec.holder_identity = self.identity
+			lease.spec.acquire_time = now
+			lease.spec.lease_transitions = (lease.spec.lease_transitions or 0) + 1
+		lease.spec.renew_time = now
+		lease.spec.lease_duration_seconds = CONSTANTS.SHARD_LEASE_DURATION
+		try:
+			# Carries the resourceVersion read, so racing replicas conflict
+			self.api.replace_namespaced_lease(name, "default", lease)
+		except ApiException as e:
+			if e.status == 409:
+				return False
+			raise
+		return True
+
+	def _release(self, lease):
+		lease.spec.holder_identity = None
+		lease.spec.renew_time = None
+		try:
+			self.api.replace_namespaced_lease(lease.metadata.name, "default", lease)
+		except ApiException as e:
+			if e.status != 409:
+				raise
+
+	def nudge(self, obj_api, shards):
+		"""
+		Annotates the unsettled objects of shards, so that their handlers
+		run again on this replica for whatever happened during the handoff.
+		"""
+		stamp = "{}/{}".format(self.identity, time.time())
+		for plurals, settled in SETTLED.items():
+			for items, rv in list_pages(obj_api, plurals):
+				for v in items:
+					name = v['metadata']['name']
+					spec = v.get('spec') or {}
+					if spec.get('status') == settled or self.shard_of(self.vpc_of(plurals, name, spec)) not in shards:
+						continue
+					nudge_obj(obj_api, plurals, name, HANDOFF_ANNOTATION, stamp)
+
+def nudge_obj(obj_api, plurals, name, annotation, stamp):
+	"""
+	Sets annotation of an object to stamp, so that its handlers run again.
+	"""
+	try:
+		obj_api.patch_namespaced_custom_object(
+			group="mizar.com",
+			version="v1",
+			namespace="default",
+			plural=plurals,
+			name=name,
+			body={"metadata": {"annotations": {annotation: stamp}}})
+	except ApiException as e:
+		logger.info("Could not nudge {} {}: {}".format(plurals, name, e.status))
+
+SHARDS = VpcShards()
+
+def owned(when=None):
+	"""
+	Returns a kopf when= filter passing the objects of the VPCs this
+	replica owns that also pass when.
+	"""
+	def fn(body, **kwargs):
+		if not SHARDS.owns_body(body):
+			return False
+		return when is None or when(body=body, **kwargs)
+	return fn
@@ -0,0 +1,211 @@
+import itertools
+import logging
+import random
+import socket
+import struct
+import threading
+import time
+from common.trn_rpc_protocol import *
+
+logger = logging.getLogger()
+
+# ONC-RPC (RFC 5531) message constants
+RPC_VERSION = 2
+MSG_CALL = 0
+MSG_REPLY = 1
+MSG_ACCEPTED = 0
+ACCEPT_SUCCESS = 0
+AUTH_NONE = 0
+LAST_FRAGMENT = 0x80000000
+
+NULLPROC = 0
+
+PMAP_PORT = 111
+PMAP_PROG = 100000
+PMAP_VERS = 2
+PMAPPROC_GETPORT = 3
+IPPROTO_TCP = 6
+
+class TrnRpcError(Exception):
+	pass
+
+class TrnRpcUnavailable(TrnRpcError):
+	pass
+
+class TrnRpcClient:
+	"""
+	Talks to transitd over persistent ONC-RPC/TCP connections instead of
+	forking the transit CLI for each call. One client is kept per droplet
+	ip and holds that droplet's connections.
+
+	A lost connection may be a restarted transitd that forgot everything
+	it was given; take_lost() tells whether one was lost since it was last
+	asked. verify() pings the droplet if a connection was lost or nothing
+	was heard from it lately, to find out whether it is still there.
+	"""
+	_clients = {}
+	_clients_lock = threading.Lock()
+
+	@classmethod
+	def get(cls, ip):
+		with cls._clients_lock:
+			if ip not in cls._clients:
+				cls._clients[ip] = cls(ip)
+			return cls._clients[ip]
+
+	@classmethod
+	def invalidate(cls, ip):
+		with cls._clients_lock:
+			client = cls._clients.pop(ip, None)
+		if client is not None:
+			client.close()
+
+	def __init__(self, ip, timeout=10):
+		self.ip = ip
+		self.timeout = timeout
+		self.idle = []
+		self.closed = False
+		self.lost = False
+		self.heard = 0
+		self.xid = itertools.count(random.getrandbits(31))
+		self.lock = threading.Lock()
+
+	def call(self, proc, args):
+		"""
+		Calls procedure proc of the transit program with already encoded
+		args and returns the encoded result. The connection is re-established
+		once if the cached one turns out to be stale.
+		"""
+		for attempt in range(2):
+			sock = None
+			try:
+				sock = self._acquire()
+				result = self._call(sock, RPC_TRANSIT_REMOTE_PROTOCOL,
+					RPC_TRANSIT_ALFAZERO, proc, args)
+			except TrnRpcError:
+				self._discard(sock)
+				raise
+			except (OSError, EOFError) as e:
+				self._discard(sock)
+				with self.lock:
+					self.lost = True
+				if attempt:
+					raise TrnRpcError("rpc {} to {} failed: {}".format(proc, self.ip, e))
+				continue
+			self._release(sock)
+			with self.lock:
+				self.heard = time.monotonic()
+			return result
+
+	def call_int(self, proc, args):
+		return XdrUnpacker(self.call(proc, args)).unpack_int()
+
+	def ping(self):
+		self.call(NULLPROC, b'')
+
+	def verify(self, max_age):
+		with self.lock:
+			stale = self.lost or time.monotonic() - self.heard > max_age
+		if stale:
+			self.ping()
+
+	def take_lost(self):
+		with self.lock:
+			lost, self.lost = self.lost, False
+		return lost
+
+	def close(self):
+		with self.lock:
+			self.closed = True
+			idle, self.idle = self.idle, []
+		for sock in idle:
+			self._discard(sock)
+
+	def _acquire(self):
+		# Concurrent callers each get their own connection; idle ones are
+		# kept for reuse, so the pool grows to the peak in-flight count.
+		with self.lock:
+			if self.idle:
+				return self.idle.pop()
+		return self._connect()
+
+	def _release(self, sock):
+		with self.lock:
+			if not self.closed:
+				self.idle.append(sock)
+				return
+		self._discard(sock)
+
+	def _discard(self, sock):
+		if sock is not None:
+			try:
+				sock.close()
+			except OSError:
+				pass
+
+	def _connect(self):
+		port = self._getport()
+		logger.info("Connecting to transitd at {}:{}".format(self.ip, port))
+		return socket.create_connection((self.ip, port), timeout=self.timeout)
+
+	def _getport(self):
+		p = XdrPacker()
+		p.pack_uint(RPC_TRANSIT_REMOTE_PROTOCOL)
+		p.pack_uint(RPC_TRANSIT_ALFAZERO)
+		p.pack_uint(IPPROTO_TCP)
+		p.pack_uint(0)
+		with socket.create_connection((self.ip, PMAP_PORT), timeout=self.timeout) as s:
+			port = XdrUnpacker(self._call(s, PMAP_PROG, PMAP_VERS,
+				PMAPPROC_GETPORT, p.get_buffer())).unpack_uint()
+		if port == 0:
+			raise TrnRpcError("transitd is not registered on {}".format(self.ip))
+		return port
+
+	def _call(self, sock, prog, vers, proc, args):
+		xid = next(self.xid) & 0xffffffff
+		p = XdrPacker()
+		p.pack_uint(xid)
+		p.pack_uint(MSG_CALL)
+		p.pack_uint(RPC_VERSION)
+		p.pack_uint(prog)
+		p.pack_uint(vers)
+		p.pack_uint(proc)
+		# AUTH_NONE credentials and verifier
+		for _ in range(2):
+			p.pack_uint(AUTH_NONE)
+			p.pack_uint(0)
+		msg = p.get_buffer() + args
+		sock.sendall(struct.pack('>I', LAST_FRAGMENT | len(msg)) + msg)
+
+		while True:
+			u = XdrUnpacker(self._recv_record(sock))
+			if u.unpack_uint() == xid:
+				break
+		if u.unpack_uint() != MSG_REPLY:
+			raise TrnRpcError("unexpected message type from {}".format(self.ip))
+		if u.unpack_uint() != MSG_ACCEPTED:
+			raise TrnRpcError("rpc {} denied by {}".format(proc, self.ip))
+		u.unpack_uint()
+		u.unpack_opaque()
+		stat = u.unpack_uint()
+		if stat != ACCEPT_SUCCESS:
+			raise TrnRpcError("rpc {} not accepted by {}, status {}".format(proc, self.ip, stat))
+		return u.data[u.pos:]
+
+	def _recv_record(self, sock):
+		record = []
+		last = False
+		while not last:
+			header = struct.unpack('>I', self._recv_exact(sock, 4))[0]
+			last = bool(header & LAST_FRAGMENT)
+			record.append(self._recv_exact(sock, header & ~LAST_FRAGMENT))
+		return b''.join(record)
+
+	def _recv_exact(self, sock, n):
+		buf = bytearray()
+		while len(buf) < n:
+			chunk = sock.recv(n - len(buf))
+			if not chunk:
+				raise EOFError("connection closed by {}".format(self.ip))
+			buf.extend(chunk)
+		return bytes(buf)
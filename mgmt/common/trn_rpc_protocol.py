@@ -0,0 +1,226 @@
+import socket
+import struct
+
+# Python counterpart of src/rpcgen/trn_rpc_protocol.x. Structures are
+# encoded from the same JSON-style configuration dicts the transit CLI
+# accepts, and converted exactly as src/cli/trn_cli_common.c does.
+
+RPC_TRANSIT_REMOTE_PROTOCOL = 0x20009051
+RPC_TRANSIT_ALFAZERO = 1
+
+RPC_TRN_MAX_REMOTE_IPS = 256
+RPC_TRN_MAX_NET_SWITCHES = 256
+RPC_TRN_MAX_VPC_ROUTERS = 256
+RPC_TRN_MAX_EP_BATCH = 1024
+RPC_TRN_MAX_INTF_LEN = 20
+RPC_TRN_MAX_PATH_LEN = 256
+
+RPC_TRN_WARN = 1
+RPC_TRN_ERROR = 2
+RPC_TRN_FATAL = 3
+RPC_TRN_NOT_IMPLEMENTED = 4
+
+class PROCS:
+	UPDATE_VPC = 1
+	UPDATE_NET = 2
+	UPDATE_EP = 3
+	UPDATE_AGENT_EP = 4
+	UPDATE_AGENT_MD = 5
+	DELETE_VPC = 6
+	DELETE_NET = 7
+	DELETE_EP = 8
+	DELETE_AGENT_EP = 9
+	DELETE_AGENT_MD = 10
+	GET_VPC = 11
+	GET_NET = 12
+	GET_EP = 13
+	GET_AGENT_EP = 14
+	GET_AGENT_MD = 15
+	LOAD_TRANSIT_XDP = 16
+	LOAD_TRANSIT_AGENT_XDP = 17
+	UNLOAD_TRANSIT_XDP = 18
+	UNLOAD_TRANSIT_AGENT_XDP = 19
+	LOAD_TRANSIT_XDP_PIPELINE_STAGE = 20
+	UNLOAD_TRANSIT_XDP_PIPELINE_STAGE = 21
+	UPDATE_EP_BATCH = 22
+
+PIPELINE_STAGES = {
+	"ON_XDP_TX": 0,
+	"ON_XDP_PASS": 1,
+	"ON_XDP_REDIRECT": 2,
+	"ON_XDP_DROP": 3,
+	"ON_XDP_SCALED_EP": 4
+}
+
+class XdrPacker:
+	def __init__(self):
+		self.parts = []
+
+	def get_buffer(self):
+		return b''.join(self.parts)
+
+	def pack_uint(self, x):
+		self.parts.append(struct.pack('>I', x & 0xffffffff))
+
+	def pack_int(self, x):
+		self.parts.append(struct.pack('>i', x))
+
+	def pack_uhyper(self, x):
+		self.parts.append(struct.pack('>Q', x & 0xffffffffffffffff))
+
+	def pack_opaque(self, data):
+		n = len(data)
+		self.pack_uint(n)
+		self.parts.append(data)
+		self.parts.append(b'\0' * ((4 - n % 4) % 4))
+
+	def pack_string(self, s, maxlen):
+		data = (s or "").encode()
+		if len(data) > maxlen:
+			raise ValueError("string '{}' exceeds {} bytes".format(s, maxlen))
+		self.pack_opaque(data)
+
+	def pack_uint_array(self, values, maxlen):
+		values = values[:maxlen]
+		self.pack_uint(len(values))
+		for v in values:
+			self.pack_uint(v)
+
+	def pack_uchar_vector(self, values):
+		# rpcgen encodes each unsigned char of a fixed array as a full unit
+		for v in values:
+			self.pack_uint(v)
+
+class XdrUnpacker:
+	def __init__(self, data):
+		self.data = data
+		self.pos = 0
+
+	def unpack_uint(self):
+		x = struct.unpack_from('>I', self.data, self.pos)[0]
+		self.pos += 4
+		return x
+
+	def unpack_int(self):
+		x = struct.unpack_from('>i', self.data, self.pos)[0]
+		self.pos += 4
+		return x
+
+	def unpack_opaque(self):
+		n = self.unpack_uint()
+		data = self.data[self.pos:self.pos + n]
+		self.pos += n + (4 - n % 4) % 4
+		return data
+
+def ip_to_u32(ip):
+	# The CLI copies sin_addr.s_addr verbatim, so the value is the
+	# network-order address read in host byte order.
+	if not ip:
+		return 0
+	return struct.unpack('=I', socket.inet_aton(ip))[0]
+
+class IpArray(tuple):
+	"""
+	IP address list carried by many payloads, like the switches of a net,
+	XDR encoded once instead of for every payload.
+	"""
+	def __new__(cls, ips, maxlen):
+		self = super().__new__(cls, ips)
+		p = XdrPacker()
+		p.pack_uint_array([ip_to_u32(ip) for ip in self], maxlen)
+		self.maxlen = maxlen
+		self.xdr = p.get_buffer()
+		return self
+
+def pack_ip_array(p, ips, maxlen):
+	if isinstance(ips, IpArray) and ips.maxlen == maxlen:
+		p.parts.append(ips.xdr)
+	else:
+		p.pack_uint_array([ip_to_u32(ip) for ip in ips], maxlen)
+
+def mac_to_bytes(mac):
+	octets = [int(o, 16) for o in mac.split(':')]
+	if len(octets) != 6:
+		raise ValueError("Invalid MAC {}".format(mac))
+	return octets
+
+def _tunid(conf):
+	return int(conf.get("tunnel_id", "0") or 0)
+
+def pack_vpc(p, itf, conf):
+	p.pack_string(itf, RPC_TRN_MAX_INTF_LEN)
+	p.pack_uhyper(_tunid(conf))
+	pack_ip_array(p, conf.get("routers_ips", []), RPC_TRN_MAX_VPC_ROUTERS)
+
+def pack_vpc_key(p, itf, conf):
+	p.pack_string(itf, RPC_TRN_MAX_INTF_LEN)
+	p.pack_uhyper(_tunid(conf))
+
+def pack_net(p, itf, conf):
+	p.pack_string(itf, RPC_TRN_MAX_INTF_LEN)
+	p.pack_uint(int(conf["prefixlen"]))
+	p.pack_uhyper(_tunid(conf))
+	p.pack_uint(ip_to_u32(conf["nip"]))
+	pack_ip_array(p, conf.get("switches_ips", []), RPC_TRN_MAX_NET_SWITCHES)
+
+def pack_net_key(p, itf, conf):
+	p.pack_string(itf, RPC_TRN_MAX_INTF_LEN)
+	p.pack_uint(int(conf["prefixlen"]))
+	p.pack_uhyper(_tunid(conf))
+	p.pack_uint(ip_to_u32(conf["nip"]))
+
+def pack_ep(p, itf, conf):
+	p.pack_string(itf, RPC_TRN_MAX_INTF_LEN)
+	p.pack_uint(ip_to_u32(conf["ip"]))
+	p.pack_uint(int(conf.get("eptype", "0") or 0))
+	pack_ip_array(p, conf.get("remote_ips", []), RPC_TRN_MAX_REMOTE_IPS)
+	p.pack_uchar_vector(mac_to_bytes(conf["mac"]))
+	p.pack_string(conf.get("hosted_iface", ""), RPC_TRN_MAX_INTF_LEN)
+	p.pack_string(conf.get("veth", ""), RPC_TRN_MAX_INTF_LEN)
+	p.pack_uhyper(_tunid(conf))
+
+def pack_ep_batch(p, itf, conf):
+	if len(conf) > RPC_TRN_MAX_EP_BATCH:
+		raise ValueError("batch of {} endpoints exceeds {}".format(len(conf), RPC_TRN_MAX_EP_BATCH))
+	p.pack_string(itf, RPC_TRN_MAX_INTF_LEN)
+	p.pack_uint(len(conf))
+	for ep in conf:
+		pack_ep(p, itf, ep)
+
+def pack_ep_key(p, itf, conf):
+	p.pack_string(itf, RPC_TRN_MAX_INTF_LEN)
+	p.pack_uhyper(_tunid(conf))
+	p.pack_uint(ip_to_u32(conf["ip"]))
+
+def pack_tun_intf(p, conf):
+	p.pack_string(conf["iface"], RPC_TRN_MAX_INTF_LEN)
+	p.pack_uint(ip_to_u32(conf["ip"]))
+	p.pack_uchar_vector(mac_to_bytes(conf["mac"]))
+
+def pack_agent_md(p, itf, conf):
+	p.pack_string(itf, RPC_TRN_MAX_INTF_LEN)
+	pack_tun_intf(p, conf["eth"])
+	pack_ep(p, itf, conf["ep"])
+	pack_net(p, itf, conf["net"])
+
+def pack_xdp_intf(p, itf, conf):
+	p.pack_string(itf, RPC_TRN_MAX_INTF_LEN)
+	p.pack_string(conf["xdp_path"], RPC_TRN_MAX_PATH_LEN)
+	p.pack_string(conf.get("pcapfile", ""), RPC_TRN_MAX_PATH_LEN)
+
+def pack_intf(p, itf, conf):
+	p.pack_string(itf, RPC_TRN_MAX_INTF_LEN)
+
+def pack_ebpf_prog(p, itf, conf):
+	p.pack_string(itf, RPC_TRN_MAX_INTF_LEN)
+	p.pack_int(PIPELINE_STAGES[conf["stage"]])
+	p.pack_string(conf["xdp_path"], RPC_TRN_MAX_PATH_LEN)
+
+def pack_ebpf_prog_stage(p, itf, conf):
+	p.pack_string(itf, RPC_TRN_MAX_INTF_LEN)
+	p.pack_int(PIPELINE_STAGES[conf["stage"]])
+
+def encode(pack_fn, itf, conf):
+	p = XdrPacker()
+	pack_fn(p, itf, conf)
+	return p.get_buffer()
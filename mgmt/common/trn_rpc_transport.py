@@ -0,0 +1,282 @@
+import json
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from common.constants import CONSTANTS
+from common.executor import run_cmd
+from common.trn_rpc_protocol import *
+from common.trn_rpc_client import TrnRpcClient, TrnRpcError
+
+logger = logging.getLogger()
+
+class TrnRpcTransport(ABC):
+	"""
+	Carries TrnRpc calls to a droplet's transitd. call() gets the procedure,
+	the interface, the configuration dict and its XDR encoding, and returns
+	transitd's return code or raises TrnRpcError if it could not be reached.
+	restarted() tells whether transitd may have restarted, and forgotten
+	what it was given, since it was last asked. A transport that can_ping
+	checks on the droplet with ping(), and verify() makes sure its answer
+	to restarted() is current.
+	"""
+	can_ping = False
+
+	def __init__(self, ip):
+		self.ip = ip
+
+	@abstractmethod
+	def call(self, proc, itf, jsonconf, args):
+		pass
+
+	def ping(self):
+		pass
+
+	def verify(self):
+		pass
+
+	def restarted(self):
+		return False
+
+	def close(self):
+		pass
+
+class DirectTransport(TrnRpcTransport):
+	"""
+	ONC-RPC straight to transitd, over the droplet's shared connection pool.
+	"""
+	can_ping = True
+
+	def __init__(self, ip):
+		super().__init__(ip)
+		self.client = TrnRpcClient.get(ip)
+
+	def call(self, proc, itf, jsonconf, args):
+		return self.client.call_int(proc, args)
+
+	def ping(self):
+		self.client.ping()
+
+	def verify(self):
+		self.client.verify(CONSTANTS.RPC_ACK_CHECK_INTERVAL)
+
+	def restarted(self):
+		# A lost connection may have been to a transitd that restarted
+		return self.client.take_lost()
+
+	def close(self):
+		TrnRpcClient.invalidate(self.ip)
+
+class CliTransport(TrnRpcTransport):
+	"""
+	Runs the transit CLI for every call, as the operator used to.
+	"""
+	cli = "/trn_bin/transit"
+	subcmds = {
+		PROCS.UPDATE_VPC: "update-vpc",
+		PROCS.UPDATE_NET: "update-net",
+		PROCS.UPDATE_EP: "update-ep",
+		PROCS.UPDATE_EP_BATCH: "update-ep-batch",
+		PROCS.UPDATE_AGENT_EP: "update-agent-ep",
+		PROCS.UPDATE_AGENT_MD: "update-agent-metadata",
+		PROCS.DELETE_VPC: "delete-vpc",
+		PROCS.DELETE_NET: "delete-net",
+		PROCS.DELETE_EP: "delete-ep",
+		PROCS.DELETE_AGENT_EP: "delete-agent-ep",
+		PROCS.DELETE_AGENT_MD: "delete-agent-metadata",
+		PROCS.GET_VPC: "get-vpc",
+		PROCS.GET_NET: "get-net",
+		PROCS.GET_EP: "get-ep",
+		PROCS.GET_AGENT_EP: "get-agent-ep",
+		PROCS.GET_AGENT_MD: "get-agent-metadata",
+		PROCS.LOAD_TRANSIT_XDP: "load-transit-xdp",
+		PROCS.LOAD_TRANSIT_AGENT_XDP: "load-agent-xdp",
+		PROCS.UNLOAD_TRANSIT_XDP: "unload-transit-xdp",
+		PROCS.UNLOAD_TRANSIT_AGENT_XDP: "unload-agent-xdp",
+		PROCS.LOAD_TRANSIT_XDP_PIPELINE_STAGE: "load-pipeline-stage",
+		PROCS.UNLOAD_TRANSIT_XDP_PIPELINE_STAGE: "unload-pipeline-stage"
+	}
+
+	def call(self, proc, itf, jsonconf, args):
+		argv = [self.cli, "-s", self.ip, self.subcmds[proc], "-i", itf, "-j", json.dumps(jsonconf)]
+		returncode, text = run_cmd(argv, name="transit")
+		# The CLI fails with -EINVAL for any error, including an
+		# unreachable daemon, and does not report transitd's code
+		if returncode is None or returncode < 0 or returncode == 127:
+			raise TrnRpcError("transit CLI for {} failed ({}): {}".format(self.ip, returncode, text.strip()))
+		return 0 if returncode == 0 else RPC_TRN_ERROR
+
+class FakeTransitd:
+	"""
+	In-memory model of one droplet's transitd: the transit endpoints,
+	networks and vpc maps of each interface, the agents and the pipeline
+	stages, with the map capacities of the XDP programs. Lets the whole
+	management plane run, and be benchmarked, without a dataplane.
+	"""
+	max_eps = 65537
+	max_nets = 16385
+	max_vpcs = 8192
+	max_agent_eps = 65537
+	latency = 0
+
+	_droplets = {}
+	_droplets_lock = threading.Lock()
+
+	@classmethod
+	def get(cls, ip):
+		with cls._droplets_lock:
+			if ip not in cls._droplets:
+				cls._droplets[ip] = cls(ip)
+			return cls._droplets[ip]
+
+	@classmethod
+	def reset(cls):
+		with cls._droplets_lock:
+			cls._droplets = {}
+
+	def __init__(self, ip):
+		self.ip = ip
+		self.eps = {}
+		self.nets = {}
+		self.vpcs = {}
+		self.agents = {}
+		self.stages = {}
+		self.calls = 0
+		self.boot = 0
+		self.lock = threading.Lock()
+
+	def restart(self):
+		"""
+		Forgets everything, as a restarted transitd would.
+		"""
+		with self.lock:
+			self.eps = {}
+			self.nets = {}
+			self.vpcs = {}
+			self.agents = {}
+			self.stages = {}
+			self.boot += 1
+
+	def handle(self, proc, itf, conf):
+		if self.latency:
+			time.sleep(self.latency)
+		with self.lock:
+			self.calls += 1
+			handler = self.handlers.get(proc)
+			if handler is None:
+				return RPC_TRN_NOT_IMPLEMENTED
+			return handler(self, itf, conf)
+
+	def _put(self, table, limit, key, value):
+		if key not in table and len(table) >= limit:
+			return RPC_TRN_ERROR
+		table[key] = value
+		return 0
+
+	def _ep_key(self, itf, conf):
+		return (itf, int(conf.get("tunnel_id", "0") or 0), conf["ip"])
+
+	def _net_key(self, itf, conf):
+		return (itf, int(conf.get("tunnel_id", "0") or 0), conf["nip"], int(conf["prefixlen"]))
+
+	def _vpc_key(self, itf, conf):
+		return (itf, int(conf.get("tunnel_id", "0") or 0))
+
+	def update_vpc(self, itf, conf):
+		return self._put(self.vpcs, self.max_vpcs, self._vpc_key(itf, conf), conf)
+
+	def delete_vpc(self, itf, conf):
+		return 0 if self.vpcs.pop(self._vpc_key(itf, conf), None) else RPC_TRN_ERROR
+
+	def update_net(self, itf, conf):
+		return self._put(self.nets, self.max_nets, self._net_key(itf, conf), conf)
+
+	def delete_net(self, itf, conf):
+		return 0 if self.nets.pop(self._net_key(itf, conf), None) else RPC_TRN_ERROR
+
+	def update_ep(self, itf, conf):
+		return self._put(self.eps, self.max_eps, self._ep_key(itf, conf), conf)
+
+	def update_ep_batch(self, itf, conf):
+		return max([self.update_ep(itf, ep) for ep in conf] or [0])
+
+	def delete_ep(self, itf, conf):
+		return 0 if self.eps.pop(self._ep_key(itf, conf), None) else RPC_TRN_ERROR
+
+	def load_agent(self, itf, conf):
+		self.agents[itf] = {"xdp": conf, "md": None, "eps": {}}
+		return 0
+
+	def unload_agent(self, itf, conf):
+		return 0 if self.agents.pop(itf, None) else RPC_TRN_ERROR
+
+	def update_agent_ep(self, itf, conf):
+		agent = self.agents.get(itf)
+		if agent is None:
+			return RPC_TRN_ERROR
+		return self._put(agent["eps"], self.max_agent_eps, self._ep_key("", conf), conf)
+
+	def delete_agent_ep(self, itf, conf):
+		agent = self.agents.get(itf)
+		if agent is None or agent["eps"].pop(self._ep_key("", conf), None) is None:
+			return RPC_TRN_ERROR
+		return 0
+
+	def update_agent_md(self, itf, conf):
+		agent = self.agents.get(itf)
+		if agent is None:
+			return RPC_TRN_ERROR
+		agent["md"] = conf
+		return 0
+
+	def load_stage(self, itf, conf):
+		self.stages[(itf, conf["stage"])] = conf["xdp_path"]
+		return 0
+
+	def ok(self, itf, conf):
+		return 0
+
+	handlers = {
+		PROCS.UPDATE_VPC: update_vpc,
+		PROCS.DELETE_VPC: delete_vpc,
+		PROCS.UPDATE_NET: update_net,
+		PROCS.DELETE_NET: delete_net,
+		PROCS.UPDATE_EP: update_ep,
+		PROCS.UPDATE_EP_BATCH: update_ep_batch,
+		PROCS.DELETE_EP: delete_ep,
+		PROCS.LOAD_TRANSIT_AGENT_XDP: load_agent,
+		PROCS.UNLOAD_TRANSIT_AGENT_XDP: unload_agent,
+		PROCS.UPDATE_AGENT_EP: update_agent_ep,
+		PROCS.DELETE_AGENT_EP: delete_agent_ep,
+		PROCS.UPDATE_AGENT_MD: update_agent_md,
+		PROCS.LOAD_TRANSIT_XDP: ok,
+		PROCS.UNLOAD_TRANSIT_XDP: ok,
+		PROCS.LOAD_TRANSIT_XDP_PIPELINE_STAGE: load_stage
+	}
+
+class FakeTransport(TrnRpcTransport):
+	"""
+	Sends calls to the in-memory FakeTransitd of the droplet.
+	"""
+	def __init__(self, ip):
+		super().__init__(ip)
+		self.transitd = FakeTransitd.get(ip)
+		self.boot = self.transitd.boot
+
+	def call(self, proc, itf, jsonconf, args):
+		return self.transitd.handle(proc, itf, jsonconf)
+
+	def restarted(self):
+		boot, self.boot = self.boot, self.transitd.boot
+		return boot != self.boot
+
+TRANSPORTS = {
+	"direct": DirectTransport,
+	"cli": CliTransport,
+	"fake": FakeTransport
+}
+
+def make_transport(kind, ip):
+	if kind not in TRANSPORTS:
+		raise ValueError("Unknown RPC transport {}".format(kind))
+	return TRANSPORTS[kind](ip)
@@ -21,6 +21,10 @@ class WorkflowTask(luigi.Task):
 
 class WorkflowFactory(ABC):
 
+	@abstractmethod
+	def OperatorStart(self, param):
+		pass
+
 	@abstractmethod
 	def VpcOperatorStart(self, param):
 		pass
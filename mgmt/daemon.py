@@ -1,3 +1,5 @@
 #!/usr/bin/python3
 
-from daemon.app import *
\ No newline at end of file
+from daemon.app import main
+
+main()
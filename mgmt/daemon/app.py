@@ -4,70 +4,72 @@ import subprocess
 import rpyc
 import inspect
 import os
-from common.common import host_nsenter
+from common.common import host_nsenter, get_itf_ip
+from common.executor import run_cmd, host_cmd
+from common.constants import CONSTANTS
+from common.metrics import start_metrics_server
 from kubernetes import client, config
 from kubernetes.client import Configuration
 from rpyc.utils.server import ThreadedServer
 from daemon.cni_service import CniService
+from store.introspect import register_store_pages
 from time import sleep
 
-logging.basicConfig(level=logging.DEBUG)
+def main():
+	logging.basicConfig(level=logging.DEBUG)
+	start_metrics_server(CONSTANTS.DAEMON_METRICS_PORT, CONSTANTS.METRICS_ADDR)
+	register_store_pages(CniService.store)
 
-# Setup the droplet's host
-script = (f''' bash -c '\
-nsenter -t 1 -m -u -n -i rm /etc/cni/net.d/10-kindnet.conflist &&\
-nsenter -t 1 -m -u -n -i /etc/init.d/rpcbind restart && \
-nsenter -t 1 -m -u -n -i /etc/init.d/rsyslog restart && \
-nsenter -t 1 -m -u -n -i ip link set dev eth0 up mtu 9000' ''')
-r = subprocess.Popen(script, shell=True, stdout=subprocess.PIPE)
-output = r.stdout.read().decode().strip()
-logging.info("Setup done")
+	# Setup the droplet's host
+	setup = [
+		host_cmd("rm", "-f", "/etc/cni/net.d/10-kindnet.conflist"),
+		host_cmd("/etc/init.d/rpcbind", "restart"),
+		host_cmd("/etc/init.d/rsyslog", "restart"),
+		host_cmd("ip", "link", "set", "dev", "eth0", "up", "mtu", "9000")
+	]
+	# The steps do not depend on each other, a failed one does not stop the rest
+	for argv in setup:
+		returncode, output = run_cmd(argv)
+		if returncode != 0:
+			logging.error("Setup step {} failed ({}): {}".format(argv, returncode, output.strip()))
+	logging.info("Setup done")
 
-config.load_incluster_config()
-CniService.config = Configuration._default
-cert_file = Configuration._default.ssl_ca_cert
-obj_api = client.CustomObjectsApi()
-CniService.configure_droplet(obj_api)
+	config.load_incluster_config()
+	CniService.config = Configuration._default
+	cert_file = Configuration._default.ssl_ca_cert
+	obj_api = client.CustomObjectsApi()
+	CniService.configure_droplet(obj_api)
 
-cmd = 'nsenter -t 1 -m -u -n -i ip addr show eth0 | grep "inet\\b" | awk \'{print $2}\' | cut -d/ -f1'
-r = subprocess.Popen(cmd, shell=True, stdout=subprocess.PIPE)
-ip = r.stdout.read().decode().strip()
+	ip = get_itf_ip("eth0", host=True)
 
-cmd = "nsenter -t 1 -m -u -n -i ip link set dev eth0 xdpgeneric off"
+	returncode, output = run_cmd(host_cmd("ip", "link", "set", "dev", "eth0", "xdpgeneric", "off"))
+	logging.info("Removed existing XDP program ({}): {}".format(returncode, output.strip()))
 
-r = subprocess.Popen(cmd, shell=True, stdout=subprocess.PIPE)
-output = r.stdout.read().decode().strip()
-logging.info("Removed existing XDP program: {}".format(output))
+	# transitd is a long running daemon, it is started and left running
+	subprocess.Popen(host_cmd("/trn_bin/transitd"))
+	logging.info("Running transitd")
+	sleep(1)
+	xdp_config = '{"xdp_path": "/trn_xdp/trn_transit_xdp_ebpf_debug.o", "pcapfile": "/bpffs/transit_xdp.pcap"}'
+	returncode, output = run_cmd(host_cmd("/trn_bin/transit", "-s", ip, "load-transit-xdp", "-i", "eth0", "-j", xdp_config))
+	logging.info("Running load-transit-xdp ({}): {}".format(returncode, output.strip()))
 
-cmd = "nsenter -t 1 -m -u -n -i /trn_bin/transitd &"
-r = subprocess.Popen(cmd, shell=True)
-logging.info("Running transitd")
-sleep(1)
-config = '{"xdp_path": "/trn_xdp/trn_transit_xdp_ebpf_debug.o", "pcapfile": "/bpffs/transit_xdp.pcap"}'
-cmd = (f'''nsenter -t 1 -m -u -n -i /trn_bin/transit -s {ip} load-transit-xdp -i eth0 -j '{config}' ''')
+	logging.info("Droplet is ready!")
 
-r = subprocess.Popen(cmd, shell=True, stdout=subprocess.PIPE)
-output = r.stdout.read().decode().strip()
-logging.info("Running load-transit-xdp: {}".format(output))
 
-logging.info("Droplet is ready!")
+	with open(cert_file) as f:
+		CniService.cert = f.read()
 
+	host_nsenter(1)
 
-with open(cert_file) as f:
-	CniService.cert = f.read()
-
-host_nsenter(1)
-
-choice = 'ThreadedServer'  # Debugging
-svc_server = None
-server_class = {}
-# Populate for 'ForkingServer', 'GeventServer', 'OneShotServer', 'ThreadPoolServer', and 'ThreadedServer'
-for name, value in inspect.getmembers(rpyc.utils.server, inspect.isclass):
-	if rpyc.utils.server.Server in getattr(value, '__mro__', []):
-		server_class[name] = value
-print(server_class.keys())
-svc_server = server_class[choice]
-svc = svc_server(service=CniService, hostname='localhost', port=18861, protocol_config={'allow_all_attrs': True})
-svc.start()
-logging.info("Server ####!!!")
-
+	choice = 'ThreadedServer'  # Debugging
+	svc_server = None
+	server_class = {}
+	# Populate for 'ForkingServer', 'GeventServer', 'OneShotServer', 'ThreadPoolServer', and 'ThreadedServer'
+	for name, value in inspect.getmembers(rpyc.utils.server, inspect.isclass):
+		if rpyc.utils.server.Server in getattr(value, '__mro__', []):
+			server_class[name] = value
+	print(server_class.keys())
+	svc_server = server_class[choice]
+	svc = svc_server(service=CniService, hostname='localhost', port=18861, protocol_config={'allow_all_attrs': True})
+	svc.start()
+	logging.info("Server ####!!!")
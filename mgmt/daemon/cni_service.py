@@ -4,7 +4,7 @@ import json
 import logging
 import uuid
 import pprint
-import subprocess
+import socket
 import tempfile
 from common.common import *
 from common.constants import *
@@ -21,17 +21,9 @@ logger = logging.getLogger()
 
 def get_host_info():
 	### Get the droplet IP/MAC
-	cmd = 'ip addr show eth0 | grep "inet\\b" | awk \'{print $2}\' | cut -d/ -f1'
-	r = subprocess.Popen(cmd, shell=True, stdout=subprocess.PIPE)
-	ip = r.stdout.read().decode().strip()
-
-	cmd = 'ip addr show eth0 | grep "link/ether\\b" | awk \'{print $2}\' | cut -d/ -f1'
-	r = subprocess.Popen(cmd, shell=True, stdout=subprocess.PIPE)
-	mac = r.stdout.read().decode().strip()
-
-	cmd = 'hostname'
-	r = subprocess.Popen(cmd, shell=True, stdout=subprocess.PIPE)
-	name = r.stdout.read().decode().strip()
+	ip = get_itf_ip('eth0')
+	mac = get_itf_mac('eth0')
+	name = socket.gethostname()
 
 	spec = {
 		'ip': ip,
@@ -166,7 +158,11 @@ class CniService(Service):
 		self.prepare_veth_pair(ep, iproute_ns, params)
 
 		ep.create_obj()
-		ep.watch_obj(self.ep_ready_fn)
+		if not ep.watch_obj(self.ep_ready_fn, CONSTANTS.EP_READY_TIMEOUT):
+			logger.error("Endpoint {} not ready after {}s".format(ep.name, CONSTANTS.EP_READY_TIMEOUT))
+			# Start over on the retry of the add, not from this endpoint
+			self.remove_ep(ep)
+			return ep
 		self.provision_endpoint(ep, iproute_ns)
 		ep.set_status(OBJ_STATUS.ep_status_provisioned)
 		ep.update_obj()
@@ -261,6 +257,9 @@ class CniService(Service):
 		else:
 			logger.debug("Pod name not found!!")
 			return
+		self.remove_ep(ep)
+
+	def remove_ep(self, ep):
 		ep.delete_obj()
 		logger.info("cni service delete {}".format(ep.name))
 		CniService.store.delete_ep(ep.name)
@@ -1,11 +1,13 @@
 import random
 import logging
-from kubernetes import client, config
+from kubernetes import config
 from obj.bouncer import Bouncer
 from obj.divider import Divider
 from obj.endpoint import Endpoint
 from common.constants import *
 from common.common import *
+from common.kube_api import kube_api
+from common.rpc import flush_rpcs, run_rpcs
 from obj.net import Net
 from store.operator_store import OprStore
 
@@ -24,16 +26,16 @@ class BouncerOperator(object):
 		logger.info(kwargs)
 		self.store = OprStore()
 		config.load_incluster_config()
-		self.obj_api = client.CustomObjectsApi()
+		self.obj_api = kube_api()
 
-	def query_existing_bouncers(self):
+	def query_existing_bouncers(self, shards=None):
 		logger.info("bouncer on_startup")
 		def list_bouncers_obj_fn(name, spec, plurals):
 			logger.info("Bootstrapped Bouncer {}".format(name))
 			b = Bouncer(name, self.obj_api, self.store, spec)
 			self.store_update(b)
 
-		kube_list_obj(self.obj_api, RESOURCES.droplets, list_bouncers_obj_fn)
+		kube_list_obj(self.obj_api, RESOURCES.bouncers, list_bouncers_obj_fn, shards)
 
 	def get_bouncer_tmp_obj(self, name, spec):
 		return Bouncer(name, self.obj_api, None, spec)
@@ -45,33 +47,33 @@ class BouncerOperator(object):
 		self.store.update_bouncer(b)
 
 	def set_bouncer_provisioned(self, bouncer):
+		# Wait for the coalesced writes to the net's endpoints that now
+		# list this bouncer
+		eps = self.store.get_eps_in_net(bouncer.net).values()
+		flush_rpcs([bouncer.rpc] + [ep.rpc for ep in eps if ep.droplet_ip])
 		bouncer.set_status(OBJ_STATUS.bouncer_status_provisioned)
 		bouncer.update_obj()
 
 	def update_bouncers_with_divider(self, div):
 		bouncers = self.store.get_bouncers_of_vpc(div.vpc)
-		for b in bouncers.values():
-			logger.info("BB {}".format(b.name))
-			b.update_vpc(set([div]))
+		run_rpcs(b.arpc.run(b.update_vpc, set([div])) for b in bouncers.values())
 
 	def delete_divider_from_bouncers(self, div):
 		bouncers = self.store.get_bouncers_of_vpc(div.vpc)
-		for b in bouncers.values():
-			b.update_vpc(set([div]), False)
+		run_rpcs(b.arpc.run(b.update_vpc, set([div]), False) for b in bouncers.values())
 
 	def update_endpoint_with_bouncers(self, ep):
 		bouncers = self.store.get_bouncers_of_net(ep.net)
 		eps = set([ep])
-		for key in bouncers:
-			bouncers[key].update_eps(eps)
+		run_rpcs(b.arpc.run(b.update_eps, eps) for b in bouncers.values())
 		ep.update_bouncers(bouncers)
 
 	def delete_endpoint_from_bouncers(self, ep):
 		bouncers = self.store.get_bouncers_of_net(ep.net)
 		eps = set([ep])
-		for key in bouncers:
-			bouncers[key].delete_eps(eps)
-		self.store.update_bouncers_of_net(ep.net, bouncers)
+		for b in bouncers.values():
+			b.delete_eps(eps)
+			self.store.update_bouncer(b)
 		# No need to delete agent info, it gets deleted with agent unload
 
 	def delete_vpc(self, bouncer):
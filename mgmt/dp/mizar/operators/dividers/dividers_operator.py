@@ -1,8 +1,10 @@
 import random
 import uuid
-from kubernetes import client, config
+from kubernetes import config
 from common.constants import *
 from common.common import *
+from common.kube_api import kube_api
+from common.rpc import flush_rpcs, run_rpcs
 from obj.bouncer import Bouncer
 from obj.divider import Divider
 from store.operator_store import OprStore
@@ -23,9 +25,9 @@ class DividerOperator(object):
 		logger.info(kwargs)
 		self.store = OprStore()
 		config.load_incluster_config()
-		self.obj_api = client.CustomObjectsApi()
+		self.obj_api = kube_api()
 
-	def query_existing_dividers(self):
+	def query_existing_dividers(self, shards=None):
 		logger.info("divider on_startup")
 		def list_dividers_obj_fn(name, spec, plurals):
 			logger.info("Bootstrapped Divider {}".format(name))
@@ -33,7 +35,7 @@ class DividerOperator(object):
 			if d.status == OBJ_STATUS.divider_status_provisioned:
 				self.store_update(d)
 
-		kube_list_obj(self.obj_api, RESOURCES.droplets, list_dividers_obj_fn)
+		kube_list_obj(self.obj_api, RESOURCES.dividers, list_dividers_obj_fn, shards)
 
 	def get_divider_tmp_obj(self, name, spec):
 		return Divider(name, self.obj_api, None, spec)
@@ -45,30 +47,29 @@ class DividerOperator(object):
 		self.store.update_divider(divider)
 
 	def set_divider_provisioned(self, div):
+		# Wait for the writes queued on the divider and the vpc's bouncers
+		bouncers = self.store.get_bouncers_of_vpc(div.vpc).values()
+		flush_rpcs([div.rpc] + [b.rpc for b in bouncers])
 		div.set_status(OBJ_STATUS.divider_status_provisioned)
 		div.update_obj()
 
 
 	def update_divider_with_bouncers(self, bouncer, net):
 		dividers = self.store.get_dividers_of_vpc(bouncer.vpc).values()
-		for d in dividers:
-			d.update_net(net)
+		run_rpcs(d.arpc.run(d.update_net, net) for d in dividers)
 
 	def delete_bouncer_from_dividers(self, bouncer, net):
 		dividers = self.store.get_dividers_of_vpc(bouncer.vpc).values()
-		for d in dividers:
-			d.update_net(net, False)
+		run_rpcs(d.arpc.run(d.update_net, net, False) for d in dividers)
 
 	def update_net(self, net, dividers=None):
 		if not dividers:
 			dividers = self.store.get_dividers_of_vpc(net.vpc).values()
-		for d in dividers:
-			d.update_net(net)
+		run_rpcs(d.arpc.run(d.update_net, net) for d in dividers)
 
 	def delete_net(self, net):
 		dividers = self.store.get_dividers_of_vpc(net.vpc).values()
-		for d in dividers:
-			d.delete_net(net)
+		run_rpcs(d.arpc.run(d.delete_net, net) for d in dividers)
 
 	def delete_nets_from_divider(self, nets, divider):
 		for net in nets:
@@ -2,7 +2,9 @@ import logging
 import random
 from common.constants import *
 from common.common import *
-from kubernetes import client, config
+from common.kube_api import kube_api
+from common.rpc import TrnRpc, flush_rpcs
+from kubernetes import config
 from obj.droplet import Droplet
 from obj.bouncer import Bouncer
 from obj.divider import Divider
@@ -23,7 +25,7 @@ class DropletOperator(object):
 		logger.info(kwargs)
 		self.store = OprStore()
 		config.load_incluster_config()
-		self.obj_api = client.CustomObjectsApi()
+		self.obj_api = kube_api()
 		self.bootstrapped = False
 
 	def query_existing_droplets(self):
@@ -46,6 +48,7 @@ class DropletOperator(object):
 		return Droplet(name, self.obj_api, self.store, spec)
 
 	def set_droplet_provisioned(self, droplet):
+		flush_rpcs([droplet.rpc])
 		droplet.set_status(OBJ_STATUS.droplet_status_provisioned)
 		droplet.update_obj()
 
@@ -76,9 +79,23 @@ class DropletOperator(object):
 		d = random.sample(droplets, 1)[0]
 		divider.set_droplet(d)
 
-	def on_delete(self, body, spec, **kwargs):
-		name = kwargs['name']
-		logger.info("*delete_droplet {}".format(name))
-		#self.ds.delete(name)
+	def drain_droplet(self, name):
+		"""
+		Unlinks the endpoints of a droplet that is going away, and drops
+		the RPC state of its transit daemon. The bouncers still placed on
+		it are logged, they have to be placed again.
+		"""
+		droplet = self.store.get_droplet(name)
+		if droplet is None:
+			return
+		eps = self.store.get_eps_on_droplet(name)
+		for ep in eps.values():
+			ep.droplet_obj = None
+		bouncers = self.store.get_bouncers_on_droplet(name)
+		if bouncers:
+			logger.warning("Droplet {} deleted with bouncers {} on it".format(name, sorted(bouncers)))
+		logger.info("Drained droplet {} of {} endpoints".format(name, len(eps)))
+		TrnRpc.invalidate(droplet.ip)
+		self.store.delete_droplet(name)
 
 
@@ -1,10 +1,13 @@
 import logging
 import random
-from kubernetes import client, config
+from kubernetes import config
 from obj.endpoint import Endpoint
 from obj.bouncer import Bouncer
+from obj.net_bouncers import NetBouncers
 from common.constants import *
 from common.common import *
+from common.kube_api import kube_api
+from common.rpc import flush_rpcs, run_rpcs
 from store.operator_store import OprStore
 
 logger = logging.getLogger()
@@ -22,15 +25,15 @@ class EndpointOperator(object):
 		logger.info(kwargs)
 		self.store = OprStore()
 		config.load_incluster_config()
-		self.obj_api = client.CustomObjectsApi()
+		self.obj_api = kube_api()
 
-	def query_existing_endpoints(self):
+	def query_existing_endpoints(self, shards=None):
 		def list_endpoint_obj_fn(name, spec, plurals):
 			logger.info("Bootstrapped {}".format(name))
 			ep = Endpoint(name, self.obj_api, self.store, spec)
 			self.store_update(ep)
 
-		kube_list_obj(self.obj_api, RESOURCES.endpoints, list_endpoint_obj_fn)
+		kube_list_obj(self.obj_api, RESOURCES.endpoints, list_endpoint_obj_fn, shards)
 
 	def get_endpoint_tmp_obj(self, name, spec):
 		return Endpoint(name, self.obj_api, None, spec)
@@ -39,6 +42,11 @@ class EndpointOperator(object):
 		return Endpoint(name, self.obj_api, self.store, spec)
 
 	def set_endpoint_provisioned(self, ep):
+		# Wait for the coalesced dataplane writes of this endpoint
+		rpcs = [ep.rpc]
+		if ep.droplet_obj is not None:
+			rpcs.append(ep.droplet_obj.rpc)
+		flush_rpcs(rpcs)
 		ep.set_status(OBJ_STATUS.ep_status_provisioned)
 		ep.update_obj()
 
@@ -62,9 +70,10 @@ class EndpointOperator(object):
 		bouncer.update_eps(eps)
 
 	def update_endpoints_with_bouncers(self, bouncer):
+		# One new membership version for the net, then each endpoint's agent
+		NetBouncers.get(bouncer.net).add(bouncer)
 		eps = self.store.get_eps_in_net(bouncer.net).values()
-		for ep in eps:
-			ep.update_bouncers(set([bouncer]))
+		run_rpcs(ep.arpc.run(ep.update_bouncers, [bouncer]) for ep in eps)
 
 	def create_scaled_endpoint(self, name, spec):
 		logger.info("Create scaled endpoint {} spec {}".format(name, spec))
@@ -107,9 +116,9 @@ class EndpointOperator(object):
 		bouncer.delete_eps(eps)
 
 	def delete_bouncer_from_endpoints(self, bouncer):
+		NetBouncers.get(bouncer.net).remove(bouncer.name)
 		eps = self.store.get_eps_in_net(bouncer.net).values()
-		for ep in eps:
-			ep.update_bouncers(set([bouncer]), False)
+		run_rpcs(ep.arpc.run(ep.update_bouncers, [bouncer], False) for ep in eps)
 
 	def set_endpoint_deprovisioned(self, ep):
 		ep.set_status(OBJ_STATUS.ep_status_deprovisioned)
@@ -1,9 +1,11 @@
 import random
 import logging
-from kubernetes import client, config
+from kubernetes import config
 from common.cidr import Cidr
 from common.constants import *
 from common.common import *
+from common.kube_api import kube_api
+from common.rpc import flush_rpcs
 from obj.net import Net
 from obj.endpoint import Endpoint
 from obj.bouncer import Bouncer
@@ -24,17 +26,16 @@ class NetOperator(object):
 		logger.info(kwargs)
 		self.store = OprStore()
 		config.load_incluster_config()
-		self.obj_api = client.CustomObjectsApi()
+		self.obj_api = kube_api()
 
-	def query_existing_nets(self):
+	def query_existing_nets(self, shards=None):
 		def list_net_obj_fn(name, spec, plurals):
 			logger.info("Bootstrapped {}".format(name))
 			n = Net(name, self.obj_api, self.store, spec)
 			self.store_update(n)
 
-		kube_list_obj(self.obj_api, RESOURCES.nets, list_net_obj_fn)
-		self.create_default_net()
-		logger.debug("Bootstrap Net store: {}".format(self.store._dump_nets()))
+		kube_list_obj(self.obj_api, RESOURCES.nets, list_net_obj_fn, shards)
+		logger.debug("Bootstrap Net store: {} nets".format(len(self.store.get_all_nets())))
 
 	def get_net_tmp_obj(self, name, spec):
 		return Net(name, self.obj_api, None, spec)
@@ -46,6 +47,8 @@ class NetOperator(object):
 		self.store.update_net(net)
 
 	def create_default_net(self):
+		if not SHARDS.owns(OBJ_DEFAULTS.default_ep_vpc):
+			return
 		if self.store.get_net(OBJ_DEFAULTS.default_ep_net):
 			return
 		n = Net(OBJ_DEFAULTS.default_ep_net, self.obj_api, self.store)
@@ -53,6 +56,9 @@ class NetOperator(object):
 
 
 	def set_net_provisioned(self, net):
+		# Wait for the coalesced writes to the net's endpoints
+		eps = self.store.get_eps_in_net(net.name).values()
+		flush_rpcs(ep.rpc for ep in eps if ep.droplet_ip)
 		net.set_status(OBJ_STATUS.net_status_provisioned)
 		net.update_obj()
 
@@ -60,15 +66,13 @@ class NetOperator(object):
 		name = kwargs['name']
 		logger.info("Net on_net_init {}".format(spec))
 		n = Net(name, self.obj_api, self.store, spec)
-		for i in range(n.n_bouncers):
-			n.create_bouncer()
+		n.create_bouncers(n.n_bouncers)
 		n.set_status(OBJ_STATUS.net_status_allocated)
 		n.update_obj()
 
 	def create_net_bouncers(self, net, n):
 		logger.info("Create {} Bouncers for net: {}".format(n, net.name))
-		for i in range(n):
-			net.create_bouncer()
+		net.create_bouncers(n)
 		return net
 
 	def delete_net_bouncers(self, net, n):
@@ -98,8 +102,7 @@ class NetOperator(object):
 		b = Bouncer(name, self.obj_api, None, spec)
 		n = self.store.get_net(b.net)
 		if n.status != OBJ_STATUS.net_status_provisioned:
-			n.set_status(OBJ_STATUS.net_status_provisioned)
-			n.update_obj()
+			self.set_net_provisioned(n)
 
 	def on_endpoint_init(self, body, spec, **kwargs):
 		name = kwargs['name']
@@ -119,10 +122,11 @@ class NetOperator(object):
 
 	def allocate_endpoint(self, ep):
 		n = self.store.get_net(ep.net)
+		if ep.ip != "" and self.ip_taken(n, ep):
+			logger.error("Endpoint {} asked for {} in vni {}, already taken".format(ep.name, ep.ip, n.vni))
+			ep.set_ip("")
 		if ep.ip == "":
-			ip = n.allocate_ip()
-			n.mark_ip_as_allocated(ip)
-			ep.set_ip(ip)
+			ep.set_ip(n.allocate_ip())
 		gw = n.get_gw_ip()
 		prefix = n.get_prefixlen()
 		ep.set_gw(gw)
@@ -131,9 +135,17 @@ class NetOperator(object):
 		if ep.type == OBJ_DEFAULTS.ep_type_simple:
 			ep.load_transit_agent()
 
-		n.mark_ip_as_allocated(ip)
+		n.mark_ip_as_allocated(ep.ip)
 		ep.set_vni(n.vni)
 
+	def ip_taken(self, net, ep):
+		"""
+		Whether another endpoint of the net's vni has the address ep
+		asks for.
+		"""
+		holders = self.store.get_eps_by_vni_ip(net.vni, ep.ip)
+		return any(name != ep.name for name in holders)
+
 	def deallocate_endpoint(self, ep):
 		n = self.store.get_net(ep.net)
 		n.deallocate_ip(ep.ip)
@@ -1,9 +1,11 @@
 import random
 import uuid
 import logging
-from kubernetes import client, config
+from kubernetes import config
 from common.constants import *
 from common.common import *
+from common.kube_api import kube_api
+from common.rpc import flush_rpcs
 from common.cidr import Cidr
 from obj.vpc import Vpc
 from obj.net import Net
@@ -24,17 +26,17 @@ class VpcOperator(object):
 		logger.info(kwargs)
 		self.store = OprStore()
 		config.load_incluster_config()
-		self.obj_api = client.CustomObjectsApi()
+		self.obj_api = kube_api()
 
-	def query_existing_vpcs(self):
+	def query_existing_vpcs(self, shards=None):
 		def list_vpc_obj_fn(name, spec, plurals):
 			logger.info("Bootstrapped {}".format(name))
 			v = self.get_vpc_stored_obj(name, spec)
 			if v.status == OBJ_STATUS.vpc_status_provisioned:
 				self.store_update(v)
 
-		kube_list_obj(self.obj_api, RESOURCES.vpcs, list_vpc_obj_fn)
-		logger.debug("Bootstrap VPC store: {}".format(self.store._dump_vpcs()))
+		kube_list_obj(self.obj_api, RESOURCES.vpcs, list_vpc_obj_fn, shards)
+		logger.debug("Bootstrap VPC store: {} vpcs".format(len(self.store.get_all_vpcs())))
 
 	def get_vpc_tmp_obj(self, name, spec):
 		return Vpc(name, self.obj_api, None, spec)
@@ -43,6 +45,8 @@ class VpcOperator(object):
 		return Vpc(name, self.obj_api, self.store, spec)
 
 	def create_default_vpc(self):
+		if not SHARDS.owns(OBJ_DEFAULTS.default_ep_vpc):
+			return
 		if self.store.get_vpc(OBJ_DEFAULTS.default_ep_vpc):
 			return
 		v = Vpc(OBJ_DEFAULTS.default_ep_vpc, self.obj_api, self.store)
@@ -53,8 +57,7 @@ class VpcOperator(object):
 
 	def create_vpc_dividers(self, vpc, n):
 		logger.info("Create {} dividers for vpc: {}".format(n, vpc.name))
-		for i in range(n):
-			vpc.create_divider()
+		vpc.create_dividers(n)
 
 	def delete_vpc_dividers(self, vpc, n):
 		logger.info("Delete {} dividers for vpc: {}".format(n, vpc.name))
@@ -72,6 +75,10 @@ class VpcOperator(object):
 			return self.delete_vpc_dividers(vpc, abs(diff))
 
 	def set_vpc_provisioned(self, vpc):
+		# Wait for the writes queued on the vpc's dividers and bouncers
+		dividers = self.store.get_dividers_of_vpc(vpc.name).values()
+		bouncers = self.store.get_bouncers_of_vpc(vpc.name).values()
+		flush_rpcs([d.rpc for d in dividers] + [b.rpc for b in bouncers])
 		vpc.set_status(OBJ_STATUS.vpc_status_provisioned)
 		vpc.update_obj()
 
@@ -84,8 +91,7 @@ class VpcOperator(object):
 		div = Divider(name, self.obj_api, None, spec)
 		v = self.store.get_vpc(div.vpc)
 		if v.status != OBJ_STATUS.vpc_status_provisioned:
-			v.set_status(OBJ_STATUS.vpc_status_provisioned)
-			v.update_obj()
+			self.set_vpc_provisioned(v)
 
 	def on_vpc_delete(self, body, spec, **kwargs):
 		logger.info("on_vpc_delete {}".format(spec))
@@ -0,0 +1,67 @@
+import functools
+import logging
+from common.shard import SHARDS
+from common.workflow import *
+from dp.mizar.operators.droplets.droplets_operator import *
+from dp.mizar.operators.vpcs.vpcs_operator import *
+from dp.mizar.operators.nets.nets_operator import *
+from dp.mizar.operators.dividers.dividers_operator import *
+from dp.mizar.operators.bouncers.bouncers_operator import *
+from dp.mizar.operators.endpoints.endpoints_operator import *
+from store.bootstrap import list_concurrently, link_store
+logger = logging.getLogger()
+
+droplets_opr = DropletOperator()
+vpcs_opr = VpcOperator()
+nets_opr = NetOperator()
+dividers_opr = DividerOperator()
+bouncers_opr = BouncerOperator()
+endpoints_opr = EndpointOperator()
+
+class OperatorStart(WorkflowTask):
+	"""
+	Lists every kind of object at once, then links them all in the store.
+	"""
+
+	def requires(self):
+		logger.info("Requires {task}".format(task=self.__class__.__name__))
+		return []
+
+	def run(self):
+		logger.info("Run {task}".format(task=self.__class__.__name__))
+		list_concurrently([
+			droplets_opr.query_existing_droplets,
+			vpcs_opr.query_existing_vpcs,
+			nets_opr.query_existing_nets,
+			dividers_opr.query_existing_dividers,
+			bouncers_opr.query_existing_bouncers,
+			endpoints_opr.query_existing_endpoints
+		])
+		link_store(OprStore())
+		vpcs_opr.create_default_vpc()
+		nets_opr.create_default_net()
+		self.finalize()
+
+class OperatorLoadShards(WorkflowTask):
+	"""
+	Lists the objects of the VPC shards in param.spec['shards'], taken
+	over from another replica, then links them in the store. The droplets
+	and the objects of the other shards are already there.
+	"""
+
+	def requires(self):
+		logger.info("Requires {task}".format(task=self.__class__.__name__))
+		return []
+
+	def run(self):
+		logger.info("Run {task}".format(task=self.__class__.__name__))
+		shards = self.param.spec['shards']
+		list_concurrently([functools.partial(fn, shards) for fn in (
+			vpcs_opr.query_existing_vpcs,
+			nets_opr.query_existing_nets,
+			dividers_opr.query_existing_dividers,
+			bouncers_opr.query_existing_bouncers,
+			endpoints_opr.query_existing_endpoints
+		)])
+		link_store(OprStore(), lambda vpc: SHARDS.shard_of(vpc) in shards)
+		self.finalize()
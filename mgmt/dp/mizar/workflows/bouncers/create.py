@@ -39,10 +39,9 @@ class BouncerCreate(WorkflowTask):
 		endpoints_opr.update_bouncer_with_endpoints(bouncer)
 		endpoints_opr.update_endpoints_with_bouncers(bouncer)
 
-		# Update net on dividers
+		# Update net on dividers, the net's bouncers now include this one
 		net = nets_opr.store.get_net(bouncer.net)
 		if net:
-			net.bouncers[bouncer.name] = bouncer
 			dividers_opr.update_divider_with_bouncers(bouncer, net)
 
 		bouncers_opr.set_bouncer_provisioned(bouncer)
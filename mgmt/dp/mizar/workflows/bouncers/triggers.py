@@ -2,14 +2,15 @@ import kopf
 import logging
 import luigi
 from common.common import *
+from common.shard import owned
 from common.constants import *
 from common.wf_factory import *
 from common.wf_param import *
 
 
-@kopf.on.resume(group, version, RESOURCES.bouncers, when=LAMBDAS.bouncer_status_init)
-@kopf.on.update(group, version, RESOURCES.bouncers, when=LAMBDAS.bouncer_status_init)
-@kopf.on.create(group, version, RESOURCES.bouncers, when=LAMBDAS.bouncer_status_init)
+@kopf.on.resume(group, version, RESOURCES.bouncers, when=owned(LAMBDAS.bouncer_status_init))
+@kopf.on.update(group, version, RESOURCES.bouncers, when=owned(LAMBDAS.bouncer_status_init))
+@kopf.on.create(group, version, RESOURCES.bouncers, when=owned(LAMBDAS.bouncer_status_init))
 def bouncer_opr_on_bouncer_init(body, spec, **kwargs):
 	param = HandlerParam()
 	param.name = kwargs['name']
@@ -18,9 +19,9 @@ def bouncer_opr_on_bouncer_init(body, spec, **kwargs):
 	run_task(wffactory().BouncerCreate(param=param))
 
 
-@kopf.on.resume(group, version, RESOURCES.bouncers, when=LAMBDAS.bouncer_status_provisioned)
-@kopf.on.update(group, version, RESOURCES.bouncers, when=LAMBDAS.bouncer_status_provisioned)
-@kopf.on.create(group, version, RESOURCES.bouncers, when=LAMBDAS.bouncer_status_provisioned)
+@kopf.on.resume(group, version, RESOURCES.bouncers, when=owned(LAMBDAS.bouncer_status_provisioned))
+@kopf.on.update(group, version, RESOURCES.bouncers, when=owned(LAMBDAS.bouncer_status_provisioned))
+@kopf.on.create(group, version, RESOURCES.bouncers, when=owned(LAMBDAS.bouncer_status_provisioned))
 def bouncer_opr_on_bouncer_provisioned(body, spec, **kwargs):
 	param = HandlerParam()
 	param.name = kwargs['name']
@@ -28,7 +29,7 @@ def bouncer_opr_on_bouncer_provisioned(body, spec, **kwargs):
 	param.spec = spec
 	run_task(wffactory().BouncerProvisioned(param=param))
 
-@kopf.on.delete(group, version, RESOURCES.bouncers)
+@kopf.on.delete(group, version, RESOURCES.bouncers, when=owned())
 def  bouncer_opr_on_bouncer_delete(body, spec, **kwargs):
 	param = HandlerParam()
 	param.name = kwargs['name']
@@ -2,6 +2,7 @@ import kopf
 import logging
 import luigi
 from common.common import *
+from common.shard import owned
 from common.constants import *
 from common.wf_factory import *
 from common.wf_param import *
@@ -11,9 +12,9 @@ mizar_service_annotation_key = "service.beta.kubernetes.io/mizar-scaled-endpoint
 mizar_service_annotation_val = "scaled-endpoint"
 annotations_filter = {mizar_service_annotation_key: mizar_service_annotation_val}
 
-@kopf.on.resume('', 'v1', 'services', annotations=annotations_filter)
-@kopf.on.update('', 'v1', 'services', annotations=annotations_filter)
-@kopf.on.create('', 'v1', 'services', annotations=annotations_filter)
+@kopf.on.resume('', 'v1', 'services', annotations=annotations_filter, when=owned())
+@kopf.on.update('', 'v1', 'services', annotations=annotations_filter, when=owned())
+@kopf.on.create('', 'v1', 'services', annotations=annotations_filter, when=owned())
 async def services_opr_on_services(body, spec, **kwargs):
 	param = HandlerParam()
 	param.name = kwargs['name']
@@ -22,9 +23,9 @@ async def services_opr_on_services(body, spec, **kwargs):
 	run_task(wffactory().k8sServiceCreate(param=param))
 
 
-@kopf.on.resume('', 'v1', 'endpoints')
-@kopf.on.update('', 'v1', 'endpoints')
-@kopf.on.create('', 'v1', 'endpoints')
+@kopf.on.resume('', 'v1', 'endpoints', when=owned())
+@kopf.on.update('', 'v1', 'endpoints', when=owned())
+@kopf.on.create('', 'v1', 'endpoints', when=owned())
 async def services_opr_on_endpoints(body, spec, **kwargs):
 	param = HandlerParam()
 	param.name = kwargs['name']
@@ -15,6 +15,8 @@ class DropletCreate(WorkflowTask):
 	def run(self):
 		logger.info("Run {task}".format(task=self.__class__.__name__))
 		d = droplets_opr.get_droplet_stored_obj(self.param.name, self.param.spec)
+		# A droplet (re)registers with a fresh transitd, forget what it had
+		d.rpc.resync()
 		droplets_opr.set_droplet_provisioned(d)
 		droplets_opr.store_update(d)
 		self.finalize()
\ No newline at end of file
@@ -1,6 +1,17 @@
 import logging
 from common.workflow import *
-from dp.mizar.operators.vpcs.vpcs_operator import *
+from dp.mizar.operators.droplets.droplets_operator import *
 logger = logging.getLogger()
 
-vpcs_opr = VpcOperator()
\ No newline at end of file
+droplets_opr = DropletOperator()
+
+class DropletDelete(WorkflowTask):
+
+	def requires(self):
+		logger.info("Requires {task}".format(task=self.__class__.__name__))
+		return []
+
+	def run(self):
+		logger.info("Run {task}".format(task=self.__class__.__name__))
+		droplets_opr.drain_droplet(self.param.name)
+		self.finalize()
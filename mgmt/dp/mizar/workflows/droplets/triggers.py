@@ -25,3 +25,11 @@ def droplet_opr_on_droplet_provisioned(body, spec, **kwargs):
 	param.body = body
 	param.spec = spec
 	run_task(wffactory().DropletProvisioned(param=param))
+
+@kopf.on.delete(group, version, RESOURCES.droplets)
+def droplet_opr_on_droplet_delete(body, spec, **kwargs):
+	param = HandlerParam()
+	param.name = kwargs['name']
+	param.body = body
+	param.spec = spec
+	run_task(wffactory().DropletDelete(param=param))
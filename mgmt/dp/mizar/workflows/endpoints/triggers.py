@@ -2,15 +2,18 @@ import kopf
 import logging
 import asyncio
 from common.common import *
+from common.shard import owned
 from common.constants import *
+from common.kube_api import kube_lane
 from common.wf_factory import *
 from common.wf_param import *
 
 logger = logging.getLogger()
 
-@kopf.on.resume(group, version, RESOURCES.endpoints, when=LAMBDAS.ep_status_init)
-@kopf.on.update(group, version, RESOURCES.endpoints, when=LAMBDAS.ep_status_init)
-@kopf.on.create(group, version, RESOURCES.endpoints, when=LAMBDAS.ep_status_init)
+@kopf.on.resume(group, version, RESOURCES.endpoints, when=owned(LAMBDAS.ep_status_init))
+@kopf.on.update(group, version, RESOURCES.endpoints, when=owned(LAMBDAS.ep_status_init))
+@kopf.on.create(group, version, RESOURCES.endpoints, when=owned(LAMBDAS.ep_status_init))
+@kube_lane(KUBE_LANES.interactive)
 def endpoint_opr_on_endpoint_init(body, spec, **kwargs):
 	param = HandlerParam()
 	param.name = kwargs['name']
@@ -19,9 +22,10 @@ def endpoint_opr_on_endpoint_init(body, spec, **kwargs):
 	run_task(wffactory().EndpointCreate(param=param))
 
 
-@kopf.on.resume(group, version, RESOURCES.endpoints, when=LAMBDAS.ep_status_provisioned)
-@kopf.on.update(group, version, RESOURCES.endpoints, when=LAMBDAS.ep_status_provisioned)
-@kopf.on.create(group, version, RESOURCES.endpoints, when=LAMBDAS.ep_status_provisioned)
+@kopf.on.resume(group, version, RESOURCES.endpoints, when=owned(LAMBDAS.ep_status_provisioned))
+@kopf.on.update(group, version, RESOURCES.endpoints, when=owned(LAMBDAS.ep_status_provisioned))
+@kopf.on.create(group, version, RESOURCES.endpoints, when=owned(LAMBDAS.ep_status_provisioned))
+@kube_lane(KUBE_LANES.interactive)
 def endpoint_opr_on_endpoint_provisioned(body, spec, **kwargs):
 	param = HandlerParam()
 	param.name = kwargs['name']
@@ -29,7 +33,7 @@ def endpoint_opr_on_endpoint_provisioned(body, spec, **kwargs):
 	param.spec = spec
 	run_task(wffactory().EndpointProvisioned(param=param))
 
-@kopf.on.delete(group, version, RESOURCES.endpoints)
+@kopf.on.delete(group, version, RESOURCES.endpoints, when=owned())
 def endpoint_opr_on_endpoint_delete(body, spec, **kwargs):
 	param = HandlerParam()
 	param.name = kwargs['name']
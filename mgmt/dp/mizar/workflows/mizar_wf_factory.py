@@ -1,5 +1,6 @@
 import luigi
 from common.workflow import *
+from dp.mizar.workflows.bootstrap import *
 from dp.mizar.workflows.vpcs.bootstrap import *
 from dp.mizar.workflows.vpcs.create import *
 from dp.mizar.workflows.vpcs.provisioned import *
@@ -37,6 +38,12 @@ from dp.mizar.workflows.builtins.services.delete import *
 
 class MizarWorkflowFactory():
 
+	def OperatorStart(self, param):
+		return OperatorStart(param=param)
+
+	def OperatorLoadShards(self, param):
+		return OperatorLoadShards(param=param)
+
 	def VpcOperatorStart(self, param):
 		return VpcOperatorStart(param=param)
 
@@ -70,6 +77,9 @@ class MizarWorkflowFactory():
 	def DropletProvisioned(self, param):
 		return DropletProvisioned(param=param)
 
+	def DropletDelete(self, param):
+		return DropletDelete(param=param)
+
 	def NetOperatorStart(self, param):
 		return NetOperatorStart(param=param)
 
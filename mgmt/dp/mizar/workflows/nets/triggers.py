@@ -2,6 +2,7 @@ import kopf
 import logging
 import luigi
 from common.common import *
+from common.shard import owned
 from common.constants import *
 from common.wf_factory import *
 from common.wf_param import *
@@ -10,9 +11,9 @@ from common.wf_param import *
 # def vpc_opr_on_vpc_delete(body, **kwargs):
 #     vpc_operator.on_vpc_delete(body, **kwargs)
 
-@kopf.on.resume(group, version, RESOURCES.nets, when=LAMBDAS.net_status_init)
-@kopf.on.update(group, version, RESOURCES.nets, when=LAMBDAS.net_status_init)
-@kopf.on.create(group, version, RESOURCES.nets, when=LAMBDAS.net_status_init)
+@kopf.on.resume(group, version, RESOURCES.nets, when=owned(LAMBDAS.net_status_init))
+@kopf.on.update(group, version, RESOURCES.nets, when=owned(LAMBDAS.net_status_init))
+@kopf.on.create(group, version, RESOURCES.nets, when=owned(LAMBDAS.net_status_init))
 def net_opr_on_net_init(body, spec, **kwargs):
 	param = HandlerParam()
 	param.name = kwargs['name']
@@ -20,9 +21,9 @@ def net_opr_on_net_init(body, spec, **kwargs):
 	param.spec = spec
 	run_task(wffactory().NetCreate(param=param))
 
-@kopf.on.resume(group, version, RESOURCES.nets, when=LAMBDAS.net_status_provisioned)
-@kopf.on.update(group, version, RESOURCES.nets, when=LAMBDAS.net_status_provisioned)
-@kopf.on.create(group, version, RESOURCES.nets, when=LAMBDAS.net_status_provisioned)
+@kopf.on.resume(group, version, RESOURCES.nets, when=owned(LAMBDAS.net_status_provisioned))
+@kopf.on.update(group, version, RESOURCES.nets, when=owned(LAMBDAS.net_status_provisioned))
+@kopf.on.create(group, version, RESOURCES.nets, when=owned(LAMBDAS.net_status_provisioned))
 def net_opr_on_net_provisioned(body, spec, **kwargs):
 	param = HandlerParam()
 	param.name = kwargs['name']
@@ -32,7 +33,7 @@ def net_opr_on_net_provisioned(body, spec, **kwargs):
 	run_task(wffactory().NetProvisioned(param=param))
 
 
-@kopf.on.delete(group, version, RESOURCES.nets)
+@kopf.on.delete(group, version, RESOURCES.nets, when=owned())
 def  net_opr_on_net_delete(body, spec, **kwargs):
 	param = HandlerParam()
 	param.name = kwargs['name']
@@ -2,6 +2,7 @@ import kopf
 import logging
 import luigi
 from common.common import *
+from common.shard import owned
 from common.constants import *
 from common.wf_factory import *
 from common.wf_param import *
@@ -11,9 +12,9 @@ logger = logging.getLogger()
 # def vpc_opr_on_vpc_delete(body, **kwargs):
 #     vpc_operator.on_vpc_delete(body, **kwargs)
 
-@kopf.on.resume(group, version, RESOURCES.vpcs, when=LAMBDAS.vpc_status_init)
-@kopf.on.update(group, version, RESOURCES.vpcs, when=LAMBDAS.vpc_status_init)
-@kopf.on.create(group, version, RESOURCES.vpcs, when=LAMBDAS.vpc_status_init)
+@kopf.on.resume(group, version, RESOURCES.vpcs, when=owned(LAMBDAS.vpc_status_init))
+@kopf.on.update(group, version, RESOURCES.vpcs, when=owned(LAMBDAS.vpc_status_init))
+@kopf.on.create(group, version, RESOURCES.vpcs, when=owned(LAMBDAS.vpc_status_init))
 def vpc_opr_on_vpc_init(body, spec, **kwargs):
 	param = HandlerParam()
 	param.name = kwargs['name']
@@ -21,9 +22,9 @@ def vpc_opr_on_vpc_init(body, spec, **kwargs):
 	param.spec = spec
 	run_task(wffactory().VpcCreate(param=param))
 
-@kopf.on.resume(group, version, RESOURCES.vpcs, when=LAMBDAS.vpc_status_provisioned)
-@kopf.on.update(group, version, RESOURCES.vpcs, when=LAMBDAS.vpc_status_provisioned)
-@kopf.on.create(group, version, RESOURCES.vpcs, when=LAMBDAS.vpc_status_provisioned)
+@kopf.on.resume(group, version, RESOURCES.vpcs, when=owned(LAMBDAS.vpc_status_provisioned))
+@kopf.on.update(group, version, RESOURCES.vpcs, when=owned(LAMBDAS.vpc_status_provisioned))
+@kopf.on.create(group, version, RESOURCES.vpcs, when=owned(LAMBDAS.vpc_status_provisioned))
 def vpc_opr_on_vpc_provisioned(body, spec, **kwargs):
 	param = HandlerParam()
 	param.name = kwargs['name']
@@ -32,7 +33,7 @@ def vpc_opr_on_vpc_provisioned(body, spec, **kwargs):
 	param.diff = kwargs['diff']
 	run_task(wffactory().VpcProvisioned(param=param))
 
-@kopf.on.delete(group, version, RESOURCES.vpcs)
+@kopf.on.delete(group, version, RESOURCES.vpcs, when=owned())
 def  vpc_opr_on_vpc_delete(body, spec, **kwargs):
 	param = HandlerParam()
 	param.name = kwargs['name']
@@ -1,5 +1,6 @@
 import logging
-from common.rpc import TrnRpc
+from common.rpc import TrnRpc, AsyncTrnRpc
+from common.trn_rpc_protocol import RPC_TRN_MAX_VPC_ROUTERS
 from common.constants import *
 from common.common import *
 from common.cidr import Cidr
@@ -7,6 +8,11 @@ from common.cidr import Cidr
 logger = logging.getLogger()
 
 class Bouncer(object):
+	__slots__ = ('name', 'obj_api', 'store', 'droplet', 'droplet_obj', 'vpc',
+		'vni', 'nip', 'prefix', 'net', 'ip', 'mac', 'eps', 'dividers',
+		'known_substrates', 'status')
+	scaled_ep_obj = '/trn_xdp/trn_transit_scaled_endpoint_ebpf_debug.o'
+
 	def __init__(self, name, obj_api, opr_store, spec=None):
 		self.name = name
 		self.obj_api = obj_api
@@ -21,19 +27,22 @@ class Bouncer(object):
 		self.ip = ""
 		self.mac = ""
 		self.eps = {}
-		self.dividers = {}
+		self.dividers = IpMap(RPC_TRN_MAX_VPC_ROUTERS)
 		self.known_substrates = {}
 		self.status = OBJ_STATUS.bouncer_status_init
-		self.scaled_ep_obj = '/trn_xdp/trn_transit_scaled_endpoint_ebpf_debug.o'
 		if spec is not None:
 			self.set_obj_spec(spec)
 
 	@property
 	def rpc(self):
-		return TrnRpc(self.ip, self.mac)
+		return TrnRpc.get(self.ip, self.mac)
+
+	@property
+	def arpc(self):
+		return AsyncTrnRpc(self.ip, self.mac)
 
 	def get_obj_spec(self):
-		self.obj = {
+		return {
 			"vpc": self.vpc,
 			"net": self.net,
 			"ip": self.ip,
@@ -45,18 +54,16 @@ class Bouncer(object):
 			"prefix": self.prefix
 		}
 
-		return self.obj
-
 	def set_obj_spec(self, spec):
-		self.status = get_spec_val('status', spec)
-		self.vpc = get_spec_val('vpc', spec)
-		self.net = get_spec_val('net', spec)
-		self.ip = get_spec_val('ip', spec)
-		self.mac = get_spec_val('mac', spec)
-		self.droplet = get_spec_val('droplet', spec)
-		self.vni = get_spec_val('vni', spec)
-		self.nip = get_spec_val('nip', spec)
-		self.prefix = get_spec_val('prefix', spec)
+		self.status = get_spec_sym('status', spec)
+		self.vpc = get_spec_sym('vpc', spec)
+		self.net = get_spec_sym('net', spec)
+		self.ip = get_spec_sym('ip', spec)
+		self.mac = get_spec_sym('mac', spec)
+		self.droplet = get_spec_sym('droplet', spec)
+		self.vni = get_spec_sym('vni', spec)
+		self.nip = get_spec_sym('nip', spec)
+		self.prefix = get_spec_sym('prefix', spec)
 
 	# K8s APIs
 	def get_name(self):
@@ -69,11 +76,7 @@ class Bouncer(object):
 		return "Bouncer"
 
 	def get_divider_ips(self):
-		divider_ips = []
-		for d in self.dividers.values():
-			if d.ip not in divider_ips:
-				divider_ips.append(d.ip)
-		return divider_ips
+		return self.dividers.ips
 
 	def get_nip(self):
 		return self.nip
@@ -100,19 +103,25 @@ class Bouncer(object):
 	def delete_obj(self):
 		return kube_delete_obj(self)
 
-	def watch_obj(self, watch_callback):
-		return kube_watch_obj(self, watch_callback)
+	def watch_obj(self, watch_callback, timeout=None):
+		return kube_watch_obj(self, watch_callback, timeout)
 
 	def set_status(self, status):
 		self.status = status
 
 	def update_eps(self, eps):
+		new_eps = []
 		for ep in eps:
 			if ep.name not in self.eps.keys():
-				logger.info("EEP: Updated")
 				self.eps[ep.name] = ep
-				self._update_ep(ep)
-				self.droplet_obj.update_substrate(ep)
+				new_eps.append(ep)
+		if len(new_eps) == 1:
+			logger.info("EEP: Updated")
+			self._update_ep(new_eps[0])
+			self.droplet_obj.update_substrate(new_eps[0])
+		elif new_eps:
+			logger.info("EEP: Updated {} endpoints in batch".format(len(new_eps)))
+			self.droplet_obj.update_eps_batch(self.name, new_eps)
 
 	def _update_ep(self, ep):
 		logger.info("self ip {} epfuncip {}, field ip {}".format(self.ip, ep.get_droplet_ip(), ep.droplet_obj.ip))
@@ -131,7 +140,7 @@ class Bouncer(object):
 				self.droplet_obj.update_substrate(divider)
 			else:
 				logger.info("Divider removed: {}".format(divider.name))
-				self.dividers[divider.name] = divider
+				self.dividers.pop(divider.name, None)
 				self.droplet_obj.delete_substrate(divider)
 		self.droplet_obj.update_vpc(self)
 
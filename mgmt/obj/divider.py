@@ -1,12 +1,15 @@
 import logging
 import luigi
-from common.rpc import TrnRpc
+from common.rpc import TrnRpc, AsyncTrnRpc
 from common.constants import *
 from common.common import *
 
 logger = logging.getLogger()
 
 class Divider(object):
+	__slots__ = ('name', 'obj_api', 'store', 'vpc', 'vni', 'ip', 'mac',
+		'droplet', 'droplet_obj', 'bouncers', 'status')
+
 	def __init__(self, name, obj_api, opr_store, spec=None):
 		self.name = name
 		self.obj_api = obj_api
@@ -24,10 +27,14 @@ class Divider(object):
 
 	@property
 	def rpc(self):
-		return TrnRpc(self.ip, self.mac)
+		return TrnRpc.get(self.ip, self.mac)
+
+	@property
+	def arpc(self):
+		return AsyncTrnRpc(self.ip, self.mac)
 
 	def get_obj_spec(self):
-		self.obj = {
+		return {
 			"vpc": self.vpc,
 			"vni": self.vni,
 			"mac": self.mac,
@@ -36,14 +43,12 @@ class Divider(object):
 			"droplet": self.droplet
 		}
 
-		return self.obj
-
 	def set_obj_spec(self, spec):
-		self.status = get_spec_val('status', spec)
-		self.vpc = get_spec_val('vpc', spec)
-		self.ip = get_spec_val('ip', spec)
-		self.mac = get_spec_val('mac', spec)
-		self.droplet = get_spec_val('droplet', spec)
+		self.status = get_spec_sym('status', spec)
+		self.vpc = get_spec_sym('vpc', spec)
+		self.ip = get_spec_sym('ip', spec)
+		self.mac = get_spec_sym('mac', spec)
+		self.droplet = get_spec_sym('droplet', spec)
 
 	# K8s APIs
 	def get_name(self):
@@ -74,8 +79,8 @@ class Divider(object):
 	def delete_obj(self):
 		return kube_delete_obj(self)
 
-	def watch_obj(self, watch_callback):
-		return kube_watch_obj(self, watch_callback)
+	def watch_obj(self, watch_callback, timeout=None):
+		return kube_watch_obj(self, watch_callback, timeout)
 
 	def set_status(self, status):
 		self.status = status
@@ -93,21 +98,24 @@ class Divider(object):
 		self.mac = droplet.mac
 
 	def update_net(self, net, add=True):
-		for bouncer in list(net.bouncers.values()):
-			if add:
-				if bouncer.name not in self.bouncers.keys():
-					logger.info("Bouncer {} added for Net {}".format(bouncer.name, net.name))
-					self.bouncers[bouncer.name] = bouncer
-					self.droplet_obj.update_substrate(bouncer)
-			else:
-				if bouncer.name in self.bouncers.keys():
-					logger.info("Bouncer {} removed from Net {}".format(bouncer.name,net.name))
-					self.bouncers[bouncer.name] = bouncer
-					self.droplet_obj.delete_substrate(bouncer)
+		# Brings the divider's bouncers of net in line with the net's, add
+		# only tells which change the caller made
+		members = net.bouncers
+		for bouncer in list(members.values()):
+			if bouncer.name not in self.bouncers:
+				logger.info("Bouncer {} added for Net {}".format(bouncer.name, net.name))
+				self.bouncers[bouncer.name] = bouncer
+				self.droplet_obj.update_substrate(bouncer)
+		for bouncer in list(self.bouncers.values()):
+			if bouncer.net == net.name and bouncer.name not in members:
+				logger.info("Bouncer {} removed from Net {}".format(bouncer.name, net.name))
+				del self.bouncers[bouncer.name]
+				self.droplet_obj.delete_substrate(bouncer)
 		self.droplet_obj.update_net(net)
 
 	def delete_net(self, net):
-		for name in net.bouncers.values():
-			bouncer = self.bouncers.pop(name)
-			self.droplet_obj.delete_substrate(bouncer)
+		for bouncer in list(self.bouncers.values()):
+			if bouncer.net == net.name:
+				del self.bouncers[bouncer.name]
+				self.droplet_obj.delete_substrate(bouncer)
 		self.droplet_obj.delete_net(net)
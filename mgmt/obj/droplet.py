@@ -1,14 +1,40 @@
 import logging
 import json
-from common.rpc import TrnRpc
+from common.rpc import TrnRpc, AsyncTrnRpc
 from common.constants import *
 from common.common import *
-from common.common import run_cmd
 
 logger = logging.getLogger()
 
+class KnownMap(dict):
+	"""
+	name -> value map that also counts the names referring to each value,
+	so "is this value still in use" is answered without a scan.
+	"""
+	def __init__(self):
+		super().__init__()
+		self.refs = {}
+
+	def add(self, name, value):
+		if name in self:
+			return
+		self[name] = value
+		self.refs[value] = self.refs.get(value, 0) + 1
+
+	def remove(self, name):
+		value = self.pop(name)
+		n = self.refs[value] - 1
+		if n:
+			self.refs[value] = n
+		else:
+			del self.refs[value]
+
+	def referenced(self, value):
+		return value in self.refs
 
 class Droplet(object):
+	__slots__ = ('name', 'obj_api', 'store', 'ip', 'mac', 'phy_itf', 'status',
+		'known_substrates', 'known_bouncers', 'known_nets', 'known_eps')
 
 	def __init__(self, name, obj_api, opr_store, spec=None):
 		self.name = name
@@ -18,32 +44,38 @@ class Droplet(object):
 		self.mac = ""
 		self.phy_itf = 'eth0'
 		self.status = OBJ_STATUS.droplet_status_init
-		self.known_substrates = {}
-		self.known_bouncers = {}
-		self.known_nets = {}
-		self.known_eps = {}
+		self.known_substrates = KnownMap()
+		self.known_bouncers = KnownMap()
+		self.known_nets = KnownMap()
+		self.known_eps = KnownMap()
 		if spec is not None:
 			self.set_obj_spec(spec)
 
 	@property
 	def rpc(self):
-		return TrnRpc(self.ip, self.mac)
+		return TrnRpc.get(self.ip, self.mac)
+
+	@property
+	def arpc(self):
+		return AsyncTrnRpc(self.ip, self.mac)
 
 	def get_obj_spec(self):
-		self.obj = {
+		return {
 			"mac": self.mac,
 			"ip": self.ip,
 			"status": self.status,
 			"itf": self.phy_itf
 		}
 
-		return self.obj
-
 	def set_obj_spec(self, spec):
-		self.status = get_spec_val('status', spec)
+		old = (self.ip, self.mac, self.phy_itf)
+		self.status = get_spec_sym('status', spec)
 		self.mac = get_spec_val('mac', spec)
 		self.ip = get_spec_val('ip', spec)
-		self.phy_itf = get_spec_val('itf', spec)
+		self.phy_itf = get_spec_sym('itf', spec)
+		# Drop the cached RPC client if the droplet moved or changed
+		if old[0] and old != (self.ip, self.mac, self.phy_itf):
+			TrnRpc.invalidate(old[0])
 
 	# K8s APIs
 	def get_name(self):
@@ -64,6 +96,7 @@ class Droplet(object):
 		if self.store is None:
 			return
 		self.store.delete_droplet(self.name)
+		TrnRpc.invalidate(self.ip)
 
 	def create_obj(self):
 		return kube_create_obj(self)
@@ -74,59 +107,66 @@ class Droplet(object):
 	def delete_obj(self):
 		return kube_delete_obj(self)
 
-	def watch_obj(self, watch_callback):
-		return kube_watch_obj(self, watch_callback)
+	def watch_obj(self, watch_callback, timeout=None):
+		return kube_watch_obj(self, watch_callback, timeout)
 
 	def set_status(self, status):
 		self.status = status
 
 	def update_substrate(self, obj):
-		if obj.name not in self.known_substrates.keys():
+		if obj.name not in self.known_substrates:
 			logger.info("DROPLET_SUBSTRATE: Updated")
-			self.known_substrates[obj.name] = obj.droplet_obj.ip
+			self.known_substrates.add(obj.name, obj.droplet_obj.ip)
 		self.rpc.update_substrate_ep(obj.droplet_obj.ip, obj.droplet_obj.mac)
 
 	def delete_substrate(self, obj):
-		if obj.name in self.known_substrates.keys():
-			self.known_substrates.pop(obj.name)
-			if obj.droplet_obj.ip not in self.known_substrates.values():
+		if obj.name in self.known_substrates:
+			self.known_substrates.remove(obj.name)
+			if not self.known_substrates.referenced(obj.droplet_obj.ip):
 				logger.info("DROPLET_SUBSTRATE: Deleted")
 				self.rpc.delete_substrate_ep(obj.droplet_obj.ip)
 
 	def update_vpc(self, bouncer):
-		if bouncer.name not in self.known_bouncers.keys():
-			self.known_bouncers[bouncer.name] = bouncer.vpc
+		self.known_bouncers.add(bouncer.name, bouncer.vpc)
 		self.rpc.update_vpc(bouncer)
 
 
 	def delete_vpc(self, bouncer):
-		if bouncer.name in self.known_bouncers.keys():
-			self.known_bouncers.pop(bouncer.name)
-			if bouncer.vpc not in self.known_bouncers.values():
+		if bouncer.name in self.known_bouncers:
+			self.known_bouncers.remove(bouncer.name)
+			if not self.known_bouncers.referenced(bouncer.vpc):
 				self.rpc.delete_vpc(bouncer)
 
 	def update_net(self, net):
 		nip = net.get_nip()
-		if net.name not in self.known_nets.keys():
-			self.known_nets[net.name] = nip
+		self.known_nets.add(net.name, nip)
 		self.rpc.update_net(net)
 
 	def delete_net(self, net):
 		nip = net.get_nip()
-		if net.name in self.known_nets.keys():
-			self.known_nets.pop(net.name)
-			if nip not in self.known_nets.values():
+		if net.name in self.known_nets:
+			self.known_nets.remove(net.name)
+			if not self.known_nets.referenced(nip):
 				self.rpc.delete_net(net)
 
-	def update_ep(self, name, ep):
+	def update_ep(self, name, ep, coalesce=False):
 		name = name + ep.name
-		if name not in self.known_eps.keys():
-			self.known_eps[name] = ep.ip
-		self.rpc.update_ep(ep)
+		self.known_eps.add(name, ep.ip)
+		self.rpc.update_ep(ep, coalesce)
+
+	def update_eps_batch(self, name, eps):
+		substrates = {}
+		for ep in eps:
+			if ep.droplet_obj is not None:
+				self.known_substrates.add(ep.name, ep.droplet_obj.ip)
+				substrates[ep.droplet_obj.ip] = ep.droplet_obj.mac
+			self.known_eps.add(name + ep.name, ep.ip)
+		logger.info("DROPLET_EPS: Batch of {} eps, {} substrates".format(len(eps), len(substrates)))
+		self.rpc.update_eps_batch(eps, substrates.items())
 
 	def delete_ep(self, name, ep):
 		name = name + ep.name
-		if name in self.known_eps.keys():
-			self.known_eps.pop(name)
-			if ep.ip not in self.known_eps.values():
+		if name in self.known_eps:
+			self.known_eps.remove(name)
+			if not self.known_eps.referenced(ep.ip):
 				self.rpc.delete_ep(ep)
\ No newline at end of file
@@ -1,12 +1,19 @@
 import logging
 import ipaddress
-from common.rpc import TrnRpc
+from common.rpc import TrnRpc, AsyncTrnRpc
+from obj.net_bouncers import NetBouncers
 from common.constants import *
 from common.common import *
 
 logger = logging.getLogger()
 
 class Endpoint:
+	__slots__ = ('name', 'obj_api', 'store', 'vpc', 'net', 'vni', 'status',
+		'gw', '_ip', 'prefix', '_mac', 'type', 'droplet', 'droplet_ip',
+		'droplet_mac', 'droplet_eth', 'droplet_obj', 'veth_peer', 'veth_name',
+		'netns', 'container_id', 'local_id', 'veth_index', 'veth_peer_index',
+		'veth_peer_mac', 'backends', 'deleted')
+
 	def __init__(self, name, obj_api, opr_store, spec=None):
 		self.name = name
 		self.obj_api = obj_api
@@ -17,9 +24,9 @@ class Endpoint:
 		self.vni = ""
 		self.status = ""
 		self.gw = ""
-		self.ip = ""
+		self._ip = ""
 		self.prefix = ""
-		self.mac = ""
+		self._mac = ""
 		self.type = ""
 		self.droplet = ""
 		self.droplet_ip = ""
@@ -34,16 +41,44 @@ class Endpoint:
 		self.veth_index = ""
 		self.veth_peer_index = ""
 		self.veth_peer_mac = ""
-		self.bouncers = {}
+		self.backends = ()
 		if spec is not None:
 			self.set_obj_spec(spec)
 		self.deleted = False
 
+	# The endpoint's own addresses are kept packed, there are many endpoints
+	@property
+	def ip(self):
+		return unpack_ip(self._ip)
+
+	@ip.setter
+	def ip(self, ip):
+		self._ip = pack_ip(ip)
+
+	@property
+	def mac(self):
+		return unpack_mac(self._mac)
+
+	@mac.setter
+	def mac(self, mac):
+		self._mac = pack_mac(mac)
+
+	@property
+	def bouncers(self):
+		# Every endpoint of a net has the same bouncers
+		return NetBouncers.get(self.net)
+
 	@property
 	def rpc(self):
-		return TrnRpc(self.droplet_ip, self.droplet_mac)
+		return TrnRpc.get(self.droplet_ip, self.droplet_mac)
+
+	@property
+	def arpc(self):
+		return AsyncTrnRpc(self.droplet_ip, self.droplet_mac)
 
 	def get_nip(self):
+		if type(self._ip) is int:
+			return unpack_ip(self._ip & prefix_mask(self.prefix))
 		ip = ipaddress.ip_interface(self.ip + '/' + self.prefix)
 		return str(ip.network.network_address)
 
@@ -51,11 +86,10 @@ class Endpoint:
 		return self.prefix
 
 	def get_bouncers_ips(self):
-		bouncers = [b.ip for b in self.bouncers.values()]
-		return bouncers
+		return self.bouncers.ips
 
 	def get_obj_spec(self):
-		self.obj = {
+		return {
 				"type": self.type,
 				"status": self.status,
 				"vpc": self.vpc,
@@ -73,24 +107,22 @@ class Endpoint:
 				"hostmac": self.droplet_mac
 		}
 
-		return self.obj
-
 	def set_obj_spec(self, spec):
-		self.type = get_spec_val('type', spec)
-		self.status = get_spec_val('status', spec)
-		self.vpc = get_spec_val('vpc', spec)
-		self.net = get_spec_val('net', spec)
+		self.type = get_spec_sym('type', spec)
+		self.status = get_spec_sym('status', spec)
+		self.vpc = get_spec_sym('vpc', spec)
+		self.net = get_spec_sym('net', spec)
 		self.ip = get_spec_val('ip', spec)
-		self.gw = get_spec_val('gw', spec)
+		self.gw = get_spec_sym('gw', spec)
 		self.mac = get_spec_val('mac', spec)
-		self.vni = get_spec_val('vni', spec)
-		self.droplet = get_spec_val('droplet', spec)
-		self.prefix = get_spec_val('prefix', spec)
+		self.vni = get_spec_sym('vni', spec)
+		self.droplet = get_spec_sym('droplet', spec)
+		self.prefix = get_spec_sym('prefix', spec)
 		self.veth_name = get_spec_val('itf', spec)
 		self.veth_peer = get_spec_val('veth', spec)
 		self.netns = get_spec_val('netns', spec)
-		self.droplet_ip = get_spec_val('hostip', spec)
-		self.droplet_mac = get_spec_val('hostmac', spec)
+		self.droplet_ip = get_spec_sym('hostip', spec)
+		self.droplet_mac = get_spec_sym('hostmac', spec)
 
 	def get_name(self):
 		return self.name
@@ -113,7 +145,7 @@ class Endpoint:
 
 	# K8s APIs
 	def create_obj(self):
-		return kube_create_obj(self)
+		return kube_create_obj(self, {CONSTANTS.DROPLET_LABEL: self.droplet} if self.droplet else None)
 
 	def update_obj(self):
 		return kube_update_obj(self)
@@ -124,8 +156,10 @@ class Endpoint:
 		self.deleted = True
 		return kube_delete_obj(self)
 
-	def watch_obj(self, watch_callback):
-		return kube_watch_obj(self, watch_callback)
+	def watch_obj(self, watch_callback, timeout=None):
+		# Only the endpoints of the droplet, a node does not cache them all
+		return kube_watch_obj(self, watch_callback, timeout,
+			"{}={}".format(CONSTANTS.DROPLET_LABEL, self.droplet))
 
 	# Setters
 	def set_vpc(self, vpc):
@@ -192,15 +226,20 @@ class Endpoint:
 		self.veth_peer_mac = veth_peer_mac
 
 	def update_bouncers(self, bouncers, add=True):
-		for bouncer in bouncers.values():
+		if hasattr(bouncers, 'values'):
+			bouncers = bouncers.values()
+		membership = self.bouncers
+		for bouncer in bouncers:
+			# A no-op when the net's membership was already changed
 			if add:
-				self.bouncers[bouncer.name] = bouncer
+				membership.add(bouncer)
 				self.update_agent_substrate(self, bouncer)
 			else:
-				self.bouncers.pop(bouncer.name)
-				self.droplet_obj.delete_agent_substrate(self, bouncer)
-		self.rpc.update_agent_metadata(self)
-		self.droplet_obj.update_ep(self.name, self)
+				membership.remove(bouncer.name)
+				self.delete_agent_substrate(self, bouncer)
+		# Bouncers come and go in bursts, only the last state matters
+		self.rpc.update_agent_metadata(self, coalesce=True)
+		self.droplet_obj.update_ep(self.name, self, coalesce=True)
 
 	def set_backends(self, backends):
 		self.backends = backends
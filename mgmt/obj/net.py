@@ -1,34 +1,40 @@
 import uuid
 import logging
 import random
-from common.rpc import TrnRpc
 from common.constants import *
 from common.common import *
 from obj.bouncer import Bouncer
+from obj.net_bouncers import NetBouncers
 from common.cidr import Cidr
-from kubernetes.client.rest import ApiException
 
 logger = logging.getLogger()
 
 class Net(object):
+	__slots__ = ('name', 'vpc', 'vni', 'cidr', 'n_bouncers',
+		'n_allocated_bouncers', 'endpoints', 'obj_api', 'store',
+		'gw', 'nip', 'prefixlen', 'gw_ip', 'status')
+
 	def __init__(self, name, obj_api, opr_store, spec=None):
 		self.name = name
 		self.vpc = OBJ_DEFAULTS.default_ep_vpc
 		self.vni = OBJ_DEFAULTS.default_vpc_vni
-		self.cidr = Cidr(OBJ_DEFAULTS.default_net_prefix, OBJ_DEFAULTS.default_net_ip)
+		self.set_cidr(Cidr(OBJ_DEFAULTS.default_net_prefix, OBJ_DEFAULTS.default_net_ip))
 		self.n_bouncers = OBJ_DEFAULTS.default_n_bouncers
 		self.n_allocated_bouncers = 0
-		self.bouncers = {}
 		self.endpoints = {}
 		self.obj_api = obj_api
 		self.store = opr_store
-		self.gw = self.cidr.gw
 		self.status = OBJ_STATUS.net_status_init
 		if spec is not None:
 			self.set_obj_spec(spec)
 
+	@property
+	def bouncers(self):
+		# The net's provisioned bouncers, as its endpoints know them
+		return NetBouncers.get(self.name)
+
 	def get_obj_spec(self):
-		self.obj = {
+		return {
 			"ip": self.cidr.ip,
 			"prefix": self.cidr.prefixlen,
 			"vni": self.vni,
@@ -37,17 +43,14 @@ class Net(object):
 			"status": self.status
 		}
 
-		return self.obj
-
 	def set_obj_spec(self, spec):
-		self.status = get_spec_val('type', spec)
-		self.vpc = get_spec_val('vpc', spec)
-		self.vni = get_spec_val('vni', spec)
+		self.status = get_spec_sym('status', spec)
+		self.vpc = get_spec_sym('vpc', spec)
+		self.vni = get_spec_sym('vni', spec)
 		self.n_bouncers = int(get_spec_val('bouncers', spec, OBJ_DEFAULTS.default_n_bouncers))
 		ip = get_spec_val('ip', spec, OBJ_DEFAULTS.default_net_ip)
 		prefix = get_spec_val('prefix', spec, OBJ_DEFAULTS.default_net_prefix)
-		self.cidr = Cidr(prefix, ip)
-		self.gw = self.cidr.gw
+		self.set_cidr(Cidr(prefix, ip))
 
 	# K8s APIs
 	def get_name(self):
@@ -78,8 +81,8 @@ class Net(object):
 	def delete_obj(self):
 		return kube_delete_obj(self)
 
-	def watch_obj(self, watch_callback):
-		return kube_watch_obj(self, watch_callback)
+	def watch_obj(self, watch_callback, timeout=None):
+		return kube_watch_obj(self, watch_callback, timeout)
 
 	def set_vni(self, vni):
 		self.vni = vni
@@ -87,26 +90,30 @@ class Net(object):
 	def set_status(self, status):
 		self.status = status
 
+	def set_cidr(self, cidr):
+		self.cidr = cidr
+		self.gw = cidr.gw
+		# Kept as the strings the RPC payloads carry
+		self.nip = str(cidr.ip)
+		self.prefixlen = str(cidr.prefixlen)
+		self.gw_ip = str(cidr.gw)
+
 	def get_gw_ip(self):
-		return str(self.cidr.get_ip(1))
+		return self.gw_ip
 
 	def get_tunnel_id(self):
 		return str(self.vni)
 
 	def get_nip(self):
-		return str(self.cidr.ip)
+		return self.nip
 
 	def get_prefixlen(self):
-		return str(self.cidr.prefixlen)
+		return self.prefixlen
 
 	def get_bouncers_ips(self):
-		bouncer_ips = []
-		for b in self.bouncers.values():
-			if b.ip not in bouncer_ips:
-				bouncer_ips.append(b.ip)
-		return bouncer_ips
+		return self.bouncers.ips
 
-	def create_bouncer(self):
+	def new_bouncer(self):
 		u = str(uuid.uuid4())
 		bouncer_name = self.name +'-b-' + u
 		logger.info("Create bouncer {} for net {}".format(bouncer_name, self.name))
@@ -115,10 +122,17 @@ class Net(object):
 		b.set_cidr(self.cidr)
 		b.set_vni(self.vni)
 		b.set_net(self.name)
-		b.create_obj()
+		return b
+
+	def create_bouncer(self):
+		self.new_bouncer().create_obj()
+
+	def create_bouncers(self, n):
+		kube_create_objs([self.new_bouncer() for i in range(n)])
 
 	def delete_bouncer(self):
-		b = self.bouncers.pop(random.choice(list(self.bouncers.keys())))
+		b = self.bouncers.get_bouncer(random.choice(list(self.bouncers.keys())))
+		self.bouncers.remove(b.name)
 		logger.info("Deleted bouncer {} from net {}".format(b.name, self.name))
 		b.delete_obj()
 
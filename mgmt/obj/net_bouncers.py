@@ -0,0 +1,88 @@
+import logging
+import threading
+from types import MappingProxyType
+from common.trn_rpc_protocol import IpArray, RPC_TRN_MAX_NET_SWITCHES
+
+logger = logging.getLogger()
+
+class NetBouncers(object):
+	"""
+	The bouncers of a net, shared by the net and all of its endpoints.
+	Every change makes a new version with its switch IPs encoded once;
+	reads are lock free.
+	"""
+	__slots__ = ('net', 'version', 'members', 'ips', 'lock')
+
+	_nets = {}
+	_nets_lock = threading.Lock()
+
+	@classmethod
+	def get(cls, net):
+		m = cls._nets.get(net)
+		if m is None:
+			with cls._nets_lock:
+				m = cls._nets.get(net)
+				if m is None:
+					m = cls._nets[net] = cls(net)
+		return m
+
+	@classmethod
+	def drop(cls, net):
+		with cls._nets_lock:
+			cls._nets.pop(net, None)
+
+	def __init__(self, net):
+		self.net = net
+		self.version = 0
+		self.members = MappingProxyType({})
+		self.ips = IpArray((), RPC_TRN_MAX_NET_SWITCHES)
+		self.lock = threading.Lock()
+
+	def add(self, bouncer):
+		with self.lock:
+			if self.members.get(bouncer.name) is bouncer:
+				return False
+			members = dict(self.members)
+			members[bouncer.name] = bouncer
+			self._set(members)
+			return True
+
+	def remove(self, name):
+		with self.lock:
+			if name not in self.members:
+				return False
+			members = dict(self.members)
+			del members[name]
+			self._set(members)
+			return True
+
+	def _set(self, members):
+		# Several bouncers may share a droplet, the switch list has each IP once
+		self.ips = IpArray(dict.fromkeys(b.ip for b in members.values()), RPC_TRN_MAX_NET_SWITCHES)
+		self.members = MappingProxyType(members)
+		self.version += 1
+		logger.info("Net {} bouncers version {}: {}".format(self.net, self.version, list(self.ips)))
+
+	def __getitem__(self, name):
+		return self.members[name]
+
+	def __iter__(self):
+		return iter(self.members)
+
+	def __len__(self):
+		return len(self.members)
+
+	def __contains__(self, name):
+		return name in self.members
+
+	def get_bouncer(self, name):
+		return self.members.get(name)
+
+	def keys(self):
+		return self.members.keys()
+
+	def values(self):
+		return self.members.values()
+
+	def items(self):
+		return self.members.items()
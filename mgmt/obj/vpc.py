@@ -1,16 +1,17 @@
 import logging
 import random
 import uuid
-from common.rpc import TrnRpc
 from common.constants import *
 from common.common import *
 from common.cidr import Cidr
 from obj.divider import Divider
-from kubernetes.client.rest import ApiException
 
 logger = logging.getLogger()
 
 class Vpc(object):
+	__slots__ = ('name', 'vni', 'cidr', 'n_dividers', 'n_allocated_dividers',
+		'obj_api', 'status', 'dividers', 'networks', 'store')
+
 	def __init__(self, name, obj_api, opr_store, spec=None):
 		self.name = name
 		self.vni = OBJ_DEFAULTS.default_vpc_vni
@@ -26,7 +27,7 @@ class Vpc(object):
 			self.set_obj_spec(spec)
 
 	def get_obj_spec(self):
-		self.obj = {
+		return {
 			"ip": self.cidr.ip,
 			"prefix": self.cidr.prefixlen,
 			"vni": self.vni,
@@ -34,11 +35,9 @@ class Vpc(object):
 			"status": self.status
 		}
 
-		return self.obj
-
 	def set_obj_spec(self, spec):
-		self.status = get_spec_val('status', spec)
-		self.vni = get_spec_val('vni', spec)
+		self.status = get_spec_sym('status', spec)
+		self.vni = get_spec_sym('vni', spec)
 		self.n_dividers = int(get_spec_val('dividers', spec, OBJ_DEFAULTS.default_n_dividers))
 		ip = get_spec_val('ip', spec, OBJ_DEFAULTS.default_net_ip)
 		prefix = get_spec_val('prefix', spec, OBJ_DEFAULTS.default_net_prefix)
@@ -73,8 +72,8 @@ class Vpc(object):
 	def delete_obj(self):
 		return kube_delete_obj(self)
 
-	def watch_obj(self, watch_callback):
-		return kube_watch_obj(self, watch_callback)
+	def watch_obj(self, watch_callback, timeout=None):
+		return kube_watch_obj(self, watch_callback, timeout)
 
 	def set_vni(self, vni):
 		self.vni = vni
@@ -82,7 +81,7 @@ class Vpc(object):
 	def set_status(self, status):
 		self.status = status
 
-	def create_divider(self):
+	def new_divider(self):
 		u = str(uuid.uuid4())
 		divider_name = self.name +'-d-' + u
 		logger.info("Create divider {} for vpc {}".format(divider_name, self.name))
@@ -91,7 +90,13 @@ class Vpc(object):
 		d.set_vpc(self.name)
 		d.set_vni(self.vni)
 		self.dividers[divider_name] = d
-		d.create_obj()
+		return d
+
+	def create_divider(self):
+		self.new_divider().create_obj()
+
+	def create_dividers(self, n):
+		kube_create_objs([self.new_divider() for i in range(n)])
 
 	def delete_divider(self):
 		logger.info("Delete divider for net {}".format(self.name))
@@ -6,6 +6,16 @@ import asyncio
 import os.path
 import time
 from common.wf_param import *
+from common.metrics import start_metrics_server
+from store.operator_store import OprStore
+from store.snapshot import StoreSnapshot, StoreSnapshotter
+from store.reconciler import StoreReconciler
+from store.introspect import register_store_pages
+from common.shard import SHARDS
+from common.rpc import TrnRpc
+from obj.net_bouncers import NetBouncers
+from common.kube_api import kube_api, background
+import common.common
 from dp.mizar.workflows.vpcs.triggers import *
 from dp.mizar.workflows.nets.triggers import *
 from dp.mizar.workflows.dividers.triggers import *
@@ -17,12 +27,55 @@ from dp.mizar.workflows.builtins.services.triggers import *
 logger = logging.getLogger()
 LOCK: asyncio.Lock
 
+def on_shards_acquired(shards):
+	"""
+	Loads the objects of the VPC shards taken over from another replica,
+	then nudges those that were still being worked on.
+	"""
+	param = HandlerParam()
+	param.spec = {'shards': shards}
+	background(run_task, wffactory().OperatorLoadShards(param=param))
+	background(SHARDS.nudge, kube_api(), shards)
+
+def on_shards_released(shards):
+	"""
+	Forgets the objects of the VPC shards handed to another replica, with
+	the bouncers of their nets and what their droplets were sent, which
+	the new owner changes without this replica seeing it.
+	"""
+	store = OprStore()
+	lost = lambda vpc: SHARDS.shard_of(vpc) in shards
+	vnis = set()
+	itfs = set()
+	for ep in store.get_all_eps().values():
+		if lost(ep.vpc):
+			if ep.get_veth_peer():
+				itfs.add(ep.get_veth_peer())
+			store.delete_ep(ep.name)
+	for b in store.get_all_bouncers().values():
+		if lost(b.vpc):
+			store.delete_bouncer(b.name)
+	for d in store.get_all_dividers().values():
+		if lost(d.vpc):
+			store.delete_divider(d.name)
+	for n in store.get_all_nets().values():
+		if lost(n.vpc):
+			NetBouncers.drop(n.name)
+			store.delete_net(n.name)
+	for v in store.get_all_vpcs().values():
+		if lost(v.name):
+			vnis.add(v.vni)
+			store.delete_vpc(v.name)
+	TrnRpc.forget_vpcs(vnis, itfs)
+
 @kopf.on.startup()
 async def on_startup(logger, **kwargs):
 	start_time = time.time()
 	global LOCK
 	LOCK = asyncio.Lock()
 	param = HandlerParam()
+	start_metrics_server(CONSTANTS.OPERATOR_METRICS_PORT, CONSTANTS.METRICS_ADDR)
+	register_store_pages(OprStore())
 
 	sched = 'luigid --background --port 8082 --pidfile /var/run/luigi/luigi.pid --logdir /var/log/luigi --state-path /var/lib/luigi/luigi.state'
 	subprocess.call(sched, shell=True)
@@ -37,14 +90,19 @@ async def on_startup(logger, **kwargs):
 
 	start_time = time.time()
 
-	run_task(wffactory().DropletOperatorStart(param=param))
-	run_task(wffactory().DividerOperatorStart(param=param))
-
-	run_task(wffactory().VpcOperatorStart(param=param))
+	# Take this replica's VPC shards before loading their objects
+	SHARDS.start()
 
-	run_task(wffactory().BouncerOperatorStart(param=param))
+	snapshot = StoreSnapshot()
+	if snapshot.load():
+		common.common.bootstrap_snapshot = snapshot
 
-	run_task(wffactory().NetOperatorStart(param=param))
-	run_task(wffactory().EndpointOperatorStart(param=param))
+	background(run_task, wffactory().OperatorStart(param=param))
+	common.common.bootstrap_snapshot = None
+	StoreSnapshotter(OprStore()).start()
+	StoreReconciler(OprStore(), kube_api()).start()
+	SHARDS.on_acquire.append(on_shards_acquired)
+	SHARDS.on_release.append(on_shards_released)
+	SHARDS.serve()
 
 	logger.info("Bootstrap time:  %s seconds ---" % (time.time() - start_time))
\ No newline at end of file
@@ -0,0 +1,89 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from common.constants import *
+from common.kube_api import in_current_lane
+from obj.net_bouncers import NetBouncers
+
+logger = logging.getLogger()
+
+def list_concurrently(listers):
+	"""
+	Runs the listers, functions each listing one kind of object into the
+	store, at the same time. Raises the first error after all are done.
+	"""
+	start = time.monotonic()
+	with ThreadPoolExecutor(max_workers=len(listers), thread_name_prefix='bootstrap') as pool:
+		futures = [pool.submit(in_current_lane(fn)) for fn in listers]
+	for f in futures:
+		f.result()
+	logger.info("Listed all objects in {:.2f}s".format(time.monotonic() - start))
+
+def link_store(store, owns=None):
+	"""
+	Links the stored objects to each other, and rebuilds what every
+	droplet was given, as the handlers had left them before a restart.
+	One pass over the objects and their relationships, so the operator
+	serves events without looking anything up or repairing. Given owns,
+	only the objects of the VPCs it is true for are linked.
+	"""
+	start = time.monotonic()
+	if owns is None:
+		owns = lambda vpc: True
+	droplets = {d.name: d for d in store.get_all_droplets()}
+	vpcs = store.get_all_vpcs()
+	eps = [ep for ep in store.get_all_eps().values() if owns(ep.vpc)]
+
+	for ep in eps:
+		ep.droplet_obj = droplets.get(ep.droplet)
+
+	dividers_of_vpc = {}
+	for d in store.get_all_dividers().values():
+		if not owns(d.vpc):
+			continue
+		d.droplet_obj = droplets.get(d.droplet)
+		if d.droplet_obj is None:
+			continue
+		dividers_of_vpc.setdefault(d.vpc, []).append(d)
+		vpc = vpcs.get(d.vpc)
+		if vpc is not None:
+			vpc.dividers[d.name] = d
+
+	bouncers_of_vpc = {}
+	for b in store.get_all_bouncers().values():
+		if not owns(b.vpc):
+			continue
+		b.droplet_obj = droplets.get(b.droplet)
+		# Only provisioned bouncers were given to the other objects
+		if b.droplet_obj is None or b.status != OBJ_STATUS.bouncer_status_provisioned:
+			continue
+		bouncers_of_vpc.setdefault(b.vpc, []).append(b)
+		NetBouncers.get(b.net).add(b)
+		known = b.droplet_obj
+		for ep in store.get_eps_in_net(b.net).values():
+			b.eps[ep.name] = ep
+			known.known_eps.add(b.name + ep.name, ep.ip)
+			if ep.droplet_obj is not None:
+				known.known_substrates.add(ep.name, ep.droplet_obj.ip)
+		for d in dividers_of_vpc.get(b.vpc, ()):
+			b.dividers[d.name] = d
+			known.known_substrates.add(d.name, d.droplet_obj.ip)
+		if b.dividers:
+			known.known_bouncers.add(b.name, b.vpc)
+
+	for vpc, dividers in dividers_of_vpc.items():
+		bouncers = bouncers_of_vpc.get(vpc, ())
+		nets_in_vpc = [n for n in store.get_nets_in_vpc(vpc).values() if n.bouncers]
+		for d in dividers:
+			known = d.droplet_obj
+			for b in bouncers:
+				d.bouncers[b.name] = b
+				known.known_substrates.add(b.name, b.droplet_obj.ip)
+			for net in nets_in_vpc:
+				known.known_nets.add(net.name, net.get_nip())
+
+	# Endpoints are on their own droplet once they know their bouncers
+	for ep in eps:
+		if ep.droplet_obj is not None and len(NetBouncers.get(ep.net)):
+			ep.droplet_obj.known_eps.add(ep.name + ep.name, ep.ip)
+	logger.info("Linked the store objects in {:.2f}s".format(time.monotonic() - start))
@@ -0,0 +1,97 @@
+import itertools
+import json
+import logging
+import sys
+from common.constants import *
+from common.metrics import register_page
+from store.operator_store import COLLECTIONS
+
+logger = logging.getLogger()
+
+_SCALARS = (str, int, float, bytes)
+
+def _value_bytes(value):
+	if value is None or value is True or value is False:
+		return 0
+	if isinstance(value, _SCALARS):
+		return sys.getsizeof(value)
+	if isinstance(value, dict):
+		return sys.getsizeof(value) + sum(
+			_value_bytes(k) + (_value_bytes(v) if isinstance(v, _SCALARS) else 0)
+			for k, v in value.items())
+	if isinstance(value, (list, tuple, set, frozenset)):
+		return sys.getsizeof(value) + sum(
+			_value_bytes(v) for v in value if isinstance(v, _SCALARS))
+	# Other objects are referred to, they are accounted for where they are kept
+	return 0
+
+def object_bytes(obj):
+	"""
+	Estimates the memory of obj: the object with its attributes and the
+	scalars and containers they hold, without the objects it refers to.
+	Strings shared between objects are counted for each of them.
+	"""
+	size = sys.getsizeof(obj)
+	for cls in type(obj).__mro__:
+		for attr in cls.__dict__.get('__slots__', ()):
+			size += _value_bytes(getattr(obj, attr, None))
+	for value in getattr(obj, '__dict__', {}).values():
+		size += _value_bytes(value)
+	return size
+
+def memory_stats(store, sample=CONSTANTS.STORE_STATS_SAMPLE):
+	"""
+	Returns the estimated bytes per object and in total of every kind,
+	from a sample of its objects.
+	"""
+	stats = {}
+	for kind in COLLECTIONS:
+		objs = store.get_all(kind)
+		sizes = [object_bytes(o) for o in itertools.islice(objs.values(), sample)]
+		per_object = sum(sizes) // len(sizes) if sizes else 0
+		stats[kind] = {
+			"sampled": len(sizes),
+			"per_object": per_object,
+			"total": per_object * len(objs)
+		}
+	return stats
+
+def register_store_pages(store):
+	"""
+	Adds the store pages to the metrics server:
+
+	/store reports the store statistics and memory estimates as JSON.
+	/store/dump?kind=<plural>&after=<name>&limit=<n> streams one page of
+	the objects of a kind in name order, one JSON object per line, ending
+	with {"next": <name>} to pass as after when there are more. It shows
+	every object's spec, so it is only served with MIZAR_STORE_DUMP=1.
+	"""
+	def stats_page(query):
+		stats = store.stats()
+		stats["bytes"] = memory_stats(store)
+		return "application/json", json.dumps(stats).encode()
+
+	def dump_page(query):
+		kind = query.get("kind", "")
+		if kind not in COLLECTIONS:
+			raise KeyError("no store collection '{}'".format(kind))
+		after = query.get("after", "")
+		limit = int(query.get("limit", CONSTANTS.STORE_DUMP_PAGE))
+		if limit < 1:
+			raise ValueError("limit must be positive")
+		return "application/x-ndjson", _dump_lines(store, kind, after, limit)
+
+	register_page("/store", stats_page)
+	if CONSTANTS.STORE_DUMP_ENABLED:
+		register_page("/store/dump", dump_page)
+
+def _dump_lines(store, kind, after, limit):
+	# One more than the page tells whether there is a next page
+	n = 0
+	for name, spec in store.dump(kind, after, limit + 1):
+		if n == limit:
+			yield (json.dumps({"next": after}) + "\n").encode()
+			return
+		n += 1
+		after = name
+		yield (json.dumps({"name": name, "spec": spec}, default=str) + "\n").encode()
@@ -1,249 +1,474 @@
+import heapq
+import bisect
 import logging
+import threading
+import time
+from collections import deque, namedtuple
+from types import MappingProxyType
+from common.constants import *
 
 logger = logging.getLogger()
 
+CHANGE_UPDATE = "update"
+CHANGE_DELETE = "delete"
+
+# One store mutation, kind is the plural of the object. Only the name is
+# kept, consumers read the object from the store, so the log does not keep
+# deleted objects alive
+Change = namedtuple('Change', ['generation', 'kind', 'op', 'name'])
+
+class StoreChangesLost(Exception):
+	"""
+	The changes asked for are no longer in the change log, the caller has
+	to read the store again.
+	"""
+	pass
+
+class Bucket(dict):
+	"""
+	A map of objects by name that the store hands out as a snapshot. Once
+	shared, the store copies it before the next change, so holders of the
+	snapshot can iterate it without locks while writers go on.
+	"""
+	shared = False
+	names = None
+
+	def sorted_names(self):
+		# Only asked of shared buckets, which never change again
+		if self.names is None:
+			self.names = sorted(self)
+		return self.names
+
+EMPTY = MappingProxyType({})
+
+# Collection of each kind of object, and the indexes over them
+COLLECTIONS = {
+	RESOURCES.vpcs: 'vpcs_store',
+	RESOURCES.nets: 'nets_store',
+	RESOURCES.endpoints: 'eps_store',
+	RESOURCES.droplets: 'droplets_store',
+	RESOURCES.dividers: 'dividers_store',
+	RESOURCES.bouncers: 'bouncers_store'
+}
+INDEXES = ('nets_vpc_store', 'eps_net_store', 'eps_droplet_store',
+	'eps_vni_ip_store', 'dividers_vpc_store', 'bouncers_net_store',
+	'bouncers_vpc_store', 'bouncers_droplet_store')
+
+# Status of the objects that need nothing more from the operator
+RECONCILED = {
+	RESOURCES.vpcs: OBJ_STATUS.vpc_status_provisioned,
+	RESOURCES.nets: OBJ_STATUS.net_status_provisioned,
+	RESOURCES.dividers: OBJ_STATUS.divider_status_provisioned,
+	RESOURCES.bouncers: OBJ_STATUS.bouncer_status_provisioned,
+	RESOURCES.endpoints: OBJ_STATUS.ep_status_provisioned,
+	RESOURCES.droplets: OBJ_STATUS.droplet_status_provisioned
+}
+
 class OprStore(object):
+	"""
+	Process wide store of the operator's objects. Writers serialize on a
+	single lock; the get_* methods returning several objects give
+	read-only snapshots that never change under the caller.
+
+	Every mutation bumps the store generation and is appended to a bounded
+	change log, so consumers can ask for what changed since the generation
+	they last saw instead of re-reading collections. Objects not reconciled
+	yet are tracked for the store statistics.
+	"""
 	_instance = None
+	_instance_lock = threading.Lock()
 
 	def __new__(cls, **kwargs):
-		if cls._instance is None:
-			cls._instance = super(OprStore, cls).__new__(cls)
-			cls._init(cls, **kwargs)
+		with cls._instance_lock:
+			if cls._instance is None:
+				cls._instance = super(OprStore, cls).__new__(cls)
+				cls._init(cls, **kwargs)
 		return cls._instance
 
 	def _init(self, **kwargs):
 		logger.info(kwargs)
-		self.droplets_store = {}
-
-		self.vpcs_store = {}
+		self.lock = threading.RLock()
+		self.generation = 0
+		self.changes = deque(maxlen=CONSTANTS.STORE_CHANGE_LOG_SIZE)
+		# kind -> resourceVersion of the list the kind was last loaded from
+		self.resource_versions = {}
+		# (kind, name) -> when the object was first stored unreconciled
+		self.unreconciled = {}
+		self.droplets_store = Bucket()
+
+		self.vpcs_store = Bucket()
 		self.nets_vpc_store = {}
-		self.nets_store = {}
+		self.nets_store = Bucket()
 
-		self.eps_store = {}
+		self.eps_store = Bucket()
 		self.eps_net_store = {}
+		self.eps_droplet_store = {}
+		self.eps_vni_ip_store = {}
+		self.eps_index_keys = {}
 
-		self.dividers_store = {}
+		self.dividers_store = Bucket()
 		self.dividers_vpc_store = {}
 
-		self.bouncers_store = {}
+		self.bouncers_store = Bucket()
 		self.bouncers_net_store = {}
 		self.bouncers_vpc_store = {}
+		self.bouncers_droplet_store = {}
+		self.bouncers_index_keys = {}
+
+	def _snapshot(self, bucket):
+		if bucket is None:
+			return EMPTY
+		bucket.shared = True
+		return MappingProxyType(bucket)
+
+	def _writable(self, name):
+		bucket = getattr(self, name)
+		if bucket.shared:
+			bucket = Bucket(bucket)
+			setattr(self, name, bucket)
+		return bucket
+
+	def _index_add(self, index, key, obj):
+		bucket = index.get(key)
+		if bucket is None:
+			bucket = index[key] = Bucket()
+		elif bucket.shared:
+			bucket = index[key] = Bucket(bucket)
+		bucket[obj.name] = obj
+
+	def _index_remove(self, index, key, name):
+		bucket = index.get(key)
+		if bucket is None or name not in bucket:
+			return
+		if len(bucket) == 1:
+			del index[key]
+			return
+		if bucket.shared:
+			bucket = index[key] = Bucket(bucket)
+		del bucket[name]
+
+	def _changed(self, kind, op, name, obj):
+		self.generation += 1
+		self.changes.append(Change(self.generation, kind, op, name))
+		if op == CHANGE_UPDATE and obj is not None and obj.status != RECONCILED[kind]:
+			self.unreconciled.setdefault((kind, name), time.monotonic())
+		else:
+			self.unreconciled.pop((kind, name), None)
+
+	def changes_since(self, generation, kinds=None):
+		"""
+		Returns the changes after generation, oldest first, optionally only
+		those of the given kinds. Raises StoreChangesLost if some of them
+		have already been dropped from the change log.
+		"""
+		with self.lock:
+			if generation >= self.generation:
+				return []
+			if not self.changes or self.changes[0].generation > generation + 1:
+				raise StoreChangesLost("Generation {} is older than the change log".format(generation))
+			# Generations are contiguous, so the first one wanted is at a known offset
+			start = generation + 1 - self.changes[0].generation
+			changes = [self.changes[i] for i in range(start, len(self.changes))]
+		if kinds is not None:
+			changes = [c for c in changes if c.kind in kinds]
+		return changes
+
+	def cursor(self, kinds=None):
+		return StoreCursor(self, kinds)
+
+	def set_resource_version(self, kind, rv):
+		with self.lock:
+			self.resource_versions[kind] = rv
+
+	def checkpoint(self):
+		"""
+		Returns a read-only snapshot of every collection, and the
+		resourceVersion each kind was listed at, all as of one instant.
+		"""
+		with self.lock:
+			collections = {kind: self._snapshot(getattr(self, attr)) for kind, attr in COLLECTIONS.items()}
+			return collections, dict(self.resource_versions)
+
+	def get(self, kind, name):
+		return getattr(self, COLLECTIONS[kind]).get(name)
+
+	def stats(self, top=CONSTANTS.STORE_STATS_TOP):
+		"""
+		Returns the object count of every collection, the keys and entries
+		of every index, the top largest nets and VPCs by endpoints, and the
+		oldest object not reconciled yet. Only sizes are read, no object
+		is walked.
+		"""
+		with self.lock:
+			collections = {kind: len(getattr(self, attr)) for kind, attr in COLLECTIONS.items()}
+			indexes = {}
+			for attr in INDEXES:
+				index = getattr(self, attr)
+				indexes[attr] = {"keys": len(index), "entries": sum(map(len, index.values()))}
+			eps_in_net = {net: len(eps) for net, eps in self.eps_net_store.items()}
+			nets = [{
+				"name": net,
+				"endpoints": n,
+				"bouncers": len(self.bouncers_net_store.get(net, EMPTY))
+			} for net, n in heapq.nlargest(top, eps_in_net.items(), key=lambda i: i[1])]
+			vpcs = [{
+				"name": vpc,
+				"nets": len(nets_in_vpc),
+				"endpoints": sum(eps_in_net.get(net, 0) for net in nets_in_vpc),
+				"dividers": len(self.dividers_vpc_store.get(vpc, EMPTY)),
+				"bouncers": len(self.bouncers_vpc_store.get(vpc, EMPTY))
+			} for vpc, nets_in_vpc in self.nets_vpc_store.items()]
+			oldest = min(self.unreconciled.items(), key=lambda i: i[1], default=None)
+			stats = {
+				"generation": self.generation,
+				"collections": collections,
+				"indexes": indexes,
+				"largest_nets": nets,
+				"largest_vpcs": heapq.nlargest(top, vpcs, key=lambda v: v["endpoints"]),
+				"unreconciled": len(self.unreconciled),
+				"oldest_unreconciled": None
+			}
+		if oldest is not None:
+			(kind, name), since = oldest
+			stats["oldest_unreconciled"] = {
+				"kind": kind,
+				"name": name,
+				"age": round(time.monotonic() - since, 3)
+			}
+		return stats
+
+	def get_all(self, kind):
+		with self.lock:
+			return self._snapshot(getattr(self, COLLECTIONS[kind]))
+
+	def dump(self, kind, after="", limit=None):
+		"""
+		Yields the name and spec of the objects of kind named after after,
+		in name order, at most limit of them, as of the call. The names are
+		sorted once per version of the collection, so paging through it
+		costs a lookup per page.
+		"""
+		with self.lock:
+			bucket = getattr(self, COLLECTIONS[kind])
+			bucket.shared = True
+		names = bucket.sorted_names()
+		start = bisect.bisect_right(names, after) if after else 0
+		stop = None if limit is None else start + limit
+		for name in names[start:stop]:
+			yield name, bucket[name].get_obj_spec()
+
+	def _index_get(self, index, key):
+		with self.lock:
+			return self._snapshot(index.get(key))
 
 	def update_vpc(self,vpc):
-		self.vpcs_store[vpc.name] = vpc
+		with self.lock:
+			self._writable('vpcs_store')[vpc.name] = vpc
+			self._changed(RESOURCES.vpcs, CHANGE_UPDATE, vpc.name, vpc)
 
 	def delete_vpc(self, name):
-		if name in self.vpcs_store:
-			del self.vpcs_store[name]
+		with self.lock:
+			if name in self.vpcs_store:
+				vpc = self._writable('vpcs_store').pop(name)
+				self._changed(RESOURCES.vpcs, CHANGE_DELETE, name, vpc)
 
 	def get_vpc(self, name):
-		if name in self.vpcs_store:
-			return self.vpcs_store[name]
-		return None
+		return self.vpcs_store.get(name)
 
 	def contains_vpc(self, name):
-		if name in self.vpcs_store:
-			return True
-		return False
+		return name in self.vpcs_store
 
-	def _dump_vpcs(self):
-		for v in self.vpcs_store.values():
-			logger.info("VPC: {}, Spec: {}".format(v.name, v.get_obj_spec()))
+	def get_all_vpcs(self):
+		with self.lock:
+			return self._snapshot(self.vpcs_store)
 
 	def update_net(self,net):
-		self.nets_store[net.name] = net
-
-		if net.vpc not in self.nets_vpc_store:
-			self.nets_vpc_store[net.vpc] = {}
-		self.nets_vpc_store[net.vpc][net.name] = net
+		with self.lock:
+			self._writable('nets_store')[net.name] = net
+			self._index_add(self.nets_vpc_store, net.vpc, net)
+			self._changed(RESOURCES.nets, CHANGE_UPDATE, net.name, net)
 
 	def delete_net(self, name):
-		if name not in self.nets_store:
-			return
-		net = self.nets_store.pop(name)
-
-		if name not in self.nets_vpc_store[net.vpc]:
-			return  net
-		self.nets_vpc_store[net.vpc].pop(name)
-		l = len(self.nets_vpc_store[net.vpc])
-		if  l == 0:
-			del self.nets_vpc_store[net.vpc]
-		return net
+		with self.lock:
+			if name not in self.nets_store:
+				return
+			net = self._writable('nets_store').pop(name)
+			self._index_remove(self.nets_vpc_store, net.vpc, name)
+			self._changed(RESOURCES.nets, CHANGE_DELETE, name, net)
+			return net
 
 	def get_net(self, name):
-		if name in self.nets_store:
-			return self.nets_store[name]
-		return None
+		return self.nets_store.get(name)
 
 	def get_nets_in_vpc(self, vpc):
-		if vpc in self.nets_vpc_store:
-			return self.nets_vpc_store[vpc]
-		return {}
+		return self._index_get(self.nets_vpc_store, vpc)
 
 	def contains_net(self, name):
-		if name in self.nets_store:
-			return True
-		return False
+		return name in self.nets_store
 
-	def _dump_nets(self):
-		for n in self.nets_store.values():
-			logger.info("Net: {}, Spec: {}".format(n.name, n.get_obj_spec()))
+	def get_all_nets(self):
+		with self.lock:
+			return self._snapshot(self.nets_store)
 
 	def update_ep(self,ep):
-		self.eps_store[ep.name] = ep
-		if ep.net not in self.eps_net_store:
-			self.eps_net_store[ep.net] = {}
-		self.eps_net_store[ep.net][ep.name] = ep
-
-	def delete_ep(self, name):
-		if name not in self.eps_store:
+		with self.lock:
+			self._writable('eps_store')[ep.name] = ep
+			# Objects are updated in place, so unindex by the keys used last time
+			self._unindex_ep(ep.name)
+			keys = (ep.net, ep.droplet, (str(ep.vni), ep.ip))
+			self._index_add(self.eps_net_store, keys[0], ep)
+			self._index_add(self.eps_droplet_store, keys[1], ep)
+			self._index_add(self.eps_vni_ip_store, keys[2], ep)
+			self.eps_index_keys[ep.name] = keys
+			self._changed(RESOURCES.endpoints, CHANGE_UPDATE, ep.name, ep)
+
+	def _unindex_ep(self, name):
+		keys = self.eps_index_keys.pop(name, None)
+		if keys is None:
 			return
-		ep = self.eps_store.pop(name)
+		self._index_remove(self.eps_net_store, keys[0], name)
+		self._index_remove(self.eps_droplet_store, keys[1], name)
+		self._index_remove(self.eps_vni_ip_store, keys[2], name)
 
-		if name not in self.eps_net_store[ep.net]:
+	def delete_ep(self, name):
+		with self.lock:
+			if name not in self.eps_store:
+				return
+			ep = self._writable('eps_store').pop(name)
+			self._unindex_ep(name)
+			self._changed(RESOURCES.endpoints, CHANGE_DELETE, name, ep)
 			return ep
-		self.eps_net_store[ep.net].pop(name)
-		l = len(self.eps_net_store[ep.net])
-		if  l == 0:
-			del self.eps_net_store[ep.net]
-		return ep
 
 	def get_ep(self, name):
-		if name in self.eps_store:
-			return self.eps_store[name]
-		return None
+		return self.eps_store.get(name)
 
 	def get_eps_in_net(self, net):
-		if net in self.eps_net_store:
-			return self.eps_net_store[net]
-		return {}
+		return self._index_get(self.eps_net_store, net)
+
+	def get_eps_on_droplet(self, droplet):
+		return self._index_get(self.eps_droplet_store, droplet)
+
+	def get_eps_by_vni_ip(self, vni, ip):
+		return self._index_get(self.eps_vni_ip_store, (str(vni), ip))
 
 	def contains_ep(self, name):
-		if name in self.eps_store:
-			return True
-		return False
+		return name in self.eps_store
 
-	def _dump_eps(self):
-		for e in self.eps_store.values():
-			logger.debug("EP: {}, Spec: {}".format(e.name, e.get_obj_spec()))
+	def get_all_eps(self):
+		with self.lock:
+			return self._snapshot(self.eps_store)
 
 	def update_droplet(self,droplet):
-		self.droplets_store[droplet.name] = droplet
+		with self.lock:
+			self._writable('droplets_store')[droplet.name] = droplet
+			self._changed(RESOURCES.droplets, CHANGE_UPDATE, droplet.name, droplet)
 
 	def delete_droplet(self, name):
-		if name in self.droplets_store:
-			del self.droplets_store[name]
+		with self.lock:
+			if name in self.droplets_store:
+				droplet = self._writable('droplets_store').pop(name)
+				self._changed(RESOURCES.droplets, CHANGE_DELETE, name, droplet)
 
 	def get_droplet(self, name):
-		if name in self.droplets_store:
-			return self.droplets_store[name]
-		return None
+		return self.droplets_store.get(name)
 
 	def get_all_droplets(self):
-		return self.droplets_store.values()
+		with self.lock:
+			return self._snapshot(self.droplets_store).values()
 
 	def contains_droplet(self, name):
-		if name in self.droplets_store:
-			return True
-		return False
-
-	def _dump_droplets(self):
-		for d in self.droplets_store.values():
-			logger.info("Droplets: {}, Spec: {}".format(d.name, d.get_obj_spec()))
+		return name in self.droplets_store
 
 	def update_divider(self,div):
-		self.dividers_store[div.name] = div
-		if div.vpc not in self.dividers_vpc_store:
-			self.dividers_vpc_store[div.vpc] = {}
-		self.dividers_vpc_store[div.vpc][div.name] = div
+		with self.lock:
+			self._writable('dividers_store')[div.name] = div
+			self._index_add(self.dividers_vpc_store, div.vpc, div)
+			self._changed(RESOURCES.dividers, CHANGE_UPDATE, div.name, div)
 
 	def delete_divider(self, name):
-		if name not in self.dividers_store:
-			return
-		d = self.dividers_store.pop(name)
-
-		if d.vpc not in self.dividers_vpc_store:
-			return
-		if name not in self.dividers_vpc_store[d.vpc]:
-			return
-		self.dividers_vpc_store[d.vpc].pop(name)
-
-		l = len(self.dividers_vpc_store[d.vpc])
-		if  l == 0:
-			del self.dividers_vpc_store[d.vpc]
-
+		with self.lock:
+			if name not in self.dividers_store:
+				return
+			d = self._writable('dividers_store').pop(name)
+			self._index_remove(self.dividers_vpc_store, d.vpc, name)
+			self._changed(RESOURCES.dividers, CHANGE_DELETE, name, d)
 
 	def get_divider(self, name):
-		if name in self.dividers_store:
-			return self.dividers_store[name]
-		return None
+		return self.dividers_store.get(name)
 
 	def get_dividers_of_vpc(self, vpc):
-		if vpc in self.dividers_vpc_store:
-			return self.dividers_vpc_store[vpc]
-		return {}
+		return self._index_get(self.dividers_vpc_store, vpc)
 
 	def contains_divider(self, name):
-		if name in self.dividers_store:
-			return True
-		return False
-
-	def _dump_dividers(self):
-		for d in self.dividers_store.values():
-			logger.info("EP: {}, Spec: {}".format(d.name, d.get_obj_spec()))
+		return name in self.dividers_store
 
+	def get_all_dividers(self):
+		with self.lock:
+			return self._snapshot(self.dividers_store)
 
 	def update_bouncer(self, b):
-		self.bouncers_store[b.name] = b
-
-		if b.net not in self.bouncers_net_store:
-			self.bouncers_net_store[b.net] = {}
-		self.bouncers_net_store[b.net][b.name] = b
-
-		if b.vpc not in self.bouncers_vpc_store:
-			self.bouncers_vpc_store[b.vpc] = {}
-		self.bouncers_vpc_store[b.vpc][b.name] = b
-
-	def delete_bouncer(self, name):
-		if name not in self.bouncers_store:
+		with self.lock:
+			self._writable('bouncers_store')[b.name] = b
+			self._unindex_bouncer(b.name)
+			keys = (b.net, b.vpc, b.droplet)
+			self._index_add(self.bouncers_net_store, keys[0], b)
+			self._index_add(self.bouncers_vpc_store, keys[1], b)
+			self._index_add(self.bouncers_droplet_store, keys[2], b)
+			self.bouncers_index_keys[b.name] = keys
+			self._changed(RESOURCES.bouncers, CHANGE_UPDATE, b.name, b)
+
+	def _unindex_bouncer(self, name):
+		keys = self.bouncers_index_keys.pop(name, None)
+		if keys is None:
 			return
-		b = self.bouncers_store.pop(name)
-
-		self.bouncers_net_store[b.net].pop(name)
-		self.bouncers_vpc_store[b.vpc].pop(name)
+		self._index_remove(self.bouncers_net_store, keys[0], name)
+		self._index_remove(self.bouncers_vpc_store, keys[1], name)
+		self._index_remove(self.bouncers_droplet_store, keys[2], name)
 
-		l = len(self.bouncers_net_store[b.net])
-		if  l == 0:
-			del self.bouncers_net_store[b.net]
-
-		l = len(self.bouncers_vpc_store[b.vpc])
-		if  l == 0:
-			del self.bouncers_vpc_store[b.vpc]
+	def delete_bouncer(self, name):
+		with self.lock:
+			if name not in self.bouncers_store:
+				return
+			b = self._writable('bouncers_store').pop(name)
+			self._unindex_bouncer(name)
+			self._changed(RESOURCES.bouncers, CHANGE_DELETE, name, b)
 
 	def get_bouncer(self, name):
-		if name in self.bouncers_store:
-			return self.bouncers_store[name]
-		return None
+		return self.bouncers_store.get(name)
 
 	def get_bouncers_of_net(self, net):
-		if net in self.bouncers_net_store:
-			return self.bouncers_net_store[net]
-		return {}
-
-	def update_bouncers_of_net(self, net, bouncers):
-		if net in self.bouncers_net_store:
-			self.bouncers_net_store[net] = bouncers
+		return self._index_get(self.bouncers_net_store, net)
 
 	def get_bouncers_of_vpc(self, vpc):
-		if vpc in self.bouncers_vpc_store:
-			return self.bouncers_vpc_store[vpc]
-		return {}
+		return self._index_get(self.bouncers_vpc_store, vpc)
 
-	def contains_bouncer(self, name):
-		if name in self.bouncers_store:
-			return True
-		return False
+	def get_bouncers_on_droplet(self, droplet):
+		return self._index_get(self.bouncers_droplet_store, droplet)
 
-	def _dump_bouncers(self):
-		for b in self.bouncers_store.values():
-			logger.info("Bouncer: {}, Spec: {}".format(b.name, b.get_obj_spec()))
\ No newline at end of file
+	def contains_bouncer(self, name):
+		return name in self.bouncers_store
+
+	def get_all_bouncers(self):
+		with self.lock:
+			return self._snapshot(self.bouncers_store)
+
+class StoreCursor:
+	"""
+	A consumer's position in the store change log. poll() returns the
+	changes since the previous poll, or None when the consumer fell behind
+	the log and has to read the store again; the cursor then goes on from
+	the current generation.
+	"""
+	def __init__(self, store, kinds=None):
+		self.store = store
+		self.kinds = kinds
+		self.generation = store.generation
+
+	def poll(self):
+		with self.store.lock:
+			try:
+				changes = self.store.changes_since(self.generation, self.kinds)
+			except StoreChangesLost:
+				changes = None
+			self.generation = self.store.generation
+		return changes
@@ -0,0 +1,85 @@
+import logging
+import threading
+import time
+from common.constants import *
+from common.rpc import TrnRpc
+from common.shard import SETTLED, nudge_obj
+
+logger = logging.getLogger()
+
+RECONCILE_ANNOTATION = "mizar.com/reconcile"
+
+class StoreReconciler:
+	"""
+	Runs the handlers again of the objects that stay unsettled for too
+	long. The unsettled objects are followed through the store change log,
+	so a pass costs the changes since the previous one rather than a walk
+	of the store. Only a reconciler that fell behind the log reads every
+	collection again.
+
+	Each pass also replays the dataplane writes pending resync, which
+	probes the droplets whose transport cannot ping.
+	"""
+	def __init__(self, store, obj_api, kinds=tuple(SETTLED)):
+		self.store = store
+		self.obj_api = obj_api
+		self.kinds = kinds
+		self.cursor = store.cursor(kinds)
+		# (kind, name) -> since when the object is unsettled
+		self.unsettled = {}
+		self.resync()
+
+	def start(self):
+		t = threading.Thread(target=self.run, name='store-reconciler', daemon=True)
+		t.start()
+
+	def run(self):
+		while True:
+			time.sleep(CONSTANTS.RECONCILE_INTERVAL)
+			try:
+				self.reconcile()
+			except Exception as e:
+				logger.error("Store reconcile failed: {}".format(e))
+
+	def resync(self):
+		now = time.monotonic()
+		unsettled = {}
+		for kind in self.kinds:
+			for name, obj in self.store.get_all(kind).items():
+				if obj.status != SETTLED[kind]:
+					unsettled[(kind, name)] = self.unsettled.get((kind, name), now)
+		self.unsettled = unsettled
+
+	def apply(self, changes):
+		now = time.monotonic()
+		for c in changes:
+			# The object as it is now, a later change may have settled it
+			obj = self.store.get(c.kind, c.name)
+			if obj is None or obj.status == SETTLED[c.kind]:
+				self.unsettled.pop((c.kind, c.name), None)
+			else:
+				self.unsettled.setdefault((c.kind, c.name), now)
+
+	def reconcile(self):
+		"""
+		Replays the writes pending resync, catches up with the store, then
+		nudges the objects unsettled for RECONCILE_AFTER or longer. Returns
+		the (kind, name) of those.
+		"""
+		for rpc in TrnRpc.resync_needed():
+			rpc.replay()
+		changes = self.cursor.poll()
+		if changes is None:
+			logger.info("Store reconciler fell behind the change log, reading the store again")
+			self.resync()
+		else:
+			self.apply(changes)
+		now = time.monotonic()
+		stamp = str(time.time())
+		due = [key for key, since in self.unsettled.items()
+			if now - since >= CONSTANTS.RECONCILE_AFTER]
+		for kind, name in due:
+			nudge_obj(self.obj_api, kind, name, RECONCILE_ANNOTATION, stamp)
+			# The handlers get another RECONCILE_AFTER before the next nudge
+			self.unsettled[(kind, name)] = now
+		return due
@@ -0,0 +1,195 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from kubernetes import watch
+from kubernetes.client.rest import ApiException
+from common.constants import *
+
+logger = logging.getLogger()
+
+SCHEMA = """
+CREATE TABLE meta (plural TEXT PRIMARY KEY, resource_version TEXT, taken REAL);
+CREATE TABLE objects (plural TEXT, name TEXT, spec TEXT, PRIMARY KEY (plural, name));
+"""
+
+def _rv(resource_version):
+	# resourceVersions are opaque, but etcd's are increasing integers
+	try:
+		return int(resource_version)
+	except (TypeError, ValueError):
+		return None
+
+class StoreSnapshot:
+	"""
+	sqlite snapshot of the operator's store: the spec of every object, and
+	for each kind the resourceVersion it was listed at. On restart the
+	store is rebuilt from it and from a watch of what changed after that
+	resourceVersion, instead of listing every object from the API server;
+	the bootstrap links the objects as for a list.
+	"""
+	def __init__(self, path=CONSTANTS.STORE_SNAPSHOT_PATH):
+		self.path = path
+		self.resource_versions = {}
+
+	def save(self, store):
+		"""
+		Writes the store, as of one instant, to a new snapshot, which
+		replaces the old one once complete. The kinds never listed into the
+		store are left out, a warm start lists those.
+		"""
+		taken = time.time()
+		collections, resource_versions = store.checkpoint()
+		os.makedirs(os.path.dirname(self.path), exist_ok=True)
+		tmp = self.path + ".tmp"
+		if os.path.exists(tmp):
+			os.remove(tmp)
+		n = 0
+		db = sqlite3.connect(tmp)
+		try:
+			db.executescript(SCHEMA)
+			for plural, rv in resource_versions.items():
+				objects = collections[plural]
+				db.executemany("INSERT INTO objects VALUES (?, ?, ?)",
+					((plural, name, json.dumps(obj.get_obj_spec())) for name, obj in objects.items()))
+				db.execute("INSERT INTO meta VALUES (?, ?, ?)", (plural, rv, taken))
+				n += len(objects)
+			db.commit()
+		finally:
+			db.close()
+		os.replace(tmp, self.path)
+		logger.info("Store snapshot of {} objects saved to {}".format(n, self.path))
+
+	def load(self):
+		"""
+		Reads the resourceVersions of the snapshot. The objects stay on
+		disk, replay() streams those of one kind.
+		"""
+		if not os.path.exists(self.path):
+			return False
+		try:
+			db = sqlite3.connect(self.path)
+			try:
+				self.resource_versions = dict(db.execute(
+					"SELECT plural, resource_version FROM meta"))
+			finally:
+				db.close()
+		except sqlite3.Error as e:
+			logger.error("Ignoring unreadable store snapshot {}: {}".format(self.path, e))
+			self.resource_versions = {}
+			return False
+		logger.info("Loaded store snapshot {}".format(self.path))
+		return True
+
+	def replay(self, obj_api, plurals, list_callback):
+		"""
+		Calls list_callback for every object of kind plurals as of now,
+		from the snapshot and the watch delta since it was taken, and
+		returns the resourceVersion it caught up to. Returns None, having
+		called nothing, if the caller has to list instead, which is also
+		the case when the delta could not be seen through.
+		"""
+		rv = self.resource_versions.get(plurals)
+		if rv is None:
+			return None
+		# name -> spec of the objects changed since, None if deleted
+		delta = {}
+		try:
+			caught_up = self._replay_delta(obj_api, plurals, rv, delta)
+		except ApiException as e:
+			logger.info("Snapshot of {} is too old for a delta ({}), listing".format(plurals, e.status))
+			return None
+		if caught_up is None:
+			logger.info("Watch delta of {} did not catch up, listing".format(plurals))
+			return None
+		n = 0
+		try:
+			db = sqlite3.connect(self.path)
+			try:
+				rows = db.execute("SELECT name, spec FROM objects WHERE plural = ?", (plurals,))
+				for name, spec in rows:
+					if name not in delta:
+						list_callback(name, json.loads(spec), plurals)
+						n += 1
+			finally:
+				db.close()
+		except (sqlite3.Error, ValueError) as e:
+			# Some objects are in the store already, the list stores them again
+			logger.error("Snapshot of {} unreadable ({}), listing".format(plurals, e))
+			return None
+		for name, spec in delta.items():
+			if spec is not None:
+				list_callback(name, spec, plurals)
+				n += 1
+		logger.info("Warm start of {} {} from snapshot".format(n, plurals))
+		return caught_up
+
+	def _replay_delta(self, obj_api, plurals, rv, delta):
+		"""
+		Gathers in delta the events after rv, up to the resourceVersion of
+		the kind now. Returns that resourceVersion, or None if it did not
+		get there.
+		"""
+		listed = obj_api.list_namespaced_custom_object(
+			group="mizar.com",
+			version="v1",
+			namespace="default",
+			plural=plurals,
+			limit=1)['metadata']['resourceVersion']
+		target = _rv(listed)
+		if target is None:
+			return None
+		if _rv(rv) is not None and _rv(rv) >= target:
+			return rv
+		w = watch.Watch()
+		# The API server sends a bookmark before a watch times out, so a
+		# kind without changes catches up too
+		for event in w.stream(obj_api.list_namespaced_custom_object,
+				group="mizar.com",
+				version="v1",
+				namespace="default",
+				plural=plurals,
+				resource_version=rv,
+				allow_watch_bookmarks=True,
+				timeout_seconds=CONSTANTS.STORE_SNAPSHOT_WATCH_TIMEOUT):
+			if event['type'] == 'ERROR':
+				raise ApiException(status=event['object'].get('code', 410))
+			obj = event['object']
+			if event['type'] == 'DELETED':
+				delta[obj['metadata']['name']] = None
+			elif event['type'] != 'BOOKMARK':
+				delta[obj['metadata']['name']] = obj['spec']
+			seen = _rv(obj['metadata'].get('resourceVersion'))
+			if seen is not None and seen >= target:
+				w.stop()
+				return listed
+		return None
+
+class StoreSnapshotter:
+	"""
+	Saves a StoreSnapshot of store every interval seconds from a daemon
+	thread.
+	"""
+	def __init__(self, store, path=CONSTANTS.STORE_SNAPSHOT_PATH,
+			interval=CONSTANTS.STORE_SNAPSHOT_INTERVAL):
+		self.store = store
+		self.snapshot = StoreSnapshot(path)
+		self.interval = interval
+
+	def start(self):
+		t = threading.Thread(target=self.run, name='store-snapshot', daemon=True)
+		t.start()
+		return t
+
+	def run(self):
+		while True:
+			time.sleep(self.interval)
+			try:
+				self.save()
+			except Exception as e:
+				logger.error("Store snapshot failed: {}".format(e))
+
+	def save(self):
+		self.snapshot.save(self.store)
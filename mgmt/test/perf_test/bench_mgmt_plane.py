@@ -0,0 +1,106 @@
+#!/usr/bin/python3
+"""
+Benchmarks the endpoint provisioning path of the management plane against
+in-memory fake transitds, so no cluster or XDP dataplane is needed:
+
+	python3 test/perf_test/bench_mgmt_plane.py --droplets 100 --bouncers 4 --eps 100000
+
+Every endpoint goes through the same object calls as EndpointCreate: its
+agent is loaded, the bouncers of its net learn it, and it learns the
+bouncers.
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+os.environ["MIZAR_RPC_TRANSPORT"] = "fake"
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+from common.constants import *
+from common.rpc import TrnRpc, rpc_duration
+from common.trn_rpc_transport import FakeTransitd
+from obj.bouncer import Bouncer
+from obj.droplet import Droplet
+from obj.endpoint import Endpoint
+
+def make_droplets(n):
+	droplets = []
+	for i in range(n):
+		spec = {
+			"ip": "172.16.{}.{}".format(i // 250, i % 250 + 1),
+			"mac": "02:42:ac:10:{:02x}:{:02x}".format(i // 250, i % 250 + 1),
+			"itf": "eth0",
+			"status": OBJ_STATUS.droplet_status_provisioned
+		}
+		droplets.append(Droplet("droplet-{}".format(i), None, None, spec))
+	return droplets
+
+def make_bouncers(n, droplets):
+	bouncers = {}
+	for i in range(n):
+		b = Bouncer("bouncer-{}".format(i), None, None)
+		b.set_vpc(OBJ_DEFAULTS.default_ep_vpc)
+		b.set_net(OBJ_DEFAULTS.default_ep_net)
+		b.set_vni(OBJ_DEFAULTS.default_vpc_vni)
+		b.set_droplet(droplets[i % len(droplets)])
+		bouncers[b.name] = b
+	return bouncers
+
+def make_endpoint(i, droplet):
+	spec = {
+		"type": OBJ_DEFAULTS.ep_type_simple,
+		"status": OBJ_STATUS.ep_status_init,
+		"vpc": OBJ_DEFAULTS.default_ep_vpc,
+		"net": OBJ_DEFAULTS.default_ep_net,
+		"ip": "10.{}.{}.{}".format(i // 65536, i // 256 % 256, i % 256),
+		"gw": "10.0.0.1",
+		"mac": "a5:5b:{:02x}:{:02x}:{:02x}:{:02x}".format(i >> 24 & 255, i >> 16 & 255, i >> 8 & 255, i & 255),
+		"vni": OBJ_DEFAULTS.default_vpc_vni,
+		"droplet": droplet.name,
+		"prefix": "8",
+		"itf": "eth-{}".format(i),
+		"veth": "veth-{}".format(i),
+		"netns": "",
+		"hostip": droplet.ip,
+		"hostmac": droplet.mac
+	}
+	ep = Endpoint("ep-{}".format(i), None, None, spec)
+	ep.droplet_obj = droplet
+	return ep
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+	parser.add_argument("--droplets", type=int, default=100)
+	parser.add_argument("--bouncers", type=int, default=4)
+	parser.add_argument("--eps", type=int, default=10000)
+	args = parser.parse_args()
+	logging.basicConfig(level=logging.WARNING)
+
+	droplets = make_droplets(args.droplets)
+	bouncers = make_bouncers(args.bouncers, droplets)
+	start = time.monotonic()
+	for i in range(args.eps):
+		ep = make_endpoint(i, droplets[i % len(droplets)])
+		ep.load_transit_agent()
+		for b in bouncers.values():
+			b.update_eps([ep])
+		ep.update_bouncers(bouncers)
+	for rpc in list(TrnRpc._registry.values()):
+		rpc.flush()
+	elapsed = time.monotonic() - start
+
+	calls = sum(FakeTransitd.get(d.ip).calls for d in droplets)
+	print("{} endpoints, {} bouncers, {} droplets".format(args.eps, args.bouncers, args.droplets))
+	print("{:.2f}s, {:.0f} endpoints/s, {} transitd calls".format(elapsed, args.eps / elapsed, calls))
+	per_method = {}
+	for (method, _, outcome), (_, total, n) in rpc_duration.snapshot().items():
+		m = per_method.setdefault((method, outcome), [0, 0.0])
+		m[0] += n
+		m[1] += total
+	for (method, outcome), (n, total) in sorted(per_method.items()):
+		print("  {:<32} {:<6} {:>8} calls {:>10.1f} us/call".format(method, outcome, n, total / n * 1e6))
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,76 @@
+#!/usr/bin/python3
+"""
+Measures the operator memory taken by endpoints, as they are kept in the
+store after being bootstrapped from the API server:
+
+	python3 test/perf_test/bench_model_memory.py --eps 100000
+
+Specs go through a JSON round trip first so that, like specs listed from
+the API server, none of their strings are shared.
+"""
+import argparse
+import gc
+import json
+import logging
+import os
+import sys
+import time
+import tracemalloc
+
+os.environ["MIZAR_RPC_TRANSPORT"] = "fake"
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+from common.constants import *
+from obj.endpoint import Endpoint
+from store.operator_store import OprStore
+from bench_mgmt_plane import make_droplets
+
+def endpoint_spec(i, droplet):
+	return json.dumps({
+		"type": OBJ_DEFAULTS.ep_type_simple,
+		"status": OBJ_STATUS.ep_status_provisioned,
+		"vpc": OBJ_DEFAULTS.default_ep_vpc,
+		"net": OBJ_DEFAULTS.default_ep_net,
+		"ip": "10.{}.{}.{}".format(i // 65536, i // 256 % 256, i % 256),
+		"gw": "10.0.0.1",
+		"mac": "a5:5b:{:02x}:{:02x}:{:02x}:{:02x}".format(i >> 24 & 255, i >> 16 & 255, i >> 8 & 255, i & 255),
+		"vni": str(OBJ_DEFAULTS.default_vpc_vni),
+		"droplet": droplet.name,
+		"prefix": "8",
+		"itf": "eth-{}".format(i),
+		"veth": "veth-{}".format(i),
+		"netns": "mizar-{}".format(i),
+		"hostip": droplet.ip,
+		"hostmac": droplet.mac
+	})
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+	parser.add_argument("--droplets", type=int, default=100)
+	parser.add_argument("--eps", type=int, default=100000)
+	args = parser.parse_args()
+	logging.basicConfig(level=logging.WARNING)
+
+	droplets = make_droplets(args.droplets)
+	specs = [endpoint_spec(i, droplets[i % len(droplets)]) for i in range(args.eps)]
+	store = OprStore()
+
+	gc.collect()
+	tracemalloc.start()
+	start = time.monotonic()
+	for i, spec in enumerate(specs):
+		name = "ep-{}".format(i)
+		ep = Endpoint(name, None, store, json.loads(spec))
+		ep.droplet_obj = droplets[i % len(droplets)]
+		ep.store_update_obj()
+	elapsed = time.monotonic() - start
+	gc.collect()
+	used, peak = tracemalloc.get_traced_memory()
+	tracemalloc.stop()
+
+	print("{} endpoints in {:.2f}s".format(args.eps, elapsed))
+	print("{:.0f} bytes/endpoint, {:.1f} MiB total, {:.1f} MiB peak".format(
+		used / args.eps, used / 2**20, peak / 2**20))
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,70 @@
+#!/usr/bin/python3
+"""
+Benchmarks building the RPC payloads that carry switch and router lists,
+at the RPC maximum of 256 of each, against in-memory fake transitds:
+
+	python3 test/perf_test/bench_payloads.py --iterations 10000
+
+Each payload is built, encoded and checked against what the droplet
+already acknowledged, like a resync of an unchanged object, so no call
+reaches the transitd after the first.
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+os.environ["MIZAR_RPC_TRANSPORT"] = "fake"
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+from common.constants import *
+from common.trn_rpc_protocol import RPC_TRN_MAX_NET_SWITCHES, RPC_TRN_MAX_VPC_ROUTERS
+from obj.divider import Divider
+from obj.net import Net
+from bench_mgmt_plane import make_droplets, make_bouncers, make_endpoint
+
+def make_dividers(n, droplets):
+	dividers = []
+	for i in range(n):
+		d = Divider("divider-{}".format(i), None, None)
+		d.vpc = OBJ_DEFAULTS.default_ep_vpc
+		d.set_droplet(droplets[i % len(droplets)])
+		dividers.append(d)
+	return dividers
+
+def bench(name, fn, iterations):
+	fn()
+	start = time.perf_counter()
+	for _ in range(iterations):
+		fn()
+	elapsed = time.perf_counter() - start
+	print("  {:<24} {:>10.1f} us/payload".format(name, elapsed / iterations * 1e6))
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+	parser.add_argument("--switches", type=int, default=RPC_TRN_MAX_NET_SWITCHES)
+	parser.add_argument("--routers", type=int, default=RPC_TRN_MAX_VPC_ROUTERS)
+	parser.add_argument("--iterations", type=int, default=10000)
+	args = parser.parse_args()
+	logging.basicConfig(level=logging.WARNING)
+
+	droplets = make_droplets(max(args.switches, args.routers))
+	bouncers = make_bouncers(args.switches, droplets)
+	net = Net(OBJ_DEFAULTS.default_ep_net, None, None)
+	net.set_vni(OBJ_DEFAULTS.default_vpc_vni)
+	for b in bouncers.values():
+		net.bouncers.add(b)
+	bouncer = next(iter(bouncers.values()))
+	for d in make_dividers(args.routers, droplets):
+		bouncer.dividers[d.name] = d
+	ep = make_endpoint(0, droplets[0])
+	ep.load_transit_agent()
+
+	print("{} switches, {} routers, {} iterations".format(args.switches, args.routers, args.iterations))
+	bench("update_net", lambda: bouncer.rpc.update_net(net), args.iterations)
+	bench("update_vpc", lambda: bouncer.rpc.update_vpc(bouncer), args.iterations)
+	bench("update_agent_metadata", lambda: ep.rpc.update_agent_metadata(ep), args.iterations)
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,68 @@
+"""
+Unit tests of the informer waiters, fed events by hand instead of by a
+watch:
+
+	pytest test/unit_test
+"""
+import os
+import sys
+import threading
+import unittest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+from common.informer import Informer
+
+def event(kind, name, status, rv):
+	return {'type': kind, 'object': {
+		'metadata': {'name': name, 'resourceVersion': rv},
+		'spec': {'status': status}}}
+
+class test_informer_wait(unittest.TestCase):
+
+	def setUp(self):
+		# Not started, the tests play the watch
+		self.informer = Informer(None, "endpoints")
+
+	def apply(self, e):
+		obj = e['object']
+		with self.informer.lock:
+			self.informer.objects[obj['metadata']['name']] = self.informer._trim(obj)
+		self.informer._notify(obj['metadata']['name'], e)
+
+	def test_cached_state_matches(self):
+		self.apply(event('ADDED', 'ep0', 'Provisioned', '1'))
+		e = self.informer.wait('ep0', lambda e: e['object']['spec']['status'] == 'Provisioned', 1)
+		self.assertEqual(e['object']['metadata']['resourceVersion'], '1')
+
+	def test_predicate_runs_without_the_lock(self):
+		self.apply(event('ADDED', 'ep0', 'Init', '1'))
+		locked = []
+		def predicate(e):
+			locked.append(self.informer.lock.locked())
+			# A predicate may change what it is given
+			e['object']['spec']['status'] = 'Changed'
+			return False
+		self.assertIsNone(self.informer.wait('ep0', predicate, 0.05))
+		self.assertEqual(locked, [False])
+		self.assertEqual(self.informer.cached('ep0')['spec']['status'], 'Init')
+
+	def test_later_event_wakes_the_waiter(self):
+		result = []
+		t = threading.Thread(target=lambda: result.append(self.informer.wait('ep0',
+			lambda e: e['object']['spec']['status'] == 'Provisioned', 5)))
+		t.start()
+		while 'ep0' not in self.informer.waiters:
+			pass
+		self.apply(event('ADDED', 'ep0', 'Init', '1'))
+		self.apply(event('MODIFIED', 'ep0', 'Provisioned', '2'))
+		t.join(5)
+		self.assertEqual(result[0]['object']['metadata']['resourceVersion'], '2')
+		self.assertEqual(self.informer.waiters, {})
+
+	def test_timeout(self):
+		self.assertIsNone(self.informer.wait('ep0', lambda e: True, 0.01))
+		self.assertEqual(self.informer.waiters, {})
+
+if __name__ == '__main__':
+	unittest.main()
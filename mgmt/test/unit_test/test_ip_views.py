@@ -0,0 +1,105 @@
+"""
+Unit tests of the cached IP views of the switch and router lists,
+IpMap and NetBouncers, as members come and go:
+
+	pytest test/unit_test
+"""
+import os
+import sys
+import unittest
+from types import SimpleNamespace
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+from common.common import IpMap
+from common.trn_rpc_protocol import IpArray, RPC_TRN_MAX_NET_SWITCHES, RPC_TRN_MAX_VPC_ROUTERS
+from obj.net_bouncers import NetBouncers
+
+def member(name, ip):
+	return SimpleNamespace(name=name, ip=ip)
+
+class test_ip_map(unittest.TestCase):
+
+	def setUp(self):
+		self.dividers = IpMap(RPC_TRN_MAX_VPC_ROUTERS)
+
+	def assertIps(self, ips):
+		self.assertEqual(list(self.dividers.ips), ips)
+		self.assertEqual(self.dividers.ips.xdr, IpArray(ips, RPC_TRN_MAX_VPC_ROUTERS).xdr)
+
+	def test_ips_once_in_order(self):
+		self.dividers["d0"] = member("d0", "10.0.0.2")
+		self.dividers["d1"] = member("d1", "10.0.0.3")
+		self.dividers["d2"] = member("d2", "10.0.0.2")
+		self.assertIps(["10.0.0.2", "10.0.0.3"])
+
+	def test_ip_kept_while_used(self):
+		self.dividers["d0"] = member("d0", "10.0.0.2")
+		self.dividers["d1"] = member("d1", "10.0.0.2")
+		del self.dividers["d0"]
+		self.assertIps(["10.0.0.2"])
+		self.dividers.pop("d1")
+		self.assertIps([])
+		self.assertEqual(self.dividers.refs, {})
+
+	def test_replaced_member(self):
+		self.dividers["d0"] = member("d0", "10.0.0.2")
+		self.dividers["d0"] = member("d0", "10.0.0.3")
+		self.assertIps(["10.0.0.3"])
+
+	def test_not_rebuilt_for_a_used_ip(self):
+		self.dividers["d0"] = member("d0", "10.0.0.2")
+		ips = self.dividers.ips
+		self.dividers["d1"] = member("d1", "10.0.0.2")
+		del self.dividers["d0"]
+		self.assertIs(self.dividers.ips, ips)
+
+	def test_pop_missing(self):
+		self.assertIsNone(self.dividers.pop("d0", None))
+		with self.assertRaises(KeyError):
+			self.dividers.pop("d0")
+
+	def test_clear(self):
+		self.dividers["d0"] = member("d0", "10.0.0.2")
+		self.dividers.clear()
+		self.assertIps([])
+
+class test_net_bouncers(unittest.TestCase):
+
+	def setUp(self):
+		NetBouncers.drop("net0")
+		self.bouncers = NetBouncers.get("net0")
+
+	def tearDown(self):
+		NetBouncers.drop("net0")
+
+	def test_shared_per_net(self):
+		self.assertIs(NetBouncers.get("net0"), self.bouncers)
+
+	def test_versions(self):
+		b0 = member("b0", "10.0.0.2")
+		self.assertTrue(self.bouncers.add(b0))
+		self.assertFalse(self.bouncers.add(b0))
+		self.assertEqual(self.bouncers.version, 1)
+		self.assertTrue(self.bouncers.remove("b0"))
+		self.assertFalse(self.bouncers.remove("b0"))
+		self.assertEqual(self.bouncers.version, 2)
+
+	def test_ips(self):
+		self.bouncers.add(member("b0", "10.0.0.2"))
+		self.bouncers.add(member("b1", "10.0.0.3"))
+		self.bouncers.add(member("b2", "10.0.0.2"))
+		self.assertEqual(list(self.bouncers.ips), ["10.0.0.2", "10.0.0.3"])
+		self.assertEqual(self.bouncers.ips.maxlen, RPC_TRN_MAX_NET_SWITCHES)
+		self.bouncers.remove("b1")
+		self.assertEqual(list(self.bouncers.ips), ["10.0.0.2"])
+
+	def test_version_does_not_change(self):
+		self.bouncers.add(member("b0", "10.0.0.2"))
+		members, ips = self.bouncers.members, self.bouncers.ips
+		self.bouncers.add(member("b1", "10.0.0.3"))
+		self.assertEqual(list(members), ["b0"])
+		self.assertEqual(list(ips), ["10.0.0.2"])
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,122 @@
+"""
+Unit tests of the rate limiter of the operator's Kubernetes calls and
+of the lanes the calls go in:
+
+	pytest test/unit_test
+"""
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+from common.constants import KUBE_LANES
+from common.kube_api import KubeObjectsApi, KubeRateLimiter, background, in_current_lane, kube_lane
+
+def wait_for(predicate, timeout=5):
+	deadline = time.monotonic() + timeout
+	while not predicate():
+		if time.monotonic() > deadline:
+			return False
+		time.sleep(0.001)
+	return True
+
+class test_kube_rate_limiter(unittest.TestCase):
+
+	def test_burst(self):
+		limiter = KubeRateLimiter(rate=1, burst=5)
+		start = time.monotonic()
+		for _ in range(5):
+			limiter.acquire(KUBE_LANES.control)
+		self.assertLess(time.monotonic() - start, 0.5)
+
+	def test_rate(self):
+		limiter = KubeRateLimiter(rate=50, burst=1)
+		start = time.monotonic()
+		for _ in range(6):
+			limiter.acquire(KUBE_LANES.control)
+		self.assertGreaterEqual(time.monotonic() - start, 0.09)
+
+	def test_lane_priority(self):
+		limiter = KubeRateLimiter(rate=10, burst=1)
+		limiter.acquire(KUBE_LANES.control)
+		order = []
+		order_lock = threading.Lock()
+
+		def call(lane):
+			limiter.acquire(lane)
+			with order_lock:
+				order.append(lane)
+
+		threads = []
+		def start(lane, n):
+			for _ in range(n):
+				t = threading.Thread(target=call, args=(lane,))
+				t.start()
+				threads.append(t)
+			self.assertTrue(wait_for(lambda: limiter.waiting[lane] == n))
+
+		# The later calls of the higher lanes go ahead of the waiting ones
+		start(KUBE_LANES.background, 2)
+		start(KUBE_LANES.control, 1)
+		start(KUBE_LANES.interactive, 1)
+		for t in threads:
+			t.join(5)
+		self.assertEqual(order, [KUBE_LANES.interactive, KUBE_LANES.control,
+			KUBE_LANES.background, KUBE_LANES.background])
+
+class FakeLimiter:
+	def __init__(self):
+		self.lanes = []
+
+	def acquire(self, lane):
+		self.lanes.append(lane)
+
+class FakeApi:
+	def get_namespaced_custom_object(self, **kwargs):
+		"""Returns the object"""
+		return kwargs["name"]
+
+class test_kube_lanes(unittest.TestCase):
+
+	def setUp(self):
+		self.limiter = FakeLimiter()
+		self.api = KubeObjectsApi(FakeApi(), self.limiter)
+
+	def get(self):
+		return self.api.get_namespaced_custom_object(name="net0")
+
+	def test_default_lane(self):
+		self.assertEqual(self.get(), "net0")
+		self.assertEqual(self.limiter.lanes, [KUBE_LANES.control])
+
+	def test_wrapped_call_keeps_its_docstring(self):
+		self.assertEqual(self.api.get_namespaced_custom_object.__doc__, "Returns the object")
+
+	def test_background(self):
+		background(self.get)
+		self.get()
+		self.assertEqual(self.limiter.lanes, [KUBE_LANES.background, KUBE_LANES.control])
+
+	def test_handler_lane(self):
+		@kube_lane(KUBE_LANES.interactive)
+		def handler(**kwargs):
+			self.get()
+
+		handler(reason="create")
+		handler(reason="resume")
+		self.assertEqual(self.limiter.lanes, [KUBE_LANES.interactive, KUBE_LANES.background])
+
+	def test_lane_follows_handed_over_work(self):
+		def hand_over():
+			t = threading.Thread(target=in_current_lane(self.get))
+			t.start()
+			t.join()
+
+		background(hand_over)
+		self.assertEqual(self.limiter.lanes, [KUBE_LANES.background])
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,156 @@
+"""
+Unit tests of kube_update_obj against a fake API server that keeps the
+resourceVersion of its objects and rejects stale patches:
+
+	pytest test/unit_test
+"""
+import copy
+import os
+import sys
+import unittest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+from kubernetes.client.rest import ApiException
+from common.constants import CONSTANTS
+from common.common import kube_update_obj, kube_versions, KubeObjConflict, KubeObjNotFound
+
+class FakeApi:
+	"""
+	The custom objects of one plural. races is how many patches another
+	writer gets in ahead of, making them conflict.
+	"""
+	def __init__(self):
+		self.objects = {}
+		self.rv = 0
+		self.races = 0
+		self.patches = []
+
+	def put(self, name, spec):
+		self.rv += 1
+		self.objects[name] = {
+			"metadata": {"name": name, "resourceVersion": str(self.rv)},
+			"spec": dict(spec)
+		}
+
+	def get_namespaced_custom_object(self, group, version, namespace, plural, name):
+		if name not in self.objects:
+			raise ApiException(status=404, reason="Not Found")
+		return copy.deepcopy(self.objects[name])
+
+	def patch_namespaced_custom_object(self, group, version, namespace, plural, name, body):
+		if name not in self.objects:
+			raise ApiException(status=404, reason="Not Found")
+		self.patches.append(body)
+		if self.races:
+			self.races -= 1
+			spec = dict(self.objects[name]["spec"])
+			spec["other"] = self.rv
+			self.put(name, spec)
+		obj = self.objects[name]
+		if body["metadata"]["resourceVersion"] != obj["metadata"]["resourceVersion"]:
+			raise ApiException(status=409, reason="Conflict")
+		spec = dict(obj["spec"])
+		for key, value in body["spec"].items():
+			if value is None:
+				spec.pop(key, None)
+			else:
+				spec[key] = value
+		self.put(name, spec)
+		return copy.deepcopy(self.objects[name])
+
+class FakeObj:
+	def __init__(self, name, obj_api, spec):
+		self.name = name
+		self.obj_api = obj_api
+		self.spec = dict(spec)
+		self.stored = 0
+
+	def get_name(self):
+		return self.name
+
+	def get_plural(self):
+		return "nets"
+
+	def get_kind(self):
+		return "Net"
+
+	def get_obj_spec(self):
+		return dict(self.spec)
+
+	def store_update_obj(self):
+		self.stored += 1
+
+class test_kube_update_obj(unittest.TestCase):
+
+	def setUp(self):
+		self.backoff = CONSTANTS.KUBE_BACKOFF_BASE, CONSTANTS.KUBE_BACKOFF_MAX
+		CONSTANTS.KUBE_BACKOFF_BASE = CONSTANTS.KUBE_BACKOFF_MAX = 0.001
+		kube_versions.forget(("nets", "net0"))
+		self.api = FakeApi()
+		self.api.put("net0", {"status": "Init", "vni": "1"})
+		self.obj = FakeObj("net0", self.api, {"status": "Init", "vni": "1"})
+
+	def tearDown(self):
+		CONSTANTS.KUBE_BACKOFF_BASE, CONSTANTS.KUBE_BACKOFF_MAX = self.backoff
+		kube_versions.forget(("nets", "net0"))
+
+	def test_patches_the_changed_fields(self):
+		self.obj.spec["status"] = "Provisioned"
+		kube_update_obj(self.obj)
+		self.assertEqual(self.api.patches, [{"metadata": {"resourceVersion": "1"},
+			"spec": {"status": "Provisioned"}}])
+		self.assertEqual(self.api.objects["net0"]["spec"], {"status": "Provisioned", "vni": "1"})
+		self.assertEqual(self.obj.stored, 1)
+
+	def test_unchanged_object_is_patched_on_its_version(self):
+		kube_update_obj(self.obj)
+		self.assertEqual(self.api.patches, [{"metadata": {"resourceVersion": "1"}, "spec": {}}])
+		self.assertEqual(self.obj.stored, 1)
+
+	def test_stale_cache_is_diffed_again(self):
+		kube_update_obj(self.obj)
+		# Another writer, the cached copy does not know
+		self.api.put("net0", {"status": "Error", "vni": "1"})
+		kube_update_obj(self.obj)
+		self.assertEqual(self.api.patches[-1], {"metadata": {"resourceVersion": "3"},
+			"spec": {"status": "Init"}})
+		self.assertEqual(self.api.objects["net0"]["spec"], {"status": "Init", "vni": "1"})
+
+	def test_removed_field_is_deleted(self):
+		del self.obj.spec["vni"]
+		kube_update_obj(self.obj)
+		self.assertEqual(self.api.patches[-1]["spec"], {"vni": None})
+		self.assertEqual(self.api.objects["net0"]["spec"], {"status": "Init"})
+
+	def test_conflict_is_retried(self):
+		self.obj.spec["status"] = "Provisioned"
+		self.api.races = 2
+		kube_update_obj(self.obj)
+		self.assertEqual(len(self.api.patches), 3)
+		# Diffed again against what the other writer left
+		self.assertEqual(self.api.patches[-1]["spec"], {"status": "Provisioned", "other": None})
+		self.assertEqual(self.api.objects["net0"]["spec"], {"status": "Provisioned", "vni": "1"})
+
+	def test_conflicts_run_out(self):
+		self.obj.spec["status"] = "Provisioned"
+		self.api.races = CONSTANTS.KUBE_UPDATE_RETRIES
+		with self.assertRaises(KubeObjConflict):
+			kube_update_obj(self.obj)
+		self.assertEqual(len(self.api.patches), CONSTANTS.KUBE_UPDATE_RETRIES)
+		self.assertEqual(self.obj.stored, 0)
+
+	def test_not_found(self):
+		del self.api.objects["net0"]
+		with self.assertRaises(KubeObjNotFound):
+			kube_update_obj(self.obj)
+
+	def test_deleted_after_read(self):
+		kube_update_obj(self.obj)
+		del self.api.objects["net0"]
+		self.obj.spec["status"] = "Provisioned"
+		with self.assertRaises(KubeObjNotFound):
+			kube_update_obj(self.obj)
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,93 @@
+"""
+Unit tests of the paged lists, list_pages and kube_list_obj, against a
+fake API server whose continue tokens can expire:
+
+	pytest test/unit_test
+"""
+import os
+import sys
+import unittest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+from kubernetes.client.rest import ApiException
+from common.informer import list_pages
+from common.common import kube_list_obj
+
+class FakeListApi:
+	"""
+	n objects of one plural, listed limit at a time. The continue token
+	is the offset of the page; expire is the offset of the page that
+	fails once with 410 Gone, as if the list took too long.
+	"""
+	def __init__(self, n, expire=None):
+		self.items = [{
+			"metadata": {"name": "ep-{}".format(i), "resourceVersion": str(i)},
+			"spec": {"ip": "10.0.{}.{}".format(i // 256, i % 256)}
+		} for i in range(n)]
+		self.expire = expire
+		self.calls = []
+
+	def list_namespaced_custom_object(self, group, version, namespace, plural, limit, _continue=None):
+		offset = int(_continue or 0)
+		self.calls.append(offset)
+		if offset == self.expire:
+			self.expire = None
+			raise ApiException(status=410, reason="Gone")
+		end = offset + limit
+		metadata = {"resourceVersion": "1000"}
+		if end < len(self.items):
+			metadata["continue"] = str(end)
+		return {"metadata": metadata, "items": self.items[offset:end]}
+
+class test_list_pages(unittest.TestCase):
+
+	def test_pages(self):
+		api = FakeListApi(25)
+		pages = list(list_pages(api, "endpoints", limit=10))
+		self.assertEqual([len(items) for items, rv in pages], [10, 10, 5])
+		self.assertEqual({rv for items, rv in pages}, {"1000"})
+		self.assertEqual(api.calls, [0, 10, 20])
+
+	def test_exact_pages(self):
+		api = FakeListApi(20)
+		pages = list(list_pages(api, "endpoints", limit=10))
+		self.assertEqual([len(items) for items, rv in pages], [10, 10])
+
+	def test_empty(self):
+		api = FakeListApi(0)
+		self.assertEqual(list(list_pages(api, "endpoints")), [([], "1000")])
+
+class test_kube_list_obj(unittest.TestCase):
+
+	def list(self, api):
+		listed = []
+		rv = kube_list_obj(api, "endpoints", lambda name, spec, plurals: listed.append(name))
+		return rv, listed
+
+	def test_lists_all(self):
+		api = FakeListApi(1200)
+		rv, listed = self.list(api)
+		self.assertEqual(rv, "1000")
+		self.assertEqual(len(listed), 1200)
+		self.assertEqual(len(api.calls), 3)
+
+	def test_expired_list_starts_over(self):
+		api = FakeListApi(1200, expire=1000)
+		rv, listed = self.list(api)
+		self.assertEqual(rv, "1000")
+		self.assertEqual(api.calls, [0, 500, 1000, 0, 500, 1000])
+		# The pages before the expiry are seen twice
+		self.assertEqual(set(listed), {"ep-{}".format(i) for i in range(1200)})
+		self.assertEqual(len(listed), 2200)
+
+	def test_other_errors_are_raised(self):
+		api = FakeListApi(10)
+		def fail(**kwargs):
+			raise ApiException(status=500, reason="Internal Server Error")
+		api.list_namespaced_custom_object = fail
+		with self.assertRaises(ApiException):
+			self.list(api)
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,40 @@
+"""
+Unit tests that the operator's object models stay slot based, and that
+every attribute their specs set has a slot:
+
+	pytest test/unit_test
+"""
+import os
+import sys
+import unittest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+from obj.bouncer import Bouncer
+from obj.divider import Divider
+from obj.droplet import Droplet
+from obj.endpoint import Endpoint
+from obj.net import Net
+from obj.vpc import Vpc
+
+MODELS = (Vpc, Net, Endpoint, Droplet, Divider, Bouncer)
+
+class test_obj_slots(unittest.TestCase):
+
+	def test_no_instance_dict(self):
+		for cls in MODELS:
+			with self.subTest(cls.__name__):
+				obj = cls("obj0", None, None)
+				self.assertFalse(hasattr(obj, '__dict__'))
+				with self.assertRaises(AttributeError):
+					obj.not_a_slot = 1
+
+	def test_spec_round_trip(self):
+		for cls in MODELS:
+			with self.subTest(cls.__name__):
+				spec = cls("obj0", None, None).get_obj_spec()
+				obj = cls("obj1", None, None, spec)
+				self.assertEqual(obj.get_obj_spec(), spec)
+
+if __name__ == '__main__':
+	unittest.main()
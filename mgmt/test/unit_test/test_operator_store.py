@@ -0,0 +1,179 @@
+"""
+Unit tests of the OprStore indexes as objects are stored again with
+other keys and deleted:
+
+	pytest test/unit_test
+"""
+import os
+import sys
+import unittest
+from collections import deque
+from types import SimpleNamespace
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+from common.constants import OBJ_STATUS, RESOURCES
+from store.operator_store import OprStore, StoreChangesLost, CHANGE_UPDATE, CHANGE_DELETE
+
+def make_bouncer(name, net, vpc, droplet="d0"):
+	return SimpleNamespace(name=name, net=net, vpc=vpc, droplet=droplet,
+		status=OBJ_STATUS.bouncer_status_init)
+
+def make_ep(name, net, droplet="d0", vni="1", ip="10.0.0.2"):
+	return SimpleNamespace(name=name, net=net, droplet=droplet, vni=vni, ip=ip,
+		status=OBJ_STATUS.ep_status_init)
+
+class test_operator_store_indexes(unittest.TestCase):
+
+	def setUp(self):
+		OprStore._instance = None
+		self.store = OprStore()
+
+	def tearDown(self):
+		OprStore._instance = None
+
+	def assertBouncers(self, net, vpc, names):
+		self.assertEqual(sorted(self.store.get_bouncers_of_net(net)), names)
+		self.assertEqual(sorted(self.store.get_bouncers_of_vpc(vpc)), names)
+
+	def test_update_bouncer(self):
+		self.store.update_bouncer(make_bouncer("b0", "net0", "vpc0"))
+		self.store.update_bouncer(make_bouncer("b1", "net0", "vpc0"))
+		self.assertBouncers("net0", "vpc0", ["b0", "b1"])
+
+	def test_bouncer_stored_again_in_place(self):
+		b = make_bouncer("b0", "net0", "vpc0")
+		self.store.update_bouncer(b)
+		self.store.update_bouncer(b)
+		self.assertBouncers("net0", "vpc0", ["b0"])
+
+	def test_bouncer_moved(self):
+		b = make_bouncer("b0", "net0", "vpc0")
+		self.store.update_bouncer(b)
+		self.store.update_bouncer(make_bouncer("b1", "net0", "vpc0"))
+		# Objects are changed in place, the store unindexes the old keys
+		b.net, b.vpc = "net1", "vpc1"
+		self.store.update_bouncer(b)
+		self.assertBouncers("net0", "vpc0", ["b1"])
+		self.assertBouncers("net1", "vpc1", ["b0"])
+
+	def test_bouncer_deleted(self):
+		self.store.update_bouncer(make_bouncer("b0", "net0", "vpc0"))
+		self.store.update_bouncer(make_bouncer("b1", "net0", "vpc0"))
+		self.store.delete_bouncer("b0")
+		self.assertBouncers("net0", "vpc0", ["b1"])
+		self.store.delete_bouncer("b1")
+		self.assertBouncers("net0", "vpc0", [])
+		self.assertEqual(self.store.bouncers_net_store, {})
+		self.assertEqual(self.store.bouncers_vpc_store, {})
+		self.assertEqual(self.store.bouncers_droplet_store, {})
+		self.assertEqual(self.store.bouncers_index_keys, {})
+
+	def test_bouncer_moved_to_another_droplet(self):
+		b = make_bouncer("b0", "net0", "vpc0", "d0")
+		self.store.update_bouncer(b)
+		self.store.update_bouncer(make_bouncer("b1", "net0", "vpc0", "d0"))
+		b.droplet = "d1"
+		self.store.update_bouncer(b)
+		self.assertEqual(sorted(self.store.get_bouncers_on_droplet("d0")), ["b1"])
+		self.assertEqual(sorted(self.store.get_bouncers_on_droplet("d1")), ["b0"])
+		self.store.delete_bouncer("b0")
+		self.assertEqual(list(self.store.get_bouncers_on_droplet("d1")), [])
+
+	def test_snapshot_does_not_change(self):
+		b = make_bouncer("b0", "net0", "vpc0")
+		self.store.update_bouncer(b)
+		snapshot = self.store.get_bouncers_of_net("net0")
+		self.store.update_bouncer(make_bouncer("b1", "net0", "vpc0"))
+		self.store.delete_bouncer("b0")
+		self.assertEqual(list(snapshot), ["b0"])
+		self.assertEqual(sorted(self.store.get_bouncers_of_net("net0")), ["b1"])
+
+	def test_ep_moved_and_deleted(self):
+		ep = make_ep("ep0", "net0")
+		self.store.update_ep(ep)
+		ep.net = "net1"
+		self.store.update_ep(ep)
+		self.assertEqual(list(self.store.get_eps_in_net("net0")), [])
+		self.assertEqual(list(self.store.get_eps_in_net("net1")), ["ep0"])
+		self.store.delete_ep("ep0")
+		self.assertEqual(self.store.eps_net_store, {})
+		self.assertEqual(self.store.eps_droplet_store, {})
+		self.assertEqual(self.store.eps_vni_ip_store, {})
+		self.assertEqual(self.store.eps_index_keys, {})
+
+	def test_ep_moved_to_another_droplet(self):
+		ep = make_ep("ep0", "net0", droplet="d0")
+		self.store.update_ep(ep)
+		self.store.update_ep(make_ep("ep1", "net0", droplet="d0", ip="10.0.0.3"))
+		ep.droplet = "d1"
+		self.store.update_ep(ep)
+		self.assertEqual(sorted(self.store.get_eps_on_droplet("d0")), ["ep1"])
+		self.assertEqual(sorted(self.store.get_eps_on_droplet("d1")), ["ep0"])
+
+	def test_ep_renumbered(self):
+		ep = make_ep("ep0", "net0", vni="1", ip="10.0.0.2")
+		self.store.update_ep(ep)
+		ep.ip = "10.0.0.4"
+		self.store.update_ep(ep)
+		self.assertEqual(list(self.store.get_eps_by_vni_ip("1", "10.0.0.2")), [])
+		self.assertEqual(list(self.store.get_eps_by_vni_ip(1, "10.0.0.4")), ["ep0"])
+		# The same address in another vni is another key
+		self.store.update_ep(make_ep("ep1", "net1", vni="2", ip="10.0.0.4"))
+		self.assertEqual(list(self.store.get_eps_by_vni_ip("2", "10.0.0.4")), ["ep1"])
+
+	def test_ep_renamed(self):
+		self.store.update_ep(make_ep("ep0", "net0"))
+		# Deleted and stored again under another name, with the same keys
+		self.store.delete_ep("ep0")
+		self.store.update_ep(make_ep("ep1", "net0"))
+		self.assertEqual(list(self.store.get_eps_on_droplet("d0")), ["ep1"])
+		self.assertEqual(list(self.store.get_eps_by_vni_ip("1", "10.0.0.2")), ["ep1"])
+		self.assertEqual(list(self.store.eps_index_keys), ["ep1"])
+
+class test_operator_store_changes(unittest.TestCase):
+
+	def setUp(self):
+		OprStore._instance = None
+		self.store = OprStore()
+
+	def tearDown(self):
+		OprStore._instance = None
+
+	def test_changes_since(self):
+		generation = self.store.generation
+		self.store.update_ep(make_ep("ep0", "net0"))
+		self.store.update_bouncer(make_bouncer("b0", "net0", "vpc0"))
+		self.store.delete_ep("ep0")
+		# Deleting what is not there changes nothing
+		self.store.delete_ep("ep0")
+		changes = self.store.changes_since(generation)
+		self.assertEqual([(c.kind, c.op, c.name) for c in changes], [
+			(RESOURCES.endpoints, CHANGE_UPDATE, "ep0"),
+			(RESOURCES.bouncers, CHANGE_UPDATE, "b0"),
+			(RESOURCES.endpoints, CHANGE_DELETE, "ep0")])
+		self.assertEqual([c.generation for c in changes], [generation + 1, generation + 2, generation + 3])
+		self.assertEqual([c.name for c in self.store.changes_since(generation, {RESOURCES.bouncers})], ["b0"])
+		self.assertEqual(self.store.changes_since(self.store.generation), [])
+
+	def test_cursor(self):
+		cursor = self.store.cursor({RESOURCES.endpoints})
+		self.store.update_ep(make_ep("ep0", "net0"))
+		self.store.update_bouncer(make_bouncer("b0", "net0", "vpc0"))
+		self.assertEqual([c.name for c in cursor.poll()], ["ep0"])
+		self.assertEqual(cursor.poll(), [])
+
+	def test_cursor_behind_the_log(self):
+		self.store.changes = deque(maxlen=2)
+		cursor = self.store.cursor()
+		for i in range(3):
+			self.store.update_ep(make_ep("ep{}".format(i), "net0"))
+		with self.assertRaises(StoreChangesLost):
+			self.store.changes_since(cursor.generation)
+		# Read the store again, then go on from there
+		self.assertIsNone(cursor.poll())
+		self.store.update_ep(make_ep("ep3", "net0"))
+		self.assertEqual([c.name for c in cursor.poll()], ["ep3"])
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,68 @@
+"""
+Unit tests of which objects belong to the VPC shards a replica owns, or
+is taking over:
+
+	pytest test/unit_test
+"""
+import os
+import sys
+import unittest
+from types import SimpleNamespace
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+from common.constants import OBJ_DEFAULTS, OBJ_STATUS, RESOURCES
+from common.shard import VpcShards, VPC_ANNOTATION, NET_ANNOTATION
+from store.operator_store import OprStore
+
+def service(kind, name, annotations=None):
+	return {'kind': kind, 'metadata': {'name': name, 'annotations': annotations or {}}}
+
+class test_vpc_shards(unittest.TestCase):
+
+	def setUp(self):
+		OprStore._instance = None
+		self.store = OprStore()
+		self.shards = VpcShards(n=16, identity="replica-0")
+		self.vpcs = ["vpc{}".format(i) for i in range(64)]
+		self.mine = next(v for v in self.vpcs if self.shards.shard_of(v) == 1)
+		self.other = next(v for v in self.vpcs if self.shards.shard_of(v) == 2)
+		self.shards.owned = frozenset([1])
+
+	def tearDown(self):
+		OprStore._instance = None
+
+	def test_lists_the_owned_shards(self):
+		self.assertTrue(self.shards.lists(RESOURCES.nets, "net0", {'vpc': self.mine}))
+		self.assertFalse(self.shards.lists(RESOURCES.nets, "net0", {'vpc': self.other}))
+		self.assertTrue(self.shards.lists(RESOURCES.vpcs, self.mine, {}))
+		self.assertTrue(self.shards.lists(RESOURCES.droplets, "d0", {}))
+
+	def test_lists_the_shards_taken_over(self):
+		shards = frozenset([2])
+		self.assertTrue(self.shards.lists(RESOURCES.nets, "net0", {'vpc': self.other}, shards))
+		self.assertFalse(self.shards.lists(RESOURCES.nets, "net0", {'vpc': self.mine}, shards))
+		# Every replica already has the droplets
+		self.assertFalse(self.shards.lists(RESOURCES.droplets, "d0", {}, shards))
+
+	def test_service_of_the_vpc_annotation(self):
+		self.assertTrue(self.shards.owns_body(service('Service', 's0', {VPC_ANNOTATION: self.mine})))
+		self.assertFalse(self.shards.owns_body(service('Service', 's0', {VPC_ANNOTATION: self.other})))
+
+	def test_endpoints_of_the_scaled_endpoint(self):
+		self.store.update_ep(SimpleNamespace(name="s0", net="net0", vpc=self.mine,
+			droplet="", vni="1", ip="10.0.0.2", status=OBJ_STATUS.ep_status_provisioned))
+		self.assertTrue(self.shards.owns_body(service('Endpoints', 's0')))
+		self.assertFalse(self.shards.owns_body(service('Endpoints', 's1')))
+
+	def test_service_of_the_net(self):
+		self.store.update_net(SimpleNamespace(name="net1", vpc=self.mine,
+			status=OBJ_STATUS.net_status_provisioned))
+		self.store.update_net(SimpleNamespace(name=OBJ_DEFAULTS.default_ep_net, vpc=self.other,
+			status=OBJ_STATUS.net_status_provisioned))
+		self.assertTrue(self.shards.owns_body(service('Service', 's0', {NET_ANNOTATION: "net1"})))
+		self.assertFalse(self.shards.owns_body(service('Service', 's0')))
+		self.assertFalse(self.shards.owns_body(service('Service', 's0', {NET_ANNOTATION: "net2"})))
+
+if __name__ == '__main__':
+	unittest.main()
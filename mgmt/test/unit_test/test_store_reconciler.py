@@ -0,0 +1,78 @@
+"""
+Unit tests of the store reconciler, which follows the unsettled objects
+through the store change log and nudges those unsettled for too long:
+
+	pytest test/unit_test
+"""
+import os
+import sys
+import unittest
+from collections import deque
+from types import SimpleNamespace
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+from common.constants import CONSTANTS, OBJ_STATUS, RESOURCES
+from store.operator_store import OprStore
+from store.reconciler import StoreReconciler, RECONCILE_ANNOTATION
+
+def make_ep(name, status=OBJ_STATUS.ep_status_init):
+	return SimpleNamespace(name=name, net="net0", droplet="d0", vni="1",
+		ip="10.0.0.2", status=status)
+
+class FakeApi:
+	def __init__(self):
+		self.nudged = []
+
+	def patch_namespaced_custom_object(self, group, version, namespace, plural, name, body):
+		self.nudged.append((plural, name, list(body["metadata"]["annotations"])))
+
+class test_store_reconciler(unittest.TestCase):
+
+	def setUp(self):
+		OprStore._instance = None
+		self.store = OprStore()
+		self.api = FakeApi()
+		self.after = CONSTANTS.RECONCILE_AFTER
+		CONSTANTS.RECONCILE_AFTER = 0
+
+	def tearDown(self):
+		CONSTANTS.RECONCILE_AFTER = self.after
+		OprStore._instance = None
+
+	def test_starts_from_the_store(self):
+		self.store.update_ep(make_ep("ep0"))
+		self.store.update_ep(make_ep("ep1", OBJ_STATUS.ep_status_provisioned))
+		reconciler = StoreReconciler(self.store, self.api)
+		self.assertEqual(reconciler.reconcile(), [(RESOURCES.endpoints, "ep0")])
+		self.assertEqual(self.api.nudged, [(RESOURCES.endpoints, "ep0", [RECONCILE_ANNOTATION])])
+
+	def test_follows_the_changes(self):
+		reconciler = StoreReconciler(self.store, self.api)
+		ep = make_ep("ep0")
+		self.store.update_ep(ep)
+		self.store.update_ep(make_ep("ep1"))
+		self.store.delete_ep("ep1")
+		self.assertEqual(reconciler.reconcile(), [(RESOURCES.endpoints, "ep0")])
+		ep.status = OBJ_STATUS.ep_status_provisioned
+		self.store.update_ep(ep)
+		self.assertEqual(reconciler.reconcile(), [])
+
+	def test_not_nudged_before_its_time(self):
+		CONSTANTS.RECONCILE_AFTER = 3600
+		reconciler = StoreReconciler(self.store, self.api)
+		self.store.update_ep(make_ep("ep0"))
+		self.assertEqual(reconciler.reconcile(), [])
+		self.assertEqual(list(reconciler.unsettled), [(RESOURCES.endpoints, "ep0")])
+
+	def test_behind_the_log_reads_the_store(self):
+		self.store.changes = deque(maxlen=2)
+		reconciler = StoreReconciler(self.store, self.api)
+		for i in range(3):
+			self.store.update_ep(make_ep("ep{}".format(i)))
+		self.store.delete_ep("ep0")
+		self.assertEqual(sorted(reconciler.reconcile()),
+			[(RESOURCES.endpoints, "ep1"), (RESOURCES.endpoints, "ep2")])
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,119 @@
+"""
+Unit tests of the store snapshot, saved from the store and replayed with
+the watch delta since it was taken:
+
+	pytest test/unit_test
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+import store.snapshot
+from common.constants import OBJ_STATUS, RESOURCES
+from store.operator_store import OprStore
+from store.snapshot import StoreSnapshot
+
+class FakeEp:
+	def __init__(self, name, ip):
+		self.name = name
+		self.net = "net0"
+		self.droplet = "d0"
+		self.vni = "1"
+		self.ip = ip
+		self.status = OBJ_STATUS.ep_status_provisioned
+
+	def get_obj_spec(self):
+		return {"ip": self.ip}
+
+class FakeApi:
+	"""
+	Answers the one item lists with the resourceVersion of the kind now.
+	"""
+	def __init__(self, rv):
+		self.rv = rv
+		self.lists = 0
+
+	def list_namespaced_custom_object(self, group, version, namespace, plural, limit=None, **kwargs):
+		self.lists += 1
+		return {"metadata": {"resourceVersion": self.rv}, "items": []}
+
+class FakeWatch:
+	events = []
+
+	def stream(self, fn, **kwargs):
+		return iter(self.events)
+
+	def stop(self):
+		pass
+
+def event(kind, name, rv, ip=None):
+	obj = {"metadata": {"name": name, "resourceVersion": rv}}
+	if ip is not None:
+		obj["spec"] = {"ip": ip}
+	return {"type": kind, "object": obj}
+
+class test_store_snapshot(unittest.TestCase):
+
+	def setUp(self):
+		OprStore._instance = None
+		self.store = OprStore()
+		self.dir = tempfile.mkdtemp()
+		self.path = os.path.join(self.dir, "store.db")
+		self.watch = store.snapshot.watch
+		store.snapshot.watch = SimpleNamespace(Watch=FakeWatch)
+
+	def tearDown(self):
+		store.snapshot.watch = self.watch
+		OprStore._instance = None
+		shutil.rmtree(self.dir)
+
+	def save(self):
+		self.store.update_ep(FakeEp("ep0", "10.0.0.2"))
+		self.store.update_ep(FakeEp("ep1", "10.0.0.3"))
+		self.store.set_resource_version(RESOURCES.endpoints, "10")
+		StoreSnapshot(self.path).save(self.store)
+		snapshot = StoreSnapshot(self.path)
+		self.assertTrue(snapshot.load())
+		return snapshot
+
+	def replay(self, snapshot, api):
+		listed = {}
+		rv = snapshot.replay(api, RESOURCES.endpoints,
+			lambda name, spec, plurals: listed.__setitem__(name, spec))
+		return rv, listed
+
+	def test_saved_from_the_store(self):
+		snapshot = self.save()
+		self.assertEqual(snapshot.resource_versions, {RESOURCES.endpoints: "10"})
+		rv, listed = self.replay(snapshot, FakeApi("10"))
+		self.assertEqual(rv, "10")
+		self.assertEqual(listed, {"ep0": {"ip": "10.0.0.2"}, "ep1": {"ip": "10.0.0.3"}})
+
+	def test_kind_never_listed_is_listed(self):
+		snapshot = self.save()
+		self.assertIsNone(snapshot.replay(FakeApi("10"), RESOURCES.nets, None))
+
+	def test_delta_applied(self):
+		snapshot = self.save()
+		FakeWatch.events = [
+			event("MODIFIED", "ep0", "11", "10.0.0.4"),
+			event("DELETED", "ep1", "12"),
+			event("ADDED", "ep2", "13", "10.0.0.5")]
+		rv, listed = self.replay(snapshot, FakeApi("13"))
+		self.assertEqual(rv, "13")
+		self.assertEqual(listed, {"ep0": {"ip": "10.0.0.4"}, "ep2": {"ip": "10.0.0.5"}})
+
+	def test_delta_not_caught_up(self):
+		snapshot = self.save()
+		FakeWatch.events = [event("MODIFIED", "ep0", "11", "10.0.0.4")]
+		rv, listed = self.replay(snapshot, FakeApi("20"))
+		self.assertIsNone(rv)
+		self.assertEqual(listed, {})
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,273 @@
+"""
+Unit tests of TrnRpc: the writes it skips because the droplet already
+has them, and what it does when the droplet goes away and comes back.
+
+	pytest test/unit_test
+"""
+import os
+import sys
+import time
+import unittest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+from common.rpc import TrnRpc, DropletHealth
+from common.trn_rpc_client import TrnRpcClient, TrnRpcError, NULLPROC
+from common.trn_rpc_protocol import *
+from common.trn_rpc_transport import FakeTransitd, TrnRpcTransport, TRANSPORTS
+
+DROPLET_IP = "10.0.0.1"
+DROPLET_MAC = "aa:bb:cc:dd:ee:01"
+
+class FakeNet:
+	def __init__(self, vni="1", nip="10.1.0.0", prefixlen="16", bouncers_ips=("10.0.0.2",)):
+		self.vni = vni
+		self.nip = nip
+		self.prefixlen = prefixlen
+		self.bouncers_ips = list(bouncers_ips)
+
+	def get_nip(self):
+		return self.nip
+
+	def get_prefixlen(self):
+		return self.prefixlen
+
+	def get_bouncers_ips(self):
+		return self.bouncers_ips
+
+def wait_for(predicate, timeout=5):
+	deadline = time.monotonic() + timeout
+	while not predicate():
+		if time.monotonic() > deadline:
+			return False
+		time.sleep(0.01)
+	return True
+
+class FakeTrnRpc(TrnRpc):
+	transport_kind = "fake"
+
+class test_trn_rpc_acks(unittest.TestCase):
+	"""
+	TrnRpc against the droplet's in-memory fake transitd.
+	"""
+	def setUp(self):
+		FakeTransitd.reset()
+		DropletHealth.drop(DROPLET_IP)
+		self.rpc = FakeTrnRpc(DROPLET_IP, DROPLET_MAC)
+		self.transitd = FakeTransitd.get(DROPLET_IP)
+
+	def tearDown(self):
+		FakeTransitd.reset()
+		DropletHealth.drop(DROPLET_IP)
+
+	def test_unchanged_write_is_skipped(self):
+		net = FakeNet()
+		self.rpc.update_net(net)
+		self.rpc.update_net(net)
+		self.assertEqual(self.transitd.calls, 1)
+		self.assertEqual(len(self.transitd.nets), 1)
+
+	def test_changed_write_is_sent(self):
+		net = FakeNet()
+		self.rpc.update_net(net)
+		net.bouncers_ips.append("10.0.0.3")
+		self.rpc.update_net(net)
+		self.assertEqual(self.transitd.calls, 2)
+
+	def test_delete_drops_the_ack(self):
+		net = FakeNet()
+		self.rpc.update_net(net)
+		self.rpc.delete_net(net)
+		self.assertEqual(len(self.transitd.nets), 0)
+		self.rpc.update_net(net)
+		self.assertEqual(self.transitd.calls, 3)
+		self.assertEqual(len(self.transitd.nets), 1)
+
+	def test_restarted_transitd_gets_the_writes_again(self):
+		net = FakeNet()
+		self.rpc.update_net(net)
+		self.transitd.restart()
+		self.rpc.update_net(net)
+		self.assertEqual(self.transitd.calls, 2)
+		self.assertEqual(len(self.transitd.nets), 1)
+
+	def test_restart_replays_every_acked_write(self):
+		net0 = FakeNet()
+		net1 = FakeNet(vni="2")
+		self.rpc.update_net(net0)
+		self.rpc.update_net(net1)
+		self.transitd.restart()
+		self.rpc.update_net(net0)
+		# net1 was not written again, it is replayed
+		self.assertTrue(wait_for(lambda: len(self.transitd.nets) == 2))
+		self.assertEqual(self.rpc.pending_resync(), [])
+		self.assertEqual(self.transitd.calls, 4)
+
+	def test_released_vpcs_are_forgotten(self):
+		rpc = FakeTrnRpc.get(DROPLET_IP, DROPLET_MAC)
+		self.addCleanup(TrnRpc.invalidate, DROPLET_IP)
+		net0 = FakeNet()
+		net1 = FakeNet(vni="2")
+		rpc.update_net(net0)
+		rpc.update_net(net1)
+		TrnRpc.forget_vpcs({"1"})
+		# Another replica may have changed net0 since
+		rpc.update_net(net0)
+		rpc.update_net(net1)
+		self.assertEqual(self.transitd.calls, 3)
+
+	def test_force_resync_skips_nothing(self):
+		net = FakeNet()
+		TrnRpc.force_resync = True
+		try:
+			self.rpc.update_net(net)
+			self.rpc.update_net(net)
+		finally:
+			TrnRpc.force_resync = False
+		self.assertEqual(self.transitd.calls, 2)
+
+class FlakyConnection:
+	def close(self):
+		pass
+
+class FlakyClient(TrnRpcClient):
+	"""
+	TrnRpcClient of a droplet that answers every call with 0 while up,
+	and refuses or drops connections while down. procs has the calls it
+	answered, except the pings.
+	"""
+	def __init__(self, ip):
+		super().__init__(ip)
+		self.up = True
+		self.connects = 0
+		self.procs = []
+
+	def _connect(self):
+		self.connects += 1
+		if not self.up:
+			raise ConnectionRefusedError("connection refused")
+		return FlakyConnection()
+
+	def _call(self, sock, prog, vers, proc, args):
+		if not self.up:
+			raise ConnectionResetError("connection reset")
+		if proc != NULLPROC:
+			self.procs.append(proc)
+		p = XdrPacker()
+		p.pack_int(0)
+		return p.get_buffer()
+
+class DirectTrnRpc(TrnRpc):
+	transport_kind = "direct"
+
+class test_trn_rpc_breaker(unittest.TestCase):
+	"""
+	TrnRpc over the direct transport. The droplet's health opens the
+	circuit after breaker_threshold failures and probes the droplet until
+	it is back.
+	"""
+	def setUp(self):
+		DropletHealth.drop(DROPLET_IP)
+		self.client = FlakyClient(DROPLET_IP)
+		TrnRpcClient._clients[DROPLET_IP] = self.client
+		self.rpc = DirectTrnRpc(DROPLET_IP, DROPLET_MAC)
+		self.health = self.rpc.health
+		self.health.backoff_base = self.health.backoff_max = 0.5
+
+	def tearDown(self):
+		TrnRpcClient.invalidate(DROPLET_IP)
+		DropletHealth.drop(DROPLET_IP)
+
+	def test_open_probe_recover_replay(self):
+		net = FakeNet()
+		self.rpc.update_net(net)
+		self.assertEqual(self.client.procs, [PROCS.UPDATE_NET])
+
+		self.client.up = False
+		net.bouncers_ips.append("10.0.0.3")
+		for _ in range(self.health.breaker_threshold):
+			self.rpc.update_net(net)
+		self.assertFalse(self.health.is_available())
+		self.assertEqual(len(self.rpc.pending_resync()), 1)
+		self.assertEqual(TrnRpc.resync_needed(), [])
+
+		# The open circuit fails calls without connecting
+		connects = self.client.connects
+		self.rpc.update_net(net)
+		self.assertEqual(self.client.connects, connects)
+
+		self.client.up = True
+		# Only the latest write of the net is replayed
+		self.assertTrue(wait_for(lambda: len(self.client.procs) == 2 and not self.rpc.pending_resync()))
+		self.assertTrue(self.health.is_available())
+		self.assertEqual(self.client.procs, [PROCS.UPDATE_NET, PROCS.UPDATE_NET])
+
+	def test_reconnect_replays(self):
+		net = FakeNet()
+		self.rpc.update_net(net)
+		self.client.up = False
+		self.rpc.update_net(FakeNet(vni="2"))
+		self.client.up = True
+		# The droplet may have restarted while away: the acknowledged
+		# write is sent again, and the failed one is replayed
+		self.rpc.update_net(net)
+		self.assertTrue(wait_for(lambda: len(self.client.procs) == 3 and not self.rpc.pending_resync()))
+		self.assertEqual(self.client.procs, [PROCS.UPDATE_NET] * 3)
+
+class FlakyTransport(TrnRpcTransport):
+	"""
+	Transport without a ping, like the transit CLI, to a droplet that is
+	up or not. calls has the calls that reached it.
+	"""
+	up = True
+	calls = []
+
+	def call(self, proc, itf, jsonconf, args):
+		if not FlakyTransport.up:
+			raise TrnRpcError("transit CLI for {} failed".format(self.ip))
+		FlakyTransport.calls.append(proc)
+		return 0
+
+class FlakyTrnRpc(TrnRpc):
+	transport_kind = "flaky"
+
+class test_trn_rpc_breaker_without_ping(unittest.TestCase):
+	"""
+	The breaker and the replays do not depend on the transport: without a
+	ping, the first call after the backoff is the probe.
+	"""
+	def setUp(self):
+		DropletHealth.drop(DROPLET_IP)
+		TRANSPORTS["flaky"] = FlakyTransport
+		FlakyTransport.up = True
+		FlakyTransport.calls = []
+		self.rpc = FlakyTrnRpc(DROPLET_IP, DROPLET_MAC)
+		self.health = self.rpc.health
+		self.health.backoff_base = self.health.backoff_max = 0.05
+
+	def tearDown(self):
+		del TRANSPORTS["flaky"]
+		DropletHealth.drop(DROPLET_IP)
+
+	def test_open_and_replay(self):
+		net0 = FakeNet()
+		self.rpc.update_net(net0)
+		FlakyTransport.up = False
+		net1 = FakeNet(vni="2")
+		for _ in range(self.health.breaker_threshold + 1):
+			self.rpc.update_net(net1)
+		self.assertFalse(self.health.is_available())
+		self.assertEqual(self.health.probe_timer, None)
+		self.assertEqual(FlakyTransport.calls, [PROCS.UPDATE_NET])
+
+		FlakyTransport.up = True
+		time.sleep(0.1)
+		# As the reconciler does on its pass
+		for rpc in [self.rpc]:
+			rpc.replay()
+		self.assertTrue(self.health.is_available())
+		# The pending write, then net0 again for a transitd that may have restarted
+		self.assertTrue(wait_for(lambda: len(FlakyTransport.calls) == 3 and not self.rpc.pending_resync()))
+
+if __name__ == '__main__':
+	unittest.main()
@@ -11,6 +11,7 @@ LDFLAGS += -lcmocka
 CLI_MOCKS += -Wl,--wrap=update_vpc_1
 CLI_MOCKS += -Wl,--wrap=update_net_1
 CLI_MOCKS += -Wl,--wrap=update_ep_1
+CLI_MOCKS += -Wl,--wrap=update_ep_batch_1
 CLI_MOCKS += -Wl,--wrap=update_agent_ep_1
 CLI_MOCKS += -Wl,--wrap=update_agent_md_1
 CLI_MOCKS += -Wl,--wrap=load_transit_xdp_1
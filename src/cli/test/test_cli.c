@@ -71,6 +71,15 @@ int *__wrap_update_ep_1(rpc_trn_endpoint_t *ep, CLIENT *clnt)
 	return retval;
 }
 
+int *__wrap_update_ep_batch_1(rpc_trn_endpoint_batch_t *batch, CLIENT *clnt)
+{
+	check_expected_ptr(batch);
+	check_expected_ptr(clnt);
+	int *retval = mock_ptr_type(int *);
+	function_called();
+	return retval;
+}
+
 int *__wrap_load_transit_xdp_1(rpc_trn_xdp_intf_t *itf, CLIENT *clnt)
 {
 	UNUSED(itf);
@@ -359,6 +368,35 @@ static int check_ep_equal(const LargestIntegralType value,
 	return true;
 }
 
+static int check_ep_batch_equal(const LargestIntegralType value,
+				const LargestIntegralType check_value_data)
+{
+	struct rpc_trn_endpoint_batch_t *batch =
+		(struct rpc_trn_endpoint_batch_t *)value;
+	struct rpc_trn_endpoint_batch_t *c_batch =
+		(struct rpc_trn_endpoint_batch_t *)check_value_data;
+	u_int i;
+
+	if (strcmp(batch->interface, c_batch->interface) != 0) {
+		return false;
+	}
+
+	if (batch->endpoints.endpoints_len !=
+	    c_batch->endpoints.endpoints_len) {
+		return false;
+	}
+
+	for (i = 0; i < batch->endpoints.endpoints_len; i++) {
+		if (!check_ep_equal(
+			    (const LargestIntegralType)&batch->endpoints
+				    .endpoints_val[i],
+			    (const LargestIntegralType)&c_batch->endpoints
+				    .endpoints_val[i]))
+			return false;
+	}
+	return true;
+}
+
 static int check_md_equal(const LargestIntegralType value,
 			  const LargestIntegralType check_value_data)
 
@@ -735,6 +773,134 @@ static void test_trn_cli_update_ep_subcmd(void **state)
 	assert_int_equal(rc, -EINVAL);
 }
 
+static void test_trn_cli_update_ep_batch_subcmd(void **state)
+{
+	UNUSED(state);
+	int rc;
+	int argc = 5;
+	int update_ep_batch_1_ret_val = 0;
+
+	/* Test cases */
+	char *argv1[] = { "update-ep-batch", "-i", "eth0", "-j", QUOTE([
+				  {
+					  "tunnel_id": "3",
+					  "ip": "10.0.0.1",
+					  "eptype": "1",
+					  "mac": "1:2:3:4:5:6",
+					  "veth": "veth0",
+					  "remote_ips": ["10.0.0.2"],
+					  "hosted_iface": "peer"
+				  },
+				  {
+					  "tunnel_id": "0",
+					  "ip": "10.0.0.2",
+					  "eptype": "0",
+					  "mac": "1:2:3:4:5:7",
+					  "veth": "",
+					  "remote_ips": [],
+					  "hosted_iface": ""
+				  }
+			  ]) };
+
+	char *argv2[] = { "update-ep-batch", "-i", "eth0", "-j", QUOTE({
+				  "tunnel_id": "3",
+				  "ip": "10.0.0.1",
+				  "eptype": "1",
+				  "mac": "1:2:3:4:5:6",
+				  "veth": "veth0",
+				  "remote_ips": ["10.0.0.2"],
+				  "hosted_iface": "peer"
+			  }) };
+
+	char *argv3[] = { "update-ep-batch", "-i", "eth0", "-j", QUOTE([
+				  {
+					  "tunnel_id": "3",
+					  "mac": "1:2:3:4:5:6",
+					  "veth": "veth0",
+					  "remote_ips": ["10.0.0.2"],
+					  "hosted_iface": "peer"
+				  }
+			  ]) };
+
+	char itf[] = "eth0";
+	char vitf[] = "veth0";
+	char hosted_itf[] = "peer";
+	char empty[] = "";
+	uint32_t remote[] = { 0x200000a };
+	char mac1[6] = { 1, 2, 3, 4, 5, 6 };
+	char mac2[6] = { 1, 2, 3, 4, 5, 7 };
+
+	struct rpc_trn_endpoint_t exp_eps[] = {
+		{
+			.interface = itf,
+			.ip = 0x100000a,
+			.eptype = 1,
+			.remote_ips = { .remote_ips_len = 1,
+					.remote_ips_val = remote },
+			.hosted_interface = hosted_itf,
+			.veth = vitf,
+			.tunid = 3,
+		},
+		{
+			.interface = itf,
+			.ip = 0x200000a,
+			.eptype = 0,
+			.remote_ips = { .remote_ips_len = 0,
+					.remote_ips_val = NULL },
+			.hosted_interface = empty,
+			.veth = empty,
+			.tunid = 0,
+		},
+	};
+
+	memcpy(exp_eps[0].mac, mac1, sizeof(char) * 6);
+	memcpy(exp_eps[1].mac, mac2, sizeof(char) * 6);
+
+	struct rpc_trn_endpoint_batch_t exp_batch = {
+		.interface = itf,
+		.endpoints = { .endpoints_len = 2, .endpoints_val = exp_eps },
+	};
+
+	/* Test call update_ep_batch successfully */
+	TEST_CASE("update_ep_batch succeed with well formed endpoint array");
+	update_ep_batch_1_ret_val = 0;
+	expect_function_call(__wrap_update_ep_batch_1);
+	will_return(__wrap_update_ep_batch_1, &update_ep_batch_1_ret_val);
+	expect_check(__wrap_update_ep_batch_1, batch, check_ep_batch_equal,
+		     &exp_batch);
+	expect_any(__wrap_update_ep_batch_1, clnt);
+	rc = trn_cli_update_ep_batch_subcmd(NULL, argc, argv1);
+	assert_int_equal(rc, 0);
+
+	/* Test parse_ep input error*/
+	TEST_CASE("update_ep_batch is not called with a non-array input");
+	rc = trn_cli_update_ep_batch_subcmd(NULL, argc, argv2);
+	assert_int_equal(rc, -EINVAL);
+
+	TEST_CASE("update_ep_batch is not called with a malformed endpoint");
+	rc = trn_cli_update_ep_batch_subcmd(NULL, argc, argv3);
+	assert_int_equal(rc, -EINVAL);
+
+	/* Test call update_ep_batch_1 return error*/
+	TEST_CASE("update-ep-batch subcommand fails if update_ep_batch_1 returns error");
+	update_ep_batch_1_ret_val = -EINVAL;
+	expect_function_call(__wrap_update_ep_batch_1);
+	will_return(__wrap_update_ep_batch_1, &update_ep_batch_1_ret_val);
+	expect_any(__wrap_update_ep_batch_1, batch);
+	expect_any(__wrap_update_ep_batch_1, clnt);
+	rc = trn_cli_update_ep_batch_subcmd(NULL, argc, argv1);
+	assert_int_equal(rc, -EINVAL);
+
+	/* Test call update_ep_batch_1 return NULL*/
+	TEST_CASE("update-ep-batch subcommand fails if update_ep_batch_1 returns NULL");
+	expect_function_call(__wrap_update_ep_batch_1);
+	will_return(__wrap_update_ep_batch_1, NULL);
+	expect_any(__wrap_update_ep_batch_1, batch);
+	expect_any(__wrap_update_ep_batch_1, clnt);
+	rc = trn_cli_update_ep_batch_subcmd(NULL, argc, argv1);
+	assert_int_equal(rc, -EINVAL);
+}
+
 static void test_trn_cli_load_transit_subcmd(void **state)
 {
 	UNUSED(state);
@@ -1896,6 +2062,7 @@ int main()
 		cmocka_unit_test(test_trn_cli_update_vpc_subcmd),
 		cmocka_unit_test(test_trn_cli_update_net_subcmd),
 		cmocka_unit_test(test_trn_cli_update_ep_subcmd),
+		cmocka_unit_test(test_trn_cli_update_ep_batch_subcmd),
 		cmocka_unit_test(test_trn_cli_load_transit_subcmd),
 		cmocka_unit_test(test_trn_cli_unload_transit_subcmd),
 		cmocka_unit_test(test_trn_cli_load_agent_subcmd),
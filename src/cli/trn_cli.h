@@ -75,6 +75,7 @@ int trn_cli_parse_ebpf_prog_stage(const cJSON *jsonobj,
 int trn_cli_update_vpc_subcmd(CLIENT *clnt, int argc, char *argv[]);
 int trn_cli_update_net_subcmd(CLIENT *clnt, int argc, char *argv[]);
 int trn_cli_update_ep_subcmd(CLIENT *clnt, int argc, char *argv[]);
+int trn_cli_update_ep_batch_subcmd(CLIENT *clnt, int argc, char *argv[]);
 int trn_cli_delete_vpc_subcmd(CLIENT *clnt, int argc, char *argv[]);
 int trn_cli_delete_net_subcmd(CLIENT *clnt, int argc, char *argv[]);
 int trn_cli_delete_ep_subcmd(CLIENT *clnt, int argc, char *argv[]);
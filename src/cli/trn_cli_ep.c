@@ -82,6 +82,104 @@ int trn_cli_update_ep_subcmd(CLIENT *clnt, int argc, char *argv[])
 	return 0;
 }
 
+struct cli_ep_batch_buf_t {
+	char veth[20];
+	char hosted_itf[20];
+	uint32_t remote_ips[RPC_TRN_MAX_REMOTE_IPS];
+};
+
+int trn_cli_update_ep_batch_subcmd(CLIENT *clnt, int argc, char *argv[])
+{
+	ketopt_t om = KETOPT_INIT;
+	struct cli_conf_data_t conf;
+	cJSON *json_str = NULL;
+	cJSON *ep_json = NULL;
+
+	if (trn_cli_read_conf_str(&om, argc, argv, &conf)) {
+		return -EINVAL;
+	}
+
+	char *buf = conf.conf_str;
+	json_str = trn_cli_parse_json(buf);
+
+	if (json_str == NULL) {
+		return -EINVAL;
+	}
+
+	if (!cJSON_IsArray(json_str)) {
+		print_err("Error: endpoint batch must be a json array.\n");
+		cJSON_Delete(json_str);
+		return -EINVAL;
+	}
+
+	int n = cJSON_GetArraySize(json_str);
+	if (n > RPC_TRN_MAX_EP_BATCH) {
+		print_err("Error: endpoint batch exceeds %d endpoints.\n",
+			  RPC_TRN_MAX_EP_BATCH);
+		cJSON_Delete(json_str);
+		return -EINVAL;
+	}
+
+	int *rc;
+	int i = 0;
+	int err = 0;
+	rpc_trn_endpoint_batch_t batch;
+	char rpc[] = "update_ep_batch_1";
+	rpc_trn_endpoint_t *eps = calloc(n + 1, sizeof(*eps));
+	struct cli_ep_batch_buf_t *bufs = calloc(n + 1, sizeof(*bufs));
+
+	if (eps == NULL || bufs == NULL) {
+		print_err("Error: cannot allocate endpoint batch.\n");
+		err = -ENOMEM;
+		goto cleanup;
+	}
+
+	cJSON_ArrayForEach(ep_json, json_str)
+	{
+		eps[i].remote_ips.remote_ips_val = bufs[i].remote_ips;
+		eps[i].remote_ips.remote_ips_len = 0;
+		eps[i].veth = bufs[i].veth;
+		eps[i].hosted_interface = bufs[i].hosted_itf;
+		eps[i].interface = conf.intf;
+
+		if (trn_cli_parse_ep(ep_json, &eps[i]) != 0) {
+			print_err("Error: parsing endpoint %d of batch.\n", i);
+			err = -EINVAL;
+			goto cleanup;
+		}
+		i++;
+	}
+
+	batch.interface = conf.intf;
+	batch.endpoints.endpoints_len = i;
+	batch.endpoints.endpoints_val = eps;
+
+	rc = update_ep_batch_1(&batch, clnt);
+	if (rc == (int *)NULL) {
+		print_err("RPC Error: client call failed: update_ep_batch_1.\n");
+		err = -EINVAL;
+		goto cleanup;
+	}
+
+	if (*rc != 0) {
+		print_err(
+			"Error: %s fatal daemon error, see transitd logs for details.\n",
+			rpc);
+		err = -EINVAL;
+		goto cleanup;
+	}
+
+	print_msg(
+		"update_ep_batch_1 successfully updated %d endpoints on interface %s.\n",
+		i, batch.interface);
+
+cleanup:
+	cJSON_Delete(json_str);
+	free(eps);
+	free(bufs);
+	return err;
+}
+
 int trn_cli_get_ep_subcmd(CLIENT *clnt, int argc, char *argv[])
 {
 	ketopt_t om = KETOPT_INIT;
@@ -514,6 +514,54 @@ static void test_update_ep_1_svc(void **state)
 	assert_int_equal(*rc, 0);
 }
 
+static void test_update_ep_batch_1_svc(void **state)
+{
+	UNUSED(state);
+
+	char itf[] = "lo";
+	char vitf[] = "veth0";
+	char hosted_itf[] = "veth";
+	char empty[] = "";
+	uint32_t remote[] = { 0x200000a };
+	char mac[6] = { 1, 2, 3, 4, 5, 6 };
+
+	struct rpc_trn_endpoint_t eps[] = {
+		{
+			.interface = empty,
+			.ip = 0x100000a,
+			.eptype = 1,
+			.remote_ips = { .remote_ips_len = 1,
+					.remote_ips_val = remote },
+			.hosted_interface = hosted_itf,
+			.veth = vitf,
+			.tunid = 3,
+		},
+		{
+			.interface = empty,
+			.ip = 0x300000a,
+			.eptype = 1,
+			.remote_ips = { .remote_ips_len = 1,
+					.remote_ips_val = remote },
+			.hosted_interface = hosted_itf,
+			.veth = vitf,
+			.tunid = 3,
+		},
+	};
+
+	memcpy(eps[0].mac, mac, sizeof(char) * 6);
+	memcpy(eps[1].mac, mac, sizeof(char) * 6);
+
+	struct rpc_trn_endpoint_batch_t batch = {
+		.interface = itf,
+		.endpoints = { .endpoints_len = 2, .endpoints_val = eps },
+	};
+
+	int *rc;
+	expect_function_calls(__wrap_bpf_map_update_elem, 4);
+	rc = update_ep_batch_1_svc(&batch, NULL);
+	assert_int_equal(*rc, 0);
+}
+
 static void test_update_agent_ep_1_svc(void **state)
 {
 	UNUSED(state);
@@ -1165,6 +1213,7 @@ int main()
 		cmocka_unit_test(test_update_vpc_1_svc),
 		cmocka_unit_test(test_update_net_1_svc),
 		cmocka_unit_test(test_update_ep_1_svc),
+		cmocka_unit_test(test_update_ep_batch_1_svc),
 		cmocka_unit_test(test_update_agent_md_1_svc),
 		cmocka_unit_test(test_update_agent_ep_1_svc),
 		cmocka_unit_test(test_get_vpc_1_svc),
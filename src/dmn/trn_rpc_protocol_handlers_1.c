@@ -281,6 +281,31 @@ error:
 	return &result;
 }
 
+int *update_ep_batch_1_svc(rpc_trn_endpoint_batch_t *batch,
+			   struct svc_req *rqstp)
+{
+	static int result;
+	result = 0;
+	int *rc;
+	u_int i;
+
+	TRN_LOG_DEBUG("update_ep_batch_1 interface: %s, endpoints: %d",
+		      batch->interface, batch->endpoints.endpoints_len);
+
+	/* Keep going on failure so one bad entry does not drop the rest of
+	 * the batch; report the most severe code seen. */
+	for (i = 0; i < batch->endpoints.endpoints_len; i++) {
+		rpc_trn_endpoint_t *ep = &batch->endpoints.endpoints_val[i];
+		ep->interface = batch->interface;
+		rc = update_ep_1_svc(ep, rqstp);
+		if (*rc > result) {
+			result = *rc;
+		}
+	}
+
+	return &result;
+}
+
 int *delete_vpc_1_svc(rpc_trn_vpc_key_t *argp, struct svc_req *rqstp)
 {
 	UNUSED(rqstp);
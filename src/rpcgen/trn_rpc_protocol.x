@@ -37,6 +37,9 @@ const RPC_TRN_MAX_NET_SWITCHES = 256;
 /* Upper limit on maximum numbber of transit routers in a vpc */
 const RPC_TRN_MAX_VPC_ROUTERS = 256;
 
+/* Upper limit on number of endpoints programmed in one batch */
+const RPC_TRN_MAX_EP_BATCH = 1024;
+
 /* Defines generic codes, 0 is always a success need not to mention! */
 const RPC_TRN_WARN = 1;
 const RPC_TRN_ERROR = 2;
@@ -72,6 +75,12 @@ struct rpc_trn_endpoint_t {
        uint64_t tunid;
 };
 
+/* Defines a batch of endpoints to be updated on the same interface */
+struct rpc_trn_endpoint_batch_t {
+       string interface<20>;
+       rpc_trn_endpoint_t endpoints<RPC_TRN_MAX_EP_BATCH>;
+};
+
 /* Defines a unique key to get/delete an RP (in DP) */
 struct rpc_trn_endpoint_key_t {
        string interface<20>;
@@ -171,6 +180,8 @@ program RPC_TRANSIT_REMOTE_PROTOCOL {
 
                 int LOAD_TRANSIT_XDP_PIPELINE_STAGE(rpc_trn_ebpf_prog_t) = 20;
                 int UNLOAD_TRANSIT_XDP_PIPELINE_STAGE(rpc_trn_ebpf_prog_stage_t) = 21;
+
+                int UPDATE_EP_BATCH(rpc_trn_endpoint_batch_t) = 22;
           } = 1;
 
 } =  0x20009051;